@@ -0,0 +1,37 @@
+"""add conversation summaries table
+
+Revision ID: 10d98d675b0f
+Revises: 7be6b14aafa9
+Create Date: 2026-10-18 14:22:09.581736
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '10d98d675b0f'
+down_revision: Union[str, Sequence[str], None] = '7be6b14aafa9'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('conversation_summaries',
+    sa.Column('id', sa.UUID(), nullable=False),
+    sa.Column('conversation_id', sa.UUID(), nullable=False),
+    sa.Column('end_message_count', sa.Integer(), nullable=False),
+    sa.Column('summary', sa.String(), nullable=False),
+    sa.Column('created_at', sa.TIMESTAMP(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.ForeignKeyConstraint(['conversation_id'], ['conversations.id'], name=op.f('fk_conversation_summaries_conversation_id_conversations')),
+    sa.PrimaryKeyConstraint('id', name=op.f('pk_conversation_summaries')),
+    sa.UniqueConstraint('conversation_id', 'end_message_count', name=op.f('uq_conversation_summaries_conversation_id'))
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('conversation_summaries')
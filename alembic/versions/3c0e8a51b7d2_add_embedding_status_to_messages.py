@@ -0,0 +1,41 @@
+"""add embedding status to messages
+
+Revision ID: 3c0e8a51b7d2
+Revises: 10d98d675b0f
+Create Date: 2026-10-18 15:10:42.118305
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3c0e8a51b7d2'
+down_revision: Union[str, Sequence[str], None] = '10d98d675b0f'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+embedding_status = sa.Enum('Pending', 'Done', 'Failed', name='embeddingstatus')
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    embedding_status.create(op.get_bind(), checkfirst=True)
+    # existing rows were embedded inline when they were stored
+    op.add_column('messages', sa.Column('embedding_status', embedding_status, server_default='Done', nullable=False))
+    op.create_index(
+        'ix_messages_embedding_pending',
+        'messages',
+        ['created_at'],
+        unique=False,
+        postgresql_where=sa.text("embedding_status = 'Pending'"),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_messages_embedding_pending', table_name='messages', postgresql_where=sa.text("embedding_status = 'Pending'"))
+    op.drop_column('messages', 'embedding_status')
+    embedding_status.drop(op.get_bind(), checkfirst=True)
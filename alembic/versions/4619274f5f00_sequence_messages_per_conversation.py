@@ -0,0 +1,43 @@
+"""sequence messages per conversation
+
+Revision ID: 4619274f5f00
+Revises: a75f6273ec4a
+Create Date: 2026-10-18 11:40:27.903114
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4619274f5f00'
+down_revision: Union[str, Sequence[str], None] = 'a75f6273ec4a'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # message_count was always written as 0; number existing rows in creation order
+    op.execute("""
+        UPDATE messages AS m
+        SET message_count = numbered.n
+        FROM (
+            SELECT id, row_number() OVER (PARTITION BY conversation_id ORDER BY created_at, id) AS n
+            FROM messages
+        ) AS numbered
+        WHERE numbered.id = m.id
+    """)
+    # backs both uniqueness of the sequence and the newest-k backward index scan
+    op.create_unique_constraint(
+        op.f('uq_messages_conversation_id'),
+        'messages',
+        ['conversation_id', 'message_count'],
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_constraint(op.f('uq_messages_conversation_id'), 'messages', type_='unique')
@@ -0,0 +1,30 @@
+"""add embedding model to message embeddings
+
+Revision ID: 5f7a2c9d4e10
+Revises: 8e2d4f61c9a3
+Create Date: 2026-10-18 16:31:05.447219
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5f7a2c9d4e10'
+down_revision: Union[str, Sequence[str], None] = '8e2d4f61c9a3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # every existing vector came from the original hard-coded model
+    op.add_column('message_embeddings', sa.Column('embedding_model', sa.String(), server_default='intfloat/e5-large', nullable=False))
+    op.alter_column('message_embeddings', 'embedding_model', server_default=None)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('message_embeddings', 'embedding_model')
@@ -0,0 +1,29 @@
+"""add content tokens to messages
+
+Revision ID: 7be6b14aafa9
+Revises: 4619274f5f00
+Create Date: 2026-10-18 13:05:51.276310
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7be6b14aafa9'
+down_revision: Union[str, Sequence[str], None] = '4619274f5f00'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # nullable: existing rows are counted lazily when first packed into a prompt
+    op.add_column('messages', sa.Column('content_tokens', sa.Integer(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('messages', 'content_tokens')
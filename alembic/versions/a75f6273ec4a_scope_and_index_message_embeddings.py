@@ -0,0 +1,67 @@
+"""scope and index message embeddings
+
+Revision ID: a75f6273ec4a
+Revises: d5f487d7fdb9
+Create Date: 2026-10-18 09:12:04.118532
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a75f6273ec4a'
+down_revision: Union[str, Sequence[str], None] = 'd5f487d7fdb9'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('message_embeddings', sa.Column('conversation_id', sa.UUID(), nullable=True))
+    op.add_column('message_embeddings', sa.Column('user_id', sa.UUID(), nullable=True))
+
+    # backfill the denormalized scope columns from the owning message/conversation
+    op.execute("""
+        UPDATE message_embeddings AS me
+        SET conversation_id = m.conversation_id,
+            user_id = c.user_id
+        FROM messages AS m
+        JOIN conversations AS c ON c.id = m.conversation_id
+        WHERE m.id = me.message_id
+    """)
+
+    op.alter_column('message_embeddings', 'conversation_id', nullable=False)
+    op.alter_column('message_embeddings', 'user_id', nullable=False)
+    op.create_foreign_key(
+        op.f('fk_message_embeddings_conversation_id_conversations'),
+        'message_embeddings', 'conversations', ['conversation_id'], ['id'],
+    )
+    op.create_foreign_key(
+        op.f('fk_message_embeddings_user_id_users'),
+        'message_embeddings', 'users', ['user_id'], ['id'],
+    )
+    op.create_index(op.f('ix_message_embeddings_conversation_id'), 'message_embeddings', ['conversation_id'], unique=False)
+    op.create_index(op.f('ix_message_embeddings_user_id'), 'message_embeddings', ['user_id'], unique=False)
+    op.create_index(
+        'ix_message_embeddings_embedding_hnsw',
+        'message_embeddings',
+        ['embedding'],
+        unique=False,
+        postgresql_using='hnsw',
+        postgresql_with={'m': 16, 'ef_construction': 64},
+        postgresql_ops={'embedding': 'vector_cosine_ops'},
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_message_embeddings_embedding_hnsw', table_name='message_embeddings', postgresql_using='hnsw')
+    op.drop_index(op.f('ix_message_embeddings_user_id'), table_name='message_embeddings')
+    op.drop_index(op.f('ix_message_embeddings_conversation_id'), table_name='message_embeddings')
+    op.drop_constraint(op.f('fk_message_embeddings_user_id_users'), 'message_embeddings', type_='foreignkey')
+    op.drop_constraint(op.f('fk_message_embeddings_conversation_id_conversations'), 'message_embeddings', type_='foreignkey')
+    op.drop_column('message_embeddings', 'user_id')
+    op.drop_column('message_embeddings', 'conversation_id')
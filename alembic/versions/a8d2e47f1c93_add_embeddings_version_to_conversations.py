@@ -0,0 +1,28 @@
+"""add embeddings version to conversations
+
+Revision ID: a8d2e47f1c93
+Revises: f3a9c6e1b250
+Create Date: 2026-10-19 00:04:52.417306
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a8d2e47f1c93'
+down_revision: Union[str, Sequence[str], None] = 'f3a9c6e1b250'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('conversations', sa.Column('embeddings_version', sa.BigInteger(), server_default='0', nullable=False))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('conversations', 'embeddings_version')
@@ -0,0 +1,57 @@
+"""add compact embedding columns
+
+Revision ID: b81f0d3e6a27
+Revises: 5f7a2c9d4e10
+Create Date: 2026-10-18 17:12:40.903318
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from pgvector.sqlalchemy import BIT, HALFVEC
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b81f0d3e6a27'
+down_revision: Union[str, Sequence[str], None] = '5f7a2c9d4e10'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # match whatever width the full vectors currently have (scripts/reembed.py may have changed it)
+    dim = op.get_bind().scalar(sa.text(
+        "SELECT atttypmod FROM pg_attribute "
+        "WHERE attrelid = 'message_embeddings'::regclass AND attname = 'embedding'"
+    ))
+    # nullable: existing rows are filled by scripts/backfill_compact_embeddings.py
+    op.add_column('message_embeddings', sa.Column('embedding_half', HALFVEC(dim), nullable=True))
+    op.add_column('message_embeddings', sa.Column('embedding_bit', BIT(dim), nullable=True))
+    op.create_index(
+        'ix_message_embeddings_embedding_half_hnsw',
+        'message_embeddings',
+        ['embedding_half'],
+        unique=False,
+        postgresql_using='hnsw',
+        postgresql_with={'m': 16, 'ef_construction': 64},
+        postgresql_ops={'embedding_half': 'halfvec_cosine_ops'},
+    )
+    op.create_index(
+        'ix_message_embeddings_embedding_bit_hnsw',
+        'message_embeddings',
+        ['embedding_bit'],
+        unique=False,
+        postgresql_using='hnsw',
+        postgresql_with={'m': 16, 'ef_construction': 64},
+        postgresql_ops={'embedding_bit': 'bit_hamming_ops'},
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_message_embeddings_embedding_bit_hnsw', table_name='message_embeddings', postgresql_using='hnsw', postgresql_with={'m': 16, 'ef_construction': 64}, postgresql_ops={'embedding_bit': 'bit_hamming_ops'})
+    op.drop_index('ix_message_embeddings_embedding_half_hnsw', table_name='message_embeddings', postgresql_using='hnsw', postgresql_with={'m': 16, 'ef_construction': 64}, postgresql_ops={'embedding_half': 'halfvec_cosine_ops'})
+    op.drop_column('message_embeddings', 'embedding_bit')
+    op.drop_column('message_embeddings', 'embedding_half')
@@ -0,0 +1,37 @@
+"""add text search to message embeddings
+
+Revision ID: c4e9a7b21f58
+Revises: b81f0d3e6a27
+Create Date: 2026-10-18 17:58:13.270661
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c4e9a7b21f58'
+down_revision: Union[str, Sequence[str], None] = 'b81f0d3e6a27'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # stored generated column: rewrites the table once, then Postgres keeps it in sync
+    op.add_column('message_embeddings', sa.Column(
+        'text_chunk_tsv',
+        postgresql.TSVECTOR(),
+        sa.Computed("to_tsvector('english', text_chunk)", persisted=True),
+        nullable=True,
+    ))
+    op.create_index('ix_message_embeddings_text_chunk_tsv', 'message_embeddings', ['text_chunk_tsv'], unique=False, postgresql_using='gin')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_message_embeddings_text_chunk_tsv', table_name='message_embeddings', postgresql_using='gin')
+    op.drop_column('message_embeddings', 'text_chunk_tsv')
@@ -0,0 +1,34 @@
+"""add conversations keyset index
+
+Revision ID: d7a3f5e2b914
+Revises: c4e9a7b21f58
+Create Date: 2026-10-18 18:41:52.904117
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd7a3f5e2b914'
+down_revision: Union[str, Sequence[str], None] = 'c4e9a7b21f58'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # serves GET /conversations: most recently updated first, id breaks ties
+    op.create_index(
+        'ix_conversations_user_id_updated_at',
+        'conversations',
+        ['user_id', sa.text('updated_at DESC'), 'id'],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_conversations_user_id_updated_at', table_name='conversations')
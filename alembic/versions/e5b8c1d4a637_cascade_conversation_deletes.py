@@ -0,0 +1,61 @@
+"""cascade conversation deletes
+
+Revision ID: e5b8c1d4a637
+Revises: d7a3f5e2b914
+Create Date: 2026-10-18 21:07:13.528410
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e5b8c1d4a637'
+down_revision: Union[str, Sequence[str], None] = 'd7a3f5e2b914'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# (table, column, referred table)
+FOREIGN_KEYS = [
+    ('conversations', 'user_id', 'users'),
+    ('messages', 'conversation_id', 'conversations'),
+    ('message_embeddings', 'message_id', 'messages'),
+    ('message_embeddings', 'conversation_id', 'conversations'),
+    ('message_embeddings', 'user_id', 'users'),
+    ('conversation_summaries', 'conversation_id', 'conversations'),
+]
+
+
+def _recreate_foreign_keys(ondelete: str | None) -> None:
+    for table, column, referred in FOREIGN_KEYS:
+        name = op.f(f'fk_{table}_{column}_{referred}')
+        op.drop_constraint(name, table, type_='foreignkey')
+        op.create_foreign_key(name, table, referred, [column], ['id'], ondelete=ondelete)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # the cascade from messages runs one lookup per deleted message; without this
+    # index each of them is a sequential scan of message_embeddings
+    op.create_index(op.f('ix_message_embeddings_message_id'), 'message_embeddings', ['message_id'], unique=False)
+    _recreate_foreign_keys('CASCADE')
+
+    op.add_column('conversations', sa.Column('deleted_at', sa.TIMESTAMP(timezone=True), nullable=True))
+    # the purge worker's queue: only soft-deleted conversations are indexed
+    op.create_index(
+        'ix_conversations_deleted_at',
+        'conversations',
+        ['deleted_at'],
+        unique=False,
+        postgresql_where=sa.text('deleted_at IS NOT NULL'),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_conversations_deleted_at', table_name='conversations', postgresql_where=sa.text('deleted_at IS NOT NULL'))
+    op.drop_column('conversations', 'deleted_at')
+    _recreate_foreign_keys(None)
+    op.drop_index(op.f('ix_message_embeddings_message_id'), table_name='message_embeddings')
@@ -0,0 +1,33 @@
+"""add last_used_at to embedding cache
+
+Revision ID: f3a9c6e1b250
+Revises: e5b8c1d4a637
+Create Date: 2026-10-18 23:12:41.083527
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f3a9c6e1b250'
+down_revision: Union[str, Sequence[str], None] = 'e5b8c1d4a637'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('embedding_cache', sa.Column('last_used_at', sa.TIMESTAMP(timezone=True), nullable=True))
+    # existing rows count as last used when written, so entries orphaned by earlier key changes age out
+    op.execute('UPDATE embedding_cache SET last_used_at = created_at')
+    op.alter_column('embedding_cache', 'last_used_at', nullable=False, server_default=sa.text('now()'))
+    op.create_index('ix_embedding_cache_last_used_at', 'embedding_cache', ['last_used_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_embedding_cache_last_used_at', table_name='embedding_cache')
+    op.drop_column('embedding_cache', 'last_used_at')
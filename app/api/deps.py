@@ -1,8 +1,8 @@
 from fastapi import Request, HTTPException
 from starlette.status import HTTP_401_UNAUTHORIZED
 from app.services.auth import jwt_service
-from app.services.user import get_user_by_sub
-from app.db.engine import SessionLocal
+from app.services.user import get_current_user
+from app.db.engine import AsyncSessionLocal
 from fastapi import Depends
 
 async def jwt_dependency(request: Request):
@@ -18,12 +18,9 @@ async def jwt_dependency(request: Request):
     return payload['sub']
 
 async def get_user_dependency(sub: str = Depends(jwt_dependency)):
-    user = get_user_by_sub(sub)
+    user = await get_current_user(sub)
     return user
     
-def get_db_session():
-    db = SessionLocal()
-    try:
+async def get_db_session():
+    async with AsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
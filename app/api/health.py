@@ -1,8 +1,22 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends, HTTPException
+from starlette.status import HTTP_404_NOT_FOUND
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.api.deps import get_db_session
 from app.schemas.health import HealthResponse
 from datetime import datetime,  timezone
+from app.core.metrics import registry as metrics_registry
+from app.core.settings import settings
 router = APIRouter()
 
+
+def metrics_enabled():
+    """Hide the metrics endpoints unless `metrics_enabled` is set."""
+    if not settings.metrics_enabled:
+        raise HTTPException(
+            status_code=HTTP_404_NOT_FOUND,
+            detail='Not Found'
+        )
+
 @router.get(
     '/health',
     summary = 'liveness check',
@@ -10,4 +24,24 @@ router = APIRouter()
     response_model= HealthResponse
 )
 def health():
-    return HealthResponse(status='ok', service='app', time=datetime.now(timezone.utc))
\ No newline at end of file
+    return HealthResponse(status='ok', service='app', time=datetime.now(timezone.utc))
+
+@router.get(
+    '/metrics',
+    summary = 'in-process metrics',
+    description= "returns counters, histograms and gauges collected by this worker; needs METRICS_ENABLED=true",
+    dependencies=[Depends(metrics_enabled)]
+)
+def metrics():
+    return metrics_registry.snapshot()
+
+@router.get(
+    '/metrics/embedding-queue',
+    summary = 'deferred embedding backlog',
+    description= "returns the number of messages waiting for the embedding worker and the age of the oldest; needs METRICS_ENABLED=true",
+    dependencies=[Depends(metrics_enabled)]
+)
+async def embedding_queue(db: AsyncSession = Depends(get_db_session)):
+    # imported here so the liveness routes do not pull in the embedding worker stack
+    from app.services.embedding_worker import queue_stats
+    return await queue_stats(db)
@@ -1,16 +1,41 @@
-from fastapi import APIRouter, Depends, Query
+from fastapi import APIRouter, Depends, Header, Query, Request
 from app.api.deps import get_user_dependency, get_db_session
 from app.models.conversation import Conversation
-from app.services.chat import chat as chat_service
-from app.schemas.conversations import CreateConversationResponse, CreateConversationRequest, GetConversationsResponse, UpdateConversationRequest, UpdateConversationResponse,ChatResponse, ChatRequest
+from app.services.chat import chat as chat_service, ChatStream
+from app.services.history_cache import invalidate_history
+from app.services.idempotency import get_idempotency_store, request_fingerprint
+from app.services.importer import aiter_lines, import_messages
+from app.services.pagination import decode_cursor, split_page
+from app.services.vector_index import get_vector_index
+from app.core.settings import settings
+from app.db.engine import AsyncSessionLocal
+from app.schemas.conversations import CreateConversationResponse, CreateConversationRequest, ConversationPage, UpdateConversationRequest, UpdateConversationResponse,ChatResponse, ChatRequest, ImportResponse
 from starlette.status import HTTP_500_INTERNAL_SERVER_ERROR, HTTP_404_NOT_FOUND, HTTP_204_NO_CONTENT, HTTP_200_OK
 from fastapi import HTTPException
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
+from sqlalchemy import and_, delete, func, or_, select, update
 from sqlalchemy.exc import SQLAlchemyError
+from datetime import datetime
 from typing import Annotated,List
 from uuid import UUID
 
 router = APIRouter()
 
+
+async def ensure_owned_conversation(db, conversation_id: UUID, user_id: UUID) -> None:
+    """404 unless the conversation exists, belongs to the user and is not soft-deleted."""
+    conversation = await db.scalar(
+        select(Conversation.id).where(
+            Conversation.id == conversation_id, Conversation.user_id == user_id, Conversation.deleted_at.is_(None)
+        )
+    )
+    if conversation is None:
+        raise HTTPException(
+            status_code=HTTP_404_NOT_FOUND,
+            detail='Conversation not found'
+        )
+
 @router.post(
             '/conversation',
             summary='Create a new conversation',
@@ -26,12 +51,12 @@ router = APIRouter()
 async def create_conversation(request: CreateConversationRequest, user=Depends(get_user_dependency), db=Depends(get_db_session)):
     try: 
         new_conversation = Conversation(
-            owner = user,
+            user_id = user.id,
             title = request.title,
         )
         db.add(new_conversation)
-        db.commit()
-        db.refresh(new_conversation)
+        await db.commit()
+        await db.refresh(new_conversation)
         return CreateConversationResponse(
             status = "success",
             conversation_id = new_conversation.id,
@@ -39,7 +64,7 @@ async def create_conversation(request: CreateConversationRequest, user=Depends(g
             created_at = new_conversation.created_at.isoformat()
         )
     except SQLAlchemyError as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status_code=HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Failed to create Conversation"
@@ -49,28 +74,38 @@ async def create_conversation(request: CreateConversationRequest, user=Depends(g
 
 @router.get(
     '/conversations',
-    summary='get latest `n` conversations',
-    response_model = List[GetConversationsResponse],
+    summary='get conversations, most recently updated first',
+    response_model = ConversationPage,
     status_code=200
     )
 async def get_conversations(
-        skip: Annotated[int,Query(ge=0, description="Number of records to skip")] = 0,
+        cursor: Annotated[str | None, Query(description="`next_cursor` of the previous page; omit for the first page")] = None,
         limit: Annotated[int, Query(ge=1, le=100, description="Maximum number of records to return")] = 10,
         user=Depends(get_user_dependency),
         db=Depends(get_db_session)
         ): 
+    # keyset pagination on (updated_at DESC, id), a range scan of ix_conversations_user_id_updated_at
+    stmt = select(Conversation).where(Conversation.user_id == user.id, Conversation.deleted_at.is_(None))
+    if cursor is not None:
+        updated_at, last_id = decode_cursor(cursor, datetime.fromisoformat, UUID)
+        stmt = stmt.where(or_(
+            Conversation.updated_at < updated_at,
+            and_(Conversation.updated_at == updated_at, Conversation.id > last_id),
+        ))
     try:
-        conversations = db.query(Conversation) \
-                        .filter(Conversation.owner == user) \
-                        .offset(skip) \
-                        .limit(limit) \
-                        .all()
-        return conversations
+        result = await db.execute(
+                        stmt \
+                        .order_by(Conversation.updated_at.desc(), Conversation.id) \
+                        .limit(limit + 1)
+                    )
+        conversations = result.scalars().all()
     except SQLAlchemyError as e:
         raise HTTPException(
             status_code=HTTP_500_INTERNAL_SERVER_ERROR,
             detail='Failed to retreive conversations from DB'
         )
+    items, next_cursor = split_page(conversations, limit, key=lambda c: (c.updated_at, c.id))
+    return ConversationPage(items=items, next_cursor=next_cursor)
     
 
 
@@ -87,9 +122,11 @@ async def update_conversation(
           db = Depends(get_db_session)
           ):
     try:
-        conversation = db.query(Conversation) \
-                    .filter(Conversation.id == id, Conversation.owner == user) \
-                    .first()
+        result = await db.execute(
+                    select(Conversation) \
+                    .where(Conversation.id == id, Conversation.user_id == user.id, Conversation.deleted_at.is_(None))
+                )
+        conversation = result.scalars().first()
         
         if not conversation:
             raise HTTPException(
@@ -102,8 +139,8 @@ async def update_conversation(
         if request.status is not None:
             conversation.status = request.status
 
-        db.commit()
-        db.refresh(conversation)
+        await db.commit()
+        await db.refresh(conversation)
         return conversation
     except SQLAlchemyError:
         raise HTTPException(
@@ -123,18 +160,24 @@ async def delete_conversation(
     user = Depends(get_user_dependency),
     db = Depends(get_db_session)
 ):
+    owned = and_(Conversation.id == id, Conversation.user_id == user.id, Conversation.deleted_at.is_(None))
     try:
-        conversation =  db.query(Conversation) \
-                        .filter(Conversation.id == id, Conversation.owner == user)\
-                        .first()
-        
-        if not conversation:
+        if settings.conversation_delete_mode == "soft":
+            # hidden at once; app/services/purge.py removes the rows in bounded batches
+            result = await db.execute(update(Conversation).where(owned).values(deleted_at=func.now()))
+        else:
+            # one statement; messages, embeddings and summaries go with it via ON DELETE CASCADE
+            result = await db.execute(delete(Conversation).where(owned))
+        if result.rowcount == 0:
+            await db.rollback()
             raise HTTPException(
                 status_code= HTTP_404_NOT_FOUND,
                 detail='Conversation not found'
             )
-        db.delete(conversation)
-        db.commit()
+        await db.commit()
+        await invalidate_history(id)
+        if (index := get_vector_index()) is not None:
+            index.invalidate(id)
 
     except SQLAlchemyError:
         raise HTTPException(
@@ -142,18 +185,101 @@ async def delete_conversation(
             detail= "Failed to communicate with DB"
         )
     
+@router.post(
+    '/conversation/{conversation_id}/import',
+    summary= "Bulk import a JSONL transcript into a conversation",
+    description="""
+                Appends messages to the conversation from a JSONL request body
+                (`application/x-ndjson`), one `{"role", "content", "created_at"?}` object per line.
+                - The body is parsed as it streams in and inserted in large batches
+                - Messages are chunked and embedded while the upload continues, so they become retrievable
+                - Returns the number of messages imported and embedded
+                """,
+    response_model=ImportResponse,
+    status_code=HTTP_200_OK
+)
+async def import_transcript(
+    conversation_id: UUID,
+    request: Request,
+    user= Depends(get_user_dependency),
+    db=Depends(get_db_session),
+):
+    await ensure_owned_conversation(db, conversation_id, user.id)
+    stats = await import_messages(db, conversation_id, user.id, aiter_lines(request.stream()))
+    return ImportResponse(
+        messages=stats.messages,
+        embedded=stats.embedded,
+        chunks=stats.chunks,
+        seconds=stats.seconds,
+        messages_per_second=stats.messages_per_second,
+    )
+
+
 @router.post(
     '/conversation/{conversation_id}/chat',
     summary= "Send a message to chat with the llm",
+    description="""
+                Runs one chat turn and stores the user message and the reply.
+                - With an `Idempotency-Key` header, retries of the same request (same key, same body) are
+                  answered with the original reply instead of calling the model and storing the turn again;
+                  a retry that arrives while the original is still running waits for it
+                - Reusing a key with a different body returns 422
+                """,
     response_model=ChatResponse,
     status_code=HTTP_200_OK
 )
-def chat(
+async def chat(
     conversation_id: UUID,
     request: ChatRequest,
+    idempotency_key: Annotated[str | None, Header(alias="Idempotency-Key", max_length=255)] = None,
     db=Depends(get_db_session),
-    user= get_user_dependency,
+    user= Depends(get_user_dependency),
 ):
-    response = chat_service(db, conversation_id,request.user_input, model = request.model, provider=request.provider)
-    print(response)
-    return ChatResponse(content=response)
\ No newline at end of file
+    await ensure_owned_conversation(db, conversation_id, user.id)
+    if idempotency_key is None:
+        response = await chat_service(db, conversation_id, user.id, request.user_input, model = request.model, provider=request.provider)
+        return ChatResponse(content=response)
+    # the turn opens its own session; give this connection back before waiting on it
+    await db.close()
+
+    async def turn() -> str:
+        # its own session: the turn may outlive this request when the client gives up and retries
+        async with AsyncSessionLocal() as session:
+            return await chat_service(session, conversation_id, user.id, request.user_input, model=request.model, provider=request.provider)
+
+    response = await get_idempotency_store().run(
+        (user.id, conversation_id, idempotency_key),
+        request_fingerprint(request.model_dump_json()),
+        turn,
+    )
+    return ChatResponse(content=response)
+
+
+@router.post(
+    '/conversation/{conversation_id}/chat/stream',
+    summary= "Send a message to chat with the llm, streaming the reply",
+    description="""
+                Streams the reply as server-sent events (`text/event-stream`):
+                - `token`: `{"content": "<chunk>"}` for each chunk produced by the model
+                - `done`: `{"content": "<full reply>"}` once the model finishes
+                - `error`: `{"detail": "..."}` if the model call fails
+                The user and AI messages are stored after the stream completes.
+                """,
+    status_code=HTTP_200_OK
+)
+async def chat_stream(
+    conversation_id: UUID,
+    request: ChatRequest,
+    user= Depends(get_user_dependency),
+    db=Depends(get_db_session),
+):
+    await ensure_owned_conversation(db, conversation_id, user.id)
+    # the stream opens its own session; give this connection back before the model call
+    await db.close()
+    stream = ChatStream(conversation_id, user.id, request.user_input, model=request.model, provider=request.provider)
+    return StreamingResponse(
+        stream.events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        background=BackgroundTask(stream.persist),
+    )
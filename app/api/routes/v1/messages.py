@@ -3,9 +3,12 @@ from starlette.status import HTTP_200_OK, HTTP_201_CREATED, HTTP_404_NOT_FOUND,
 from typing import List, Annotated
 from uuid import UUID
 from app.api.deps import get_db_session, get_user_dependency
-from app.schemas.messages import MessageCreate, MessageRead, GetMessageRequest
+from app.schemas.messages import MessageCreate, MessagePage, MessageRead, GetMessageRequest
 from app.models.message import Message
 from app.services.message import create_message as create_message_service, get_messages as get_message_service
+from app.services.history_cache import invalidate_history
+from app.services.vector_index import bump_embeddings_version
+from sqlalchemy import select
 from sqlalchemy.exc import SQLAlchemyError
 
 router = APIRouter()
@@ -21,22 +24,22 @@ async def create_message(
         user = Depends(get_user_dependency),
         db = Depends(get_db_session)
 ):
-    return create_message_service(db, request)
+    return await create_message_service(db, request)
 
 @router.get(
     '/message',
-    summary='get top `k` messages',
-    response_model=List[MessageRead],
+    summary='get a page of messages, oldest first',
+    response_model=MessagePage,
     status_code=HTTP_200_OK
 )
 async def get_messages(
     request: GetMessageRequest,
-    skip: Annotated[int, Query(ge=0,description='Number of records to skip')]=0,
+    cursor: Annotated[str | None, Query(description='`next_cursor` of the previous page; omit for the first page')] = None,
     limit: Annotated[int, Query(ge=1,le=100, description='Maximum number of records to return')] = 10,
     user = Depends(get_user_dependency),
     db = Depends(get_db_session)
 ):
-    return get_message_service(db, request.conversation_id, skip, limit)
+    return await get_message_service(db, request.conversation_id, cursor, limit)
 
 @router.delete(
     'message/{conversation_id}/{message_id}',
@@ -50,16 +53,21 @@ async def delete_message(
     db = Depends(get_db_session)
 ):
     try:
-        message = db.query(Message)\
-                  .filter(Message.conversation_id == conversation_id, Message.id == message_id) \
-                  .first()
+        result = await db.execute(
+                    select(Message)\
+                    .where(Message.conversation_id == conversation_id, Message.id == message_id)
+                 )
+        message = result.scalars().first()
         if not message:
             return HTTPException(
                 status_code=HTTP_404_NOT_FOUND,
                 detail= "No message with given id in given conversation id"
             )
-        db.delete(message)
-        db.commit()
+        await db.delete(message)
+        # its embedding rows go with it (ON DELETE CASCADE)
+        await bump_embeddings_version(db, [conversation_id])
+        await db.commit()
+        await invalidate_history(conversation_id)
     except SQLAlchemyError:
         raise HTTPException(
             status_code=HTTP_500_INTERNAL_SERVER_ERROR,
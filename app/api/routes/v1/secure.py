@@ -7,7 +7,5 @@ router = APIRouter()
 async def secure_route(user=Depends(get_user_dependency)):
     return {
             "message" : "Access Granted",
-            "user" : {
-                user
-            }
+            "user" : user
         }
\ No newline at end of file
@@ -0,0 +1,75 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Generic, Hashable, Optional, TypeVar
+
+from app.core.metrics import registry
+
+V = TypeVar("V")
+
+_MISSING = object()
+
+
+class TTLCache(Generic[V]):
+    """
+    Bounded LRU cache whose entries expire after a TTL.
+
+    Each entry may carry its own absolute expiry (e.g. a JWT's `exp`); the
+    effective expiry is the earlier of that and `ttl` seconds from insertion.
+    Hits and misses are counted in the metrics registry under `name`.
+
+    Parameters
+    ----------
+    maxsize : int
+        Maximum number of entries; the least recently used is evicted first.
+    ttl : float
+        Default lifetime of an entry in seconds.
+    name : str
+        Metrics prefix, e.g. `auth.token_cache`.
+    """
+
+    def __init__(self, maxsize: int, ttl: float, name: str):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, tuple[float, V]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = registry.counter(f"{name}.hits")
+        self.misses = registry.counter(f"{name}.misses")
+        self.evictions = registry.counter(f"{name}.evictions")
+        registry.gauge(f"{name}.size", lambda: len(self._data))
+
+    def get(self, key: Hashable, default: Any = None) -> Optional[V]:
+        now = time.time()
+        with self._lock:
+            item = self._data.get(key, _MISSING)
+            if item is not _MISSING:
+                expires_at, value = item
+                if expires_at > now:
+                    self._data.move_to_end(key)
+                    self.hits.inc()
+                    return value
+                del self._data[key]
+        self.misses.inc()
+        return default
+
+    def set(self, key: Hashable, value: V, expires_at: float | None = None) -> None:
+        expiry = time.time() + self.ttl
+        if expires_at is not None:
+            expiry = min(expiry, expires_at)
+        with self._lock:
+            self._data[key] = (expiry, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions.inc()
+
+    def invalidate(self, key: Hashable) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
@@ -0,0 +1,138 @@
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator
+
+
+class Counter:
+    """Monotonic counter, safe to increment from any thread."""
+
+    def __init__(self, name: str, description: str = ""):
+        self.name = name
+        self.description = description
+        self._value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self._value += amount
+
+    @property
+    def value(self) -> float:
+        return self._value
+
+    def snapshot(self) -> dict:
+        return {"type": "counter", "value": self._value}
+
+
+class Histogram:
+    """
+    Running count/sum plus a sliding window of recent samples for percentiles.
+
+    The window keeps the last `window` observations only, so p50/p99 reflect
+    recent behaviour rather than the whole process lifetime.
+    """
+
+    def __init__(self, name: str, description: str = "", window: int = 2048):
+        self.name = name
+        self.description = description
+        self._samples: deque = deque(maxlen=window)
+        self._count = 0
+        self._sum = 0.0
+        self._max = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        with self._lock:
+            self._samples.append(value)
+            self._count += 1
+            self._sum += value
+            self._max = max(self._max, value)
+
+    @contextmanager
+    def time(self, scale: float = 1000.0) -> Iterator[None]:
+        """Observe the wall time of the block, in milliseconds by default."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe((time.perf_counter() - start) * scale)
+
+    @property
+    def count(self) -> int:
+        return self._count
+
+    @property
+    def mean(self) -> float:
+        return self._sum / self._count if self._count else 0.0
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            samples = sorted(self._samples)
+        def pct(p: float) -> float:
+            if not samples:
+                return 0.0
+            return samples[min(len(samples) - 1, int(p * len(samples)))]
+        return {
+            "type": "histogram",
+            "count": self._count,
+            "sum": self._sum,
+            "mean": self.mean,
+            "p50": pct(0.50),
+            "p90": pct(0.90),
+            "p99": pct(0.99),
+            "max": self._max,
+        }
+
+
+class Gauge:
+    """Value computed on demand when the registry is read."""
+
+    def __init__(self, name: str, fn: Callable[[], float], description: str = ""):
+        self.name = name
+        self.description = description
+        self._fn = fn
+
+    def snapshot(self) -> dict:
+        try:
+            value = self._fn()
+        except Exception:
+            value = None
+        return {"type": "gauge", "value": value}
+
+
+class MetricsRegistry:
+    """Process-local registry; metrics are created on first use and shared after."""
+
+    def __init__(self):
+        self._metrics: Dict[str, object] = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, name: str, factory: Callable[[], object]):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = factory()
+                self._metrics[name] = metric
+            return metric
+
+    def counter(self, name: str, description: str = "") -> Counter:
+        return self._get_or_create(name, lambda: Counter(name, description))
+
+    def histogram(self, name: str, description: str = "", window: int = 2048) -> Histogram:
+        return self._get_or_create(name, lambda: Histogram(name, description, window))
+
+    def gauge(self, name: str, fn: Callable[[], float], description: str = "") -> Gauge:
+        with self._lock:
+            gauge = Gauge(name, fn, description)
+            self._metrics[name] = gauge
+            return gauge
+
+    def snapshot(self) -> Dict[str, dict]:
+        with self._lock:
+            metrics = list(self._metrics.items())
+        return {name: metric.snapshot() for name, metric in sorted(metrics)}
+
+
+registry = MetricsRegistry()
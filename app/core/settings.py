@@ -13,6 +13,130 @@ class Settings(BaseSettings):
     cognito_app_client_secret: str
     cognito_app_client_id: str
     OPENAI_API_KEY: str
+    # GET /metrics and /metrics/*: per-worker internals, unauthenticated; enable only where the port is private
+    metrics_enabled: bool = False
+    # async engine pool; connections are released while a turn waits on the LLM
+    db_pool_size: int = 20
+    db_max_overflow: int = 10
+    embed_model_name: str = "intfloat/e5-large"
+    # runtime: 'torch', 'onnx' or 'onnx-int8' (the ONNX ones need the `onnx` extra)
+    embed_backend: str = "torch"
+    # width of message_embeddings.embedding; changing model size needs scripts/reembed.py
+    embed_dim: int = 1024
+    embed_onnx_dir: str = ".cache/onnx"
+    embed_onnx_quantization: str = "avx2"
+    # load the embedder while building the app (before a pre-forking server forks workers)
+    embed_preload: bool = False
+    # load the embedder in each worker's startup hook instead of on the first chat request
+    embed_warm_up: bool = False
+    # chunking: e5 instruction prefixes, the model's sequence limit (special tokens included),
+    # tokens repeated between consecutive chunks, and an optional smaller chunk size
+    embed_passage_prefix: str = "passage: "
+    embed_query_prefix: str = "query: "
+    embed_max_seq_length: int = 512
+    embed_chunk_overlap_tokens: int = 64
+    embed_chunk_max_tokens: int | None = None
+    # embedding batcher: texts per model call and how long a batch may wait to fill
+    embed_max_batch_size: int = 32
+    embed_max_wait_ms: float = 5.0
+    # threads for tokenization/chunking so it never runs on the event loop
+    embed_cpu_workers: int = 4
+    # content-addressed embedding cache: in-memory LRU entries, backed by the embedding_cache table
+    embed_cache_size: int = 10_000
+    embed_cache_persistent: bool = True
+    # table rows unused for this many days are removed by the background purge task (None = keep forever)
+    embed_cache_ttl_days: float | None = 30.0
+    # how embedding rows are written: 'insert' (multi-row INSERT) or 'copy' (binary COPY)
+    embedding_insert_mode: str = "insert"
+    # 'inline' embeds before the turn returns; 'deferred' stores messages as pending for
+    # scripts/embedding_worker.py, which drains them in batches on a process pool
+    embedding_mode: str = "inline"
+    embedding_worker_batch_size: int = 256
+    embedding_worker_poll_seconds: float = 1.0
+    # bulk import: messages per insert batch, and inserted batches buffered ahead of the embedding stage
+    import_batch_size: int = 1000
+    import_pipeline_depth: int = 2
+    # vector retrieval: 'conversation' or 'user' scope, and per-query ANN knobs (None = server default);
+    # retrieval_iterative_scan sets hnsw.iterative_scan, which needs pgvector >= 0.8
+    retrieval_scope: str = "conversation"
+    retrieval_ef_search: int | None = None
+    retrieval_probes: int | None = None
+    retrieval_iterative_scan: bool = False
+    # compact copies written next to each vector: 'none', 'halfvec', 'bit' or 'both'
+    embedding_compact: str = "none"
+    # first-pass ANN column ('vector', 'halfvec' or 'bit'); compact passes fetch
+    # top_k * retrieval_rerank_factor candidates and re-rank them by exact cosine distance
+    retrieval_first_pass: str = "vector"
+    retrieval_rerank_factor: int = 4
+    # 'vector' (dense only) or 'hybrid' (dense + full-text over text_chunk, fused by reciprocal rank);
+    # each channel contributes up to retrieval_candidates hits, scored 1 / (retrieval_rrf_k + rank)
+    retrieval_mode: str = "hybrid"
+    retrieval_candidates: int = 50
+    retrieval_rrf_k: int = 60
+    # post-processing of retrieved chunks: fetch top_k * retrieval_pool_factor, drop repeated texts,
+    # keep at most retrieval_max_chunks_per_message per message, then optionally pick top_k by
+    # maximal marginal relevance (1.0 = relevance only, lower = more diverse; None = off)
+    retrieval_pool_factor: int = 4
+    retrieval_max_chunks_per_message: int = 1
+    retrieval_mmr_lambda: float | None = None
+    # in-process exact search for conversation-scoped retrieval: conversations of up to
+    # vector_index_max_rows chunks are held as NumPy matrices in a per-worker LRU capped at vector_index_max_mb
+    vector_index_enabled: bool = False
+    vector_index_max_rows: int = 20_000
+    vector_index_max_mb: int = 512
+    # auth caches: verified token payloads (also capped by the token's exp) and sub -> user
+    auth_token_cache_size: int = 10_000
+    auth_token_cache_ttl: float = 300.0
+    auth_user_cache_size: int = 10_000
+    auth_user_cache_ttl: float = 600.0
+    jwks_refresh_seconds: int = 300
+    # prompt assembly: candidates fetched per turn, then packed newest-first into the token budget
+    prompt_token_budget: int = 6000
+    history_max_messages: int = 50
+    history_token_share: float = 0.7
+    retrieval_top_k: int = 10
+    token_encoding: str = "o200k_base"
+    # rolling summaries of messages older than the history window, written off the request path;
+    # opt-in, since each fold is an extra LLM call
+    summary_enabled: bool = False
+    summary_provider: str = "openai"
+    summary_min_fold: int = 10
+    summary_max_fold: int = 200
+    summary_workers: int = 1
+    # last-N history cache: 'none', 'memory' (single worker only) or 'redis'
+    history_cache_backend: str = "none"
+    history_cache_size: int = 50
+    history_cache_ttl: float = 3600.0
+    redis_url: str | None = None
+    # allow provider="fake" (offline echo model) for local runs and tests
+    llm_fake_enabled: bool = False
+    # simulated latency of the fake provider's replies, e.g. to exercise request coalescing
+    llm_fake_delay_ms: float = 0.0
+    # models each provider may be asked for (first = default); providers not listed accept any name
+    llm_models: dict[str, list[str]] = {"openai": ["gpt-5", "gpt-5-mini", "gpt-5-nano"]}
+    summary_model: str | None = None
+    # one pooled HTTP client per provider, shared by all of its models; None = api.openai.com
+    openai_base_url: str | None = None
+    llm_timeout_seconds: float = 120.0
+    llm_max_connections: int = 100
+    llm_max_keepalive_connections: int = 20
+    llm_keepalive_expiry_seconds: float = 60.0
+    # DELETE /conversation: 'hard' deletes at once (ON DELETE CASCADE); 'soft' sets deleted_at and a
+    # background purge removes the rows purge_batch_size at a time, checking every purge_interval_seconds
+    conversation_delete_mode: str = "hard"
+    purge_batch_size: int = 5000
+    purge_interval_seconds: float = 30.0
+    # per-worker cache of LLM replies keyed by (provider, model, prompt, context): 'off', 'exact', or
+    # 'semantic' (also reuse a reply whose prompt embedding is at least response_cache_similarity cosine-similar);
+    # the context includes history, so only stateless repeats (e.g. first turns) hit
+    response_cache_mode: str = "off"
+    response_cache_size: int = 1000
+    response_cache_ttl: float = 3600.0
+    response_cache_similarity: float = 0.95
+    # Idempotency-Key on POST /conversation/{id}/chat: completed turns are replayed for
+    # idempotency_ttl seconds, at most idempotency_max_keys per worker
+    idempotency_ttl: float = 300.0
+    idempotency_max_keys: int = 10_000
     @property
     def jwks_url(self) -> str:
         return  f"https://cognito-idp.{self.cognito_region}.amazonaws.com/{self.cognito_user_pool_id}/.well-known/jwks.json"
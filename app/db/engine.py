@@ -1,5 +1,7 @@
 from typing import Generator
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker, Session
 from app.core.settings import settings
 
@@ -17,6 +19,30 @@ SessionLocal = sessionmaker(
     class_=Session
 )
 
+
+def _async_url(url: str):
+    """psycopg 3 serves both sync and async; pick it explicitly when the URL names no driver."""
+    parsed = make_url(url)
+    if parsed.drivername == "postgresql":
+        parsed = parsed.set(drivername="postgresql+psycopg")
+    return parsed
+
+
+async_engine = create_async_engine(
+    _async_url(str(settings.database_url)),
+    pool_pre_ping=True,
+    pool_size=settings.db_pool_size,
+    max_overflow=settings.db_max_overflow,
+)
+
+# expire_on_commit=False: attributes stay readable after commit without an implicit (async-unsafe) reload
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine,
+    autoflush=False,
+    expire_on_commit=False,
+    class_=AsyncSession,
+)
+
 #dependency for FastAPI routes
 def get_session() -> Generator[Session, None, None]:
     """
@@ -30,4 +56,5 @@ def get_session() -> Generator[Session, None, None]:
         db.rollback()
         raise
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
@@ -1,13 +1,54 @@
+from contextlib import asynccontextmanager
+import asyncio
 from fastapi import FastAPI
 from app.api.health import router as health_router
 from app.api.routes.v1 import secure as secure_v1, conversations as conversations_v1
 from app.api.routes.v1 import messages as messages_v1
+from app.core.settings import settings
+from app.services.auth import jwt_service
+from app.services.llm import llm_registry
+from app.services.model_registry import model_registry
+from app.services.purge import purge_worker
+from app.services.summary import summary_worker
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # per-worker warm-up; skipped when the models were already loaded pre-fork
+    if settings.embed_warm_up and not model_registry.is_loaded:
+        await asyncio.to_thread(model_registry.warm_up)
+    try:
+        await asyncio.to_thread(jwt_service.prefetch_jwks)
+    except Exception:
+        logger.warning("JWKS prefetch failed; keys will be fetched on first use", exc_info=True)
+    jwks_refresher = asyncio.create_task(jwt_service.refresh_jwks_forever())
+    if settings.summary_enabled:
+        summary_worker.start()
+    if settings.conversation_delete_mode == "soft" or (
+        settings.embed_cache_persistent and settings.embed_cache_ttl_days is not None
+    ):
+        purge_worker.start()
+    yield
+    await summary_worker.stop()
+    await purge_worker.stop()
+    jwks_refresher.cancel()
+    await llm_registry.aclose()
+
 
 def create_app() -> FastAPI:
+    if settings.embed_preload:
+        # load once in the parent so forked workers share the weights copy-on-write
+        model_registry.warm_up()
+        model_registry.freeze()
+
     app = FastAPI(
         title="Chatbot",
         version="0.1.0",
         description="chatbot API.",
+        lifespan=lifespan,
     )
     app.include_router(health_router, tags= ['health'])
     app.include_router(secure_v1.router, prefix = "/api/v1", tags= ['secure'])
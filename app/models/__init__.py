@@ -1,2 +1,4 @@
 from .user import User
 from .conversation import Conversation
+from .conversation_summary import ConversationSummary
+from .embedding_cache import EmbeddingCacheEntry
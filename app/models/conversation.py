@@ -1,5 +1,5 @@
 import uuid
-from sqlalchemy import Column, String, TIMESTAMP, func, ForeignKey, Enum
+from sqlalchemy import BigInteger, Column, String, TIMESTAMP, func, ForeignKey, Enum, Index
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 from app.models.user import User
@@ -14,7 +14,7 @@ class Conversation(Base):
     __tablename__ = 'conversations'
 
     id = Column(UUID(as_uuid = True), primary_key=True, default=uuid.uuid4)
-    user_id = Column(UUID(as_uuid=True), ForeignKey('users.id'), nullable=False)
+    user_id = Column(UUID(as_uuid=True), ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
     title = Column(String, nullable=False)
     created_at = Column(
         TIMESTAMP(timezone=True),
@@ -28,6 +28,18 @@ class Conversation(Base):
         onupdate = func.now(),
         nullable=False
     )
+    # set by a soft delete; the row and its children are purged later (see app/services/purge.py)
+    deleted_at = Column(TIMESTAMP(timezone=True), nullable=True)
+    # bumped whenever the conversation's embedding rows change; see app/services/vector_index.py
+    embeddings_version = Column(BigInteger, nullable=False, default=0, server_default='0')
+
+    __table_args__ = (
+        # keyset pagination of a user's conversations, most recently updated first
+        Index('ix_conversations_user_id_updated_at', user_id, updated_at.desc(), id),
+        Index('ix_conversations_deleted_at', deleted_at, postgresql_where=deleted_at.isnot(None)),
+    )
 
     owner = relationship("User", back_populates="conversations")
-    messages = relationship('Message', back_populates='conversation',cascade='all, delete-orphan')
\ No newline at end of file
+    # children are removed by ON DELETE CASCADE; passive_deletes keeps the ORM from loading them first
+    messages = relationship('Message', back_populates='conversation',cascade='all, delete-orphan', passive_deletes=True)
+    summaries = relationship('ConversationSummary', back_populates='conversation', cascade='all, delete-orphan', passive_deletes=True)
\ No newline at end of file
@@ -0,0 +1,26 @@
+import uuid
+from sqlalchemy import Column, Integer, String, TIMESTAMP, func, ForeignKey, UniqueConstraint
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.orm import relationship
+from app.db.base import Base
+
+
+class ConversationSummary(Base):
+    """Cumulative summary of a conversation's messages 1..end_message_count."""
+    __tablename__ = 'conversation_summaries'
+    __table_args__ = (
+        # one summary per cut-off; also serves "latest summary" lookups
+        UniqueConstraint('conversation_id', 'end_message_count'),
+    )
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    conversation_id = Column(UUID(as_uuid=True), ForeignKey('conversations.id', ondelete='CASCADE'), nullable=False)
+    end_message_count = Column(Integer, nullable=False)
+    summary = Column(String, nullable=False)
+    created_at = Column(
+        TIMESTAMP(timezone=True),
+        server_default=func.now(),
+        nullable=False
+    )
+
+    conversation = relationship('Conversation', back_populates='summaries')
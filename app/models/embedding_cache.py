@@ -0,0 +1,28 @@
+from sqlalchemy import Column, Index, String, TIMESTAMP, func
+from pgvector.sqlalchemy import Vector
+from app.db.base import Base
+
+
+class EmbeddingCacheEntry(Base):
+    """Embedding of one exact text, addressed by a hash of the model name and the normalized text."""
+    __tablename__ = 'embedding_cache'
+    __table_args__ = (
+        # expiry scans oldest-used first
+        Index('ix_embedding_cache_last_used_at', 'last_used_at'),
+    )
+
+    content_hash = Column(String(64), primary_key=True)
+    model = Column(String, nullable=False)
+    # no fixed dimension: entries of different models live side by side
+    embedding = Column(Vector(), nullable=False)
+    created_at = Column(
+        TIMESTAMP(timezone=True),
+        server_default=func.now(),
+        nullable=False
+    )
+    # refreshed (at most daily) when the entry is read; rows unused for embed_cache_ttl_days are purged
+    last_used_at = Column(
+        TIMESTAMP(timezone=True),
+        server_default=func.now(),
+        nullable=False
+    )
@@ -1,6 +1,6 @@
 from app.db.base import Base
 import uuid
-from sqlalchemy import Column, String,Integer, UUID, TIMESTAMP, func, ForeignKey, Enum
+from sqlalchemy import Column, String,Integer, UUID, TIMESTAMP, func, ForeignKey, Enum, UniqueConstraint, Index, text
 from sqlalchemy.orm import relationship
 import enum
 
@@ -10,15 +10,38 @@ class MessageRole(enum.Enum):
     AI = 'ai'
     User = 'user'
 
+class EmbeddingStatus(enum.Enum):
+    Pending = 'pending'     # stored, waiting for the embedding worker
+    Done = 'done'
+    Failed = 'failed'       # the worker gave up; see scripts/embedding_worker.py --retry-failed
+
 class Message(Base):
     __tablename__ = 'messages'
+    __table_args__ = (
+        # message_count is a per-conversation sequence; this also serves the newest-k query
+        UniqueConstraint('conversation_id', 'message_count'),
+        # the embedding work queue: only pending rows are indexed, oldest first
+        Index(
+            'ix_messages_embedding_pending',
+            'created_at',
+            postgresql_where=text("embedding_status = 'Pending'"),
+        ),
+    )
 
     id= Column(UUID(as_uuid=True),primary_key=True, default=uuid.uuid4)
-    conversation_id = Column(UUID(as_uuid=True),ForeignKey('conversations.id'),nullable=False)
+    conversation_id = Column(UUID(as_uuid=True),ForeignKey('conversations.id', ondelete='CASCADE'),nullable=False)
     message_count = Column(Integer, nullable=False)
     role = Column(Enum(MessageRole), nullable=False)
     content = Column(String, nullable=True)
     token_count = Column(Integer, nullable=False)
+    # tokens in `content` alone, counted once at insert for prompt budgeting
+    content_tokens = Column(Integer, nullable=True)
+    embedding_status = Column(
+        Enum(EmbeddingStatus),
+        nullable=False,
+        default=EmbeddingStatus.Done,
+        server_default=EmbeddingStatus.Done.name,
+    )
     provider = Column(String)
     model = Column(String)
     created_at = Column(
@@ -28,4 +51,4 @@ class Message(Base):
     )
 
     conversation = relationship('Conversation', back_populates="messages")
-    embeddings = relationship('MessageEmbedding', back_populates="message", cascade='all, delete')
\ No newline at end of file
+    embeddings = relationship('MessageEmbedding', back_populates="message", cascade='all, delete', passive_deletes=True)
\ No newline at end of file
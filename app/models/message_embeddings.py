@@ -1,17 +1,58 @@
-from sqlalchemy import Column, Integer, String
-from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy import Column, Computed, Integer, String, Index
+from sqlalchemy.dialects.postgresql import TSVECTOR, UUID
 from sqlalchemy import ForeignKey
 from sqlalchemy.orm import Relationship
-from pgvector.sqlalchemy import Vector
+from pgvector.sqlalchemy import BIT, HALFVEC, Vector
 from uuid import uuid4
 from app.db.base import Base
+from app.core.settings import settings
+
+# text search configuration of the lexical retrieval channel; fixed by the generated column
+TEXT_SEARCH_CONFIG = 'english'
+
 
 class MessageEmbedding(Base):
     __tablename__ = 'message_embeddings'
+    __table_args__ = (
+        Index(
+            'ix_message_embeddings_embedding_hnsw',
+            'embedding',
+            postgresql_using='hnsw',
+            postgresql_with={'m': 16, 'ef_construction': 64},
+            postgresql_ops={'embedding': 'vector_cosine_ops'},
+        ),
+        # compact first-pass indexes; see retrieval_first_pass
+        Index(
+            'ix_message_embeddings_embedding_half_hnsw',
+            'embedding_half',
+            postgresql_using='hnsw',
+            postgresql_with={'m': 16, 'ef_construction': 64},
+            postgresql_ops={'embedding_half': 'halfvec_cosine_ops'},
+        ),
+        Index(
+            'ix_message_embeddings_embedding_bit_hnsw',
+            'embedding_bit',
+            postgresql_using='hnsw',
+            postgresql_with={'m': 16, 'ef_construction': 64},
+            postgresql_ops={'embedding_bit': 'bit_hamming_ops'},
+        ),
+        Index('ix_message_embeddings_text_chunk_tsv', 'text_chunk_tsv', postgresql_using='gin'),
+    )
 
     id = Column(UUID(as_uuid=True), primary_key=True,default=uuid4)
-    message_id = Column(UUID(as_uuid=True), ForeignKey('messages.id'), nullable=False)
+    message_id = Column(UUID(as_uuid=True), ForeignKey('messages.id', ondelete='CASCADE'), nullable=False, index=True)
+    # denormalized from messages/conversations so retrieval can filter without joins
+    conversation_id = Column(UUID(as_uuid=True), ForeignKey('conversations.id', ondelete='CASCADE'), nullable=False, index=True)
+    user_id = Column(UUID(as_uuid=True), ForeignKey('users.id', ondelete='CASCADE'), nullable=False, index=True)
     chunk_index = Column(Integer, nullable=False)
     text_chunk = Column(String, nullable=False)
-    embedding = Column(Vector(1024), nullable=False)
-    message = Relationship("Message", back_populates="embeddings")
\ No newline at end of file
+    # lexical channel of hybrid retrieval, maintained by Postgres
+    text_chunk_tsv = Column(TSVECTOR, Computed(f"to_tsvector('{TEXT_SEARCH_CONFIG}', text_chunk)", persisted=True))
+    # model that produced the vector; only rows of the configured model are searched
+    embedding_model = Column(String, nullable=False)
+    # sized by settings; scripts/reembed.py migrates the column when the model's dimension changes
+    embedding = Column(Vector(settings.embed_dim), nullable=False)
+    # optional compact copies of `embedding` (see embedding_compact); NULL until written or backfilled
+    embedding_half = Column(HALFVEC(settings.embed_dim), nullable=True)
+    embedding_bit = Column(BIT(settings.embed_dim), nullable=True)
+    message = Relationship("Message", back_populates="embeddings")
@@ -18,6 +18,6 @@ class User(Base):
         nullable=False
     )
 
-    conversations = relationship("Conversation", back_populates="owner", cascade="all, delete-orphan")
+    conversations = relationship("Conversation", back_populates="owner", cascade="all, delete-orphan", passive_deletes=True)
 
     
\ No newline at end of file
@@ -2,7 +2,7 @@ from pydantic import BaseModel
 from uuid import UUID
 from app.models.conversation import ConversationStatus
 from datetime import datetime
-from typing import Optional
+from typing import List, Optional
 class CreateConversationResponse(BaseModel):
     status: str
     conversation_id: UUID
@@ -19,11 +19,17 @@ class GetConversationsResponse(BaseModel):
     title: str
     status: ConversationStatus
     created_at: datetime
-    
+    updated_at: datetime
+
 
     class Config:
         from_attributes = True
 
+class ConversationPage(BaseModel):
+    items: List[GetConversationsResponse]
+    # pass as `cursor` to get the next page; None on the last page
+    next_cursor: Optional[str] = None
+
 class UpdateConversationRequest(BaseModel):
     title: Optional[str] = None
     status: Optional[ConversationStatus] = None
@@ -44,4 +50,12 @@ class ChatRequest(BaseModel):
     model: str
 
 class ChatResponse(BaseModel):
-    content: str
\ No newline at end of file
+    content: str
+
+class ImportResponse(BaseModel):
+    messages: int
+    # messages embedded during the import; the rest are left to the embedding worker
+    embedded: int
+    chunks: int
+    seconds: float
+    messages_per_second: float
@@ -1,7 +1,7 @@
 from pydantic import BaseModel
 from uuid import UUID
 from datetime import datetime
-from typing import Optional
+from typing import List, Optional
 from app.models.message import MessageRole
 
 
@@ -15,6 +15,8 @@ class MessageBase(BaseModel):
 
 class MessageCreate(MessageBase):
     conversation_id: UUID
+    # assigned from the conversation's sequence when omitted
+    message_count: Optional[int] = None
 
 class MessageRead(MessageBase):
     id: UUID
@@ -26,5 +28,10 @@ class MessageRead(MessageBase):
 class GetMessageRequest(BaseModel):
     conversation_id: UUID
 
+class MessagePage(BaseModel):
+    items: List[MessageRead]
+    # pass as `cursor` to get the next page; None on the last page
+    next_cursor: Optional[str] = None
+
     
 
@@ -0,0 +1,11 @@
+from pydantic import BaseModel
+from uuid import UUID
+
+
+class CurrentUser(BaseModel):
+    """The authenticated caller, as resolved from the JWT `sub`."""
+    id: UUID
+    cognito_sub: str
+
+    class Config:
+        from_attributes = True
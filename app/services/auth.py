@@ -1,17 +1,42 @@
+import asyncio
+import hashlib
+import logging
 import jwt
 from jwt import PyJWKClient
 from fastapi import Request, HTTPException
 from starlette.status import HTTP_401_UNAUTHORIZED
 
+from app.core.cache import TTLCache
 from app.core.settings import settings
 
+logger = logging.getLogger(__name__)
+
 
 class JWTService:
     def __init__(self):
-        self.jwk_client = PyJWKClient(settings.jwks_url)
+        # keys stay cached well past the refresh interval so requests never wait on a JWKS fetch;
+        # an unknown `kid` (key rotation) still triggers an on-demand refresh inside PyJWKClient
+        self.jwk_client = PyJWKClient(
+            settings.jwks_url,
+            cache_jwk_set=True,
+            lifespan=settings.jwks_refresh_seconds * 4,
+        )
+        self._payloads: TTLCache[dict] = TTLCache(
+            maxsize=settings.auth_token_cache_size,
+            ttl=settings.auth_token_cache_ttl,
+            name="auth.token_cache",
+        )
+
+    @staticmethod
+    def _token_key(token: str) -> str:
+        return hashlib.sha256(token.encode("utf-8")).hexdigest()
 
     def verify_token(self, token: str):
-        try: 
+        key = self._token_key(token)
+        cached = self._payloads.get(key)
+        if cached is not None:
+            return cached
+        try:
             signing_key = self.jwk_client.get_signing_key_from_jwt(token).key
             payload = jwt.decode(
                 token,
@@ -22,13 +47,27 @@ class JWTService:
                     "require" : ['exp', 'sub', 'iss', 'token_use']
                 },
             )
+            # never serve a cached payload past the token's own expiry
+            self._payloads.set(key, payload, expires_at=payload['exp'])
             return payload
         except jwt.ExpiredSignatureError:
             raise HTTPException(status_code=HTTP_401_UNAUTHORIZED, detail = 'Token Expired')
         except jwt.InvalidKeyError as e:
             raise HTTPException(status_code=HTTP_401_UNAUTHORIZED, detail=f"Invalid token: {str(e)}")
 
+    def prefetch_jwks(self) -> None:
+        """Fetch the JWKS now so the first request does not pay for it."""
+        self.jwk_client.get_jwk_set(refresh=True)
 
+    async def refresh_jwks_forever(self) -> None:
+        """Background task: re-fetch the JWKS every `jwks_refresh_seconds`, off the request path."""
+        while True:
+            await asyncio.sleep(settings.jwks_refresh_seconds)
+            try:
+                await asyncio.to_thread(self.prefetch_jwks)
+            except Exception:
+                logger.warning("JWKS refresh failed; keeping the cached key set", exc_info=True)
 
-jwt_service = JWTService()
 
+
+jwt_service = JWTService()
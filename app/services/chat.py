@@ -1,32 +1,40 @@
+import json
+import logging
+import time
 from uuid import UUID
-from typing import List, Tuple
+from typing import AsyncIterator, List, Tuple
 
 import numpy as np
-from langchain_openai import ChatOpenAI
-from langchain.schema import AIMessage, BaseMessage, HumanMessage, SystemMessage
-from sqlalchemy import select
-from transformers import AutoTokenizer
-from sentence_transformers import SentenceTransformer
+from langchain.schema import BaseMessage
+from langchain_core.messages import AIMessageChunk
 
 from app.core.settings import settings
+from app.db.engine import AsyncSessionLocal
 from app.models.message import Message
-from app.models.message_embeddings import MessageEmbedding
 from app.schemas.messages import MessageCreate
-from app.services.message import create_message, get_k_messages
+from app.services.context import build_context, to_langchain
+from app.services.embeddings import aembed_query
+from app.services.history_cache import CachedMessage, get_cached_history
+from app.services.llm import get_chat_model
+from app.services.message import get_k_messages
+from app.services.persistence import persist_messages
+from app.services.response_cache import CachedResponse, get_response_cache
+from app.services.retrieval import RetrievalScope, search_context
+from app.services.summary import get_latest_summary, summary_worker
 
+logger = logging.getLogger(__name__)
 
 
-
-_EMBED_MODEL_NAME = "intfloat/e5-large"
-
-_embedder = SentenceTransformer(_EMBED_MODEL_NAME)
-_tokenizer = AutoTokenizer.from_pretrained(_EMBED_MODEL_NAME)
-MAX_LEN = _tokenizer.model_max_length  # 512
-
-
+async def get_recent_messages(k, db, conversation_id: UUID) -> List[CachedMessage]:
+    """
+    Latest k messages of a conversation, chronological, from the history cache or Postgres.
+    """
+    return await get_cached_history(
+        k, conversation_id, lambda n: get_k_messages(n, conversation_id, db)
+    )
 
 
-def get_history(k, db, conversation_id: UUID) -> List[BaseMessage]:
+async def get_history(k, db, conversation_id: UUID) -> List[BaseMessage]:
     """
     Retrieve the latest k messages as LangChain BaseMessage objects.
 
@@ -34,7 +42,7 @@ def get_history(k, db, conversation_id: UUID) -> List[BaseMessage]:
     ----------
     k : int
         Number of messages to retrieve.
-    db : Session
+    db : AsyncSession
         SQLAlchemy session.
     conversation_id : UUID
         Conversation identifier.
@@ -51,212 +59,315 @@ def get_history(k, db, conversation_id: UUID) -> List[BaseMessage]:
     -----
     This function intentionally returns a tuple (history, token_sum).
     """
-    messages = get_k_messages(k, conversation_id, db)
+    messages = await get_recent_messages(k, db, conversation_id)
     if not messages:
         return [], 0
-
-    token_sum = messages[-1].token_count
-    history = []
-    for message in messages:
-        if message.role.value == "system":
-            history.append(SystemMessage(content=message.content))
-        if message.role.value == "ai":
-            history.append(AIMessage(content=message.content))
-        if message.role.value == "user":
-            history.append(HumanMessage(content=message.content))
-    return history, token_sum
+    return [to_langchain(message) for message in messages], messages[-1].token_count
 
 
 
-def chunk_text(text: str, max_len: int = MAX_LEN) -> List[str]:
+async def store_message(db, message_in: MessageCreate, user_id: UUID) -> Message:
     """
-    Tokenize and split text into chunks of size ≤ max_len, then decode back to strings.
+    Persist a message and store its chunked embeddings.
 
     Parameters
     ----------
-    text : str
-        Input text to chunk.
-    max_len : int
-        Maximum tokens per chunk.
+    db : AsyncSession
+        SQLAlchemy session.
+    message_in : MessageCreate
+        Incoming message payload.
+    user_id : UUID
+        Owner of the conversation, denormalized onto each embedding row.
 
     Returns
     -------
-    List[str]
-        Decoded text chunks.
+    Message
+        The newly stored Message with embeddings persisted.
     """
-    tokens = _tokenizer.encode(text, add_special_tokens=False)
-    chunks = [tokens[i : i + max_len] for i in range(0, len(tokens), max_len)]
-    return [_tokenizer.decode(chunk, skip_special_tokens=True) for chunk in chunks]
+    stored = await persist_messages(db, [message_in], user_id)
+    return stored[0]
 
 
-def get_embeddings(text: str) -> List[Tuple[str, List[float]]]:
+async def build_prompt(
+    db, conversation_id: UUID, user_id: UUID, user_input: str, model: str | None = None,
+) -> Tuple[List[BaseMessage], int, np.ndarray]:
     """
-    Split long text into ≤512-token chunks, embed each, and return list of (chunk_text, embedding).
+    Assemble the messages sent to the LLM for one turn.
 
     Parameters
     ----------
-    text : str
-        Text to embed.
+    db : AsyncSession
+        SQLAlchemy session.
+    conversation_id : UUID
+        Conversation identifier.
+    user_id : UUID
+        Authenticated user; scopes retrieval.
+    user_input : str
+        The user's input message content.
+    model : str | None
+        Model the prompt is for; the token budget is counted with its tokenizer.
 
     Returns
     -------
-    List[Tuple[str, List[float]]]
-        Each item is (chunk_text, embedding_vector_as_list).
+    (history, token_count, query_vec)
+        history : list of BaseMessage
+            Rolling summary, recent history and retrieved context packed into
+            `prompt_token_budget`, followed by the new user message.
+        token_count : int
+            Running token count carried from the last stored message.
+        query_vec : np.ndarray
+            Embedding of `user_input` used for retrieval; the response cache matches on it.
     """
-    chunks = chunk_text(text)
-    embeddings = _embedder.encode(
-        chunks,
-        convert_to_numpy=True,
-        normalize_embeddings=True,
+    recent = await get_recent_messages(settings.history_max_messages, db, conversation_id)
+    token_count = recent[-1].token_count if recent else 0
+    query_vec = await aembed_query(user_input)
+    retrieved = await search_context(
+        db,
+        user_input,
+        user_id=user_id,
+        conversation_id=conversation_id,
+        scope=RetrievalScope(settings.retrieval_scope),
+        top_k=settings.retrieval_top_k,
+        query_vec=query_vec,
     )
-
-    results: List[Tuple[str, List[float]]] = []
-    for chunk, vec in zip(chunks, embeddings):
-        results.append((chunk, vec.astype(np.float32).tolist()))
-    return results
-
-
-
-def store_message(db, message_in: MessageCreate) -> Message:
+    summary = await get_latest_summary(db, conversation_id) if settings.summary_enabled else None
+    context = build_context(
+        recent,
+        retrieved,
+        user_input,
+        budget=settings.prompt_token_budget,
+        history_share=settings.history_token_share,
+        summary=summary.summary if summary else None,
+        model=model,
+    )
+    if settings.summary_enabled:
+        summary_worker.record_window(conversation_id, context.history_messages)
+    return context.messages, token_count, query_vec
+
+
+async def persist_turn(
+    db,
+    conversation_id: UUID,
+    user_id: UUID,
+    user_input: str,
+    response_content: str,
+    token_count: int,
+    prompt_tokens: int,
+    completion_tokens: int,
+    model: str,
+    provider: str,
+) -> None:
     """
-    Persist a message and store its chunked embeddings.
+    Store the user message and the AI reply, with their embeddings.
 
     Parameters
     ----------
-    db : Session
+    db : AsyncSession
         SQLAlchemy session.
-    message_in : MessageCreate
-        Incoming message payload.
-
-    Returns
-    -------
-    Message
-        The newly stored Message with embeddings persisted.
-    """
-    msg: Message = create_message(db=db, message=message_in)
-    embeddings = get_embeddings(msg.content)
-    for idx, (chunk_text_value, vec) in enumerate(embeddings):
-        msg.embeddings.append(
-            MessageEmbedding(
-                chunk_index=idx,
-                text_chunk=chunk_text_value,
-                embedding=vec,
-            )
-        )
-    db.add(msg)
-    db.commit()
-    db.refresh(msg)
-    return msg
-
-
-
-def retrieve_relevant_context(db, query: str, top_k: int = 5) -> SystemMessage | None:
+    conversation_id : UUID
+        Conversation identifier.
+    user_id : UUID
+        Owner of the conversation.
+    user_input : str
+        The user's input message content.
+    response_content : str
+        The AI reply.
+    token_count : int
+        Running token count before this turn.
+    prompt_tokens, completion_tokens : int
+        Usage reported by the provider for this turn.
+    model, provider : str
+        Identifiers for bookkeeping on the AI message.
     """
-    Retrieve top_k most relevant messages for a query using cosine distance over stored embeddings.
-
-    Parameters
-    ----------
-    db : Session
-        SQLAlchemy session.
-    query : str
-        Search query string.
-    top_k : int
-        Number of results to retrieve.
+    token_count += prompt_tokens
 
-    Returns
-    -------
-    HumanMessage | None
-        A constructed HumanMessage containing retrieved context lines, or None if no rows.
-    """
-    query_vec = _embedder.encode(
-        [query],
-        convert_to_numpy=True,
-        normalize_embeddings=True,
-    )[0].astype(np.float32)
-
-    stmt = (
-        select(
-            Message.role,
-            Message.content,
-            MessageEmbedding.embedding.cosine_distance(query_vec).label("distance"),
-        )
-        .join(MessageEmbedding, Message.id == MessageEmbedding.message_id)
-        .order_by("distance")
-        .limit(top_k)
+    user_message = MessageCreate(
+        role="user",
+        content=user_input,
+        token_count=token_count,
+        conversation_id=conversation_id,
     )
 
-    rows = db.execute(stmt).all()
-    if not rows:
-        return None
+    token_count += completion_tokens
 
-    context_texts = "\n".join(
-        [
-            f"- {row.role.value if hasattr(row.role, 'value') else row.role}: {row.content}"
-            for row in rows
-        ]
+    response_message = MessageCreate(
+        role="ai",
+        content=response_content,
+        token_count=token_count,
+        provider=provider,
+        model=model,
+        conversation_id=conversation_id,
     )
-    return HumanMessage(content=f"[Retrieved context from memory]\n{context_texts}")
 
+    # both messages and all their chunk embeddings in one transaction
+    await persist_messages(db, [user_message, response_message], user_id)
 
+    if settings.summary_enabled:
+        summary_worker.enqueue(conversation_id)
 
 
-def chat(db, conversation_id: UUID, user_input: str, model: str, provider: str) -> str:
+async def chat(db, conversation_id: UUID, user_id: UUID, user_input: str, model: str, provider: str) -> str:
     """
     Run a chat turn with retrieved history and context, then persist both user and AI messages.
 
     Parameters
     ----------
-    db : Session
+    db : AsyncSession
         SQLAlchemy session.
     conversation_id : UUID
         Conversation identifier.
+    user_id : UUID
+        Authenticated user; scopes retrieval and is stored on the embeddings.
     user_input : str
         The user's input message content.
     model : str
-        Model identifier for bookkeeping.
+        Model to answer with; routed through the provider registry and stored on the AI message.
     provider : str
-        Provider identifier for bookkeeping.
+        Provider serving `model`; `"fake"` selects the offline echo model.
 
     Returns
     -------
     str
         The AI response content.
-    """
-    llm = ChatOpenAI(model="gpt-5", api_key=settings.OPENAI_API_KEY)
 
-    history, token_count = get_history(20, db, conversation_id)
-    context_message = retrieve_relevant_context(db, user_input, top_k=5)
-    if context_message:
-        history.append(context_message)
+    Notes
+    -----
+    With `response_cache_mode` on, a prompt already answered in the same
+    context is served from the response cache instead of the LLM; the turn is
+    stored either way, with the usage recorded when the reply was generated.
+    """
+    llm = get_chat_model(provider, model)
+
+    history, token_count, query_vec = await build_prompt(db, conversation_id, user_id, user_input, model)
+    # end the read transaction so the pooled connection is not held while waiting on the LLM
+    await db.commit()
+    cache = get_response_cache()
+    reply = cache.get(provider, model, user_input, history, query_vec) if cache is not None else None
+    if reply is None:
+        start = time.perf_counter()
+        response = await llm.ainvoke(history)
+        usage = response.response_metadata["token_usage"]
+        reply = CachedResponse(
+            content=response.content,
+            prompt_tokens=usage["prompt_tokens"],
+            completion_tokens=usage["completion_tokens"],
+            latency_ms=(time.perf_counter() - start) * 1000.0,
+            vector=query_vec,
+        )
+        if cache is not None:
+            cache.set(provider, model, user_input, history, reply)
+
+    await persist_turn(
+        db,
+        conversation_id,
+        user_id,
+        user_input,
+        reply.content,
+        token_count,
+        prompt_tokens=reply.prompt_tokens,
+        completion_tokens=reply.completion_tokens,
+        model=model,
+        provider=provider,
+    )
 
-    history.append(HumanMessage(content=user_input))
-    print(history)
+    return reply.content
 
-    response = llm.invoke(history)
 
-    token_count += response.response_metadata["token_usage"]["prompt_tokens"]
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
 
-    user_message = MessageCreate(
-        role="user",
-        content=user_input,
-        token_count=token_count,
-        message_count=0,
-        conversation_id=conversation_id,
-    )
 
-    token_count += response.response_metadata["token_usage"]["completion_tokens"]
+class ChatStream:
+    """
+    One streamed chat turn.
 
-    response_message = MessageCreate(
-        role="ai",
-        content=response.content,
-        token_count=token_count,
-        message_count=0,
-        provider=provider,
-        model=model,
-        conversation_id=conversation_id,
-    )
+    `events()` yields server-sent events as the LLM produces tokens: a `token`
+    event per chunk, then a single `done` event carrying the full reply. The
+    turn is persisted by `persist()`, which the route attaches as a background
+    task so it runs only after the last byte has been sent. The stream uses its
+    own session because the request-scoped one may already be closed by then.
 
-    store_message(db=db, message_in=user_message)
-    store_message(db=db, message_in=response_message)
+    Parameters
+    ----------
+    conversation_id : UUID
+        Conversation identifier.
+    user_id : UUID
+        Authenticated user.
+    user_input : str
+        The user's input message content.
+    model, provider : str
+        Requested model/provider; the reply is generated by that model.
+    """
 
-    return response.content
+    def __init__(self, conversation_id: UUID, user_id: UUID, user_input: str, model: str, provider: str):
+        self.conversation_id = conversation_id
+        self.user_id = user_id
+        self.user_input = user_input
+        self.model = model
+        self.provider = provider
+        self.llm = get_chat_model(provider, model)
+        self._reply: AIMessageChunk | None = None
+        self._token_count = 0
+        self._completed = False
+
+    async def events(self) -> AsyncIterator[str]:
+        async with AsyncSessionLocal() as db:
+            history, self._token_count, query_vec = await build_prompt(
+                db, self.conversation_id, self.user_id, self.user_input, self.model
+            )
+        cache = get_response_cache()
+        cached = cache.get(self.provider, self.model, self.user_input, history, query_vec) if cache is not None else None
+        if cached is not None:
+            # a cached reply goes out as one token event; persist() stores it like a streamed one
+            self._reply = AIMessageChunk(
+                content=cached.content,
+                usage_metadata={
+                    "input_tokens": cached.prompt_tokens,
+                    "output_tokens": cached.completion_tokens,
+                    "total_tokens": cached.prompt_tokens + cached.completion_tokens,
+                },
+            )
+            self._completed = True
+            yield _sse("token", {"content": cached.content})
+            yield _sse("done", {"content": cached.content})
+            return
+        start = time.perf_counter()
+        try:
+            async for chunk in self.llm.astream(history):
+                self._reply = chunk if self._reply is None else self._reply + chunk
+                if chunk.content:
+                    yield _sse("token", {"content": chunk.content})
+        except Exception:
+            logger.exception("chat stream failed for conversation %s", self.conversation_id)
+            yield _sse("error", {"detail": "LLM request failed"})
+            return
+        self._completed = True
+        if cache is not None and self._reply is not None:
+            usage = self._reply.usage_metadata or {}
+            cache.set(self.provider, self.model, self.user_input, history, CachedResponse(
+                content=self._reply.content,
+                prompt_tokens=usage.get("input_tokens", 0),
+                completion_tokens=usage.get("output_tokens", 0),
+                latency_ms=(time.perf_counter() - start) * 1000.0,
+                vector=query_vec,
+            ))
+        yield _sse("done", {"content": self._reply.content if self._reply else ""})
+
+    async def persist(self) -> None:
+        """Store the finished turn; a no-op if the stream failed or the client went away mid-stream."""
+        if not self._completed or self._reply is None:
+            return
+        usage = self._reply.usage_metadata or {}
+        async with AsyncSessionLocal() as db:
+            await persist_turn(
+                db,
+                self.conversation_id,
+                self.user_id,
+                self.user_input,
+                self._reply.content,
+                self._token_count,
+                prompt_tokens=usage.get("input_tokens", 0),
+                completion_tokens=usage.get("output_tokens", 0),
+                model=self.model,
+                provider=self.provider,
+            )
@@ -0,0 +1,151 @@
+import re
+from dataclasses import dataclass
+from typing import List, Tuple
+
+import numpy as np
+
+# sentence ends (terminal punctuation, optional closing quotes/brackets, then whitespace) and paragraph breaks
+_SENTENCE_END = re.compile(r"[.!?。！？]+[\"'”’)\]]*\s+|\n\s*\n")
+
+
+@dataclass
+class Chunk:
+    """
+    One piece of text ready for the embedding model.
+
+    `text` is an exact slice of the source (what gets stored and shown),
+    `input_ids` is what the model sees: special tokens, the e5 prefix and the
+    chunk's tokens, already within the model's window.
+    """
+    text: str
+    input_ids: List[int]
+    prefix: str = ""
+    start: int = 0
+    end: int = 0
+
+    @property
+    def model_text(self) -> str:
+        """The text the vector represents, prefix included; used as the cache key."""
+        return self.prefix + self.text
+
+
+def usable_window(tokenizer, prefix: str, max_seq_length: int) -> int:
+    """Tokens left for content once special tokens and the prefix are accounted for."""
+    limit = min(max_seq_length, tokenizer.model_max_length)
+    prefix_len = len(tokenizer.encode(prefix, add_special_tokens=False)) if prefix else 0
+    return limit - tokenizer.num_special_tokens_to_add(pair=False) - prefix_len
+
+
+def _segments(text: str, token_starts: np.ndarray, window: int) -> List[Tuple[int, int]]:
+    """Token spans of sentences, with sentences longer than the window split into window-sized pieces."""
+    n = len(token_starts)
+    bounds = [m.end() for m in _SENTENCE_END.finditer(text)]
+    starts = np.unique(np.concatenate(([0], np.searchsorted(token_starts, bounds, side="left"))))
+    starts = starts[starts < n].tolist()
+    segments = []
+    for begin, end in zip(starts, starts[1:] + [n]):
+        for piece in range(begin, end, window):
+            segments.append((piece, min(piece + window, end)))
+    return segments
+
+
+def _pack(segments: List[Tuple[int, int]], window: int, overlap: int) -> List[Tuple[int, int]]:
+    """
+    Greedily pack whole segments into windows; each window after the first
+    repeats trailing segments of the previous one totalling at most `overlap` tokens.
+    """
+    spans = []
+    i = 0
+    while i < len(segments):
+        start = segments[i][0]
+        j = i
+        while j < len(segments) and segments[j][1] - start <= window:
+            j += 1
+        end = segments[j - 1][1]
+        spans.append((start, end))
+        if j == len(segments):
+            break
+        # step back over whole segments, but never so far that the next segment no longer fits
+        k = j
+        while (
+            k - 1 > i
+            and end - segments[k - 1][0] <= overlap
+            and segments[j][1] - segments[k - 1][0] <= window
+        ):
+            k -= 1
+        i = k
+    return spans
+
+
+def chunk_document(
+    text: str,
+    tokenizer,
+    prefix: str = "",
+    max_seq_length: int = 512,
+    overlap: int = 0,
+    max_tokens: int | None = None,
+) -> List[Chunk]:
+    """
+    Split text into sentence-aligned, optionally overlapping chunks with a single tokenizer pass.
+
+    The text is tokenized once with character offsets. Chunk boundaries fall
+    on sentence ends whenever a sentence fits; chunk text is sliced from the
+    original string via the offsets (never decoded), and the model input ids
+    are assembled from the same tokens, so nothing is tokenized twice and no
+    chunk can be truncated by the model.
+
+    Parameters
+    ----------
+    text : str
+        Input text.
+    tokenizer : PreTrainedTokenizerFast
+        The embedding model's tokenizer; offsets require a fast tokenizer.
+    prefix : str
+        Instruction prefix the model expects, e.g. e5's ``"passage: "``.
+    max_seq_length : int
+        The model's sequence limit, special tokens included.
+    overlap : int
+        Maximum tokens of trailing sentences repeated at the start of the next chunk.
+    max_tokens : int | None
+        Content tokens per chunk; defaults to (and is capped at) the usable window.
+
+    Returns
+    -------
+    List[Chunk]
+        Chunks in document order; empty for blank text.
+    """
+    window = usable_window(tokenizer, prefix, max_seq_length)
+    if max_tokens is not None:
+        window = min(window, max_tokens)
+    encoding = tokenizer(text, add_special_tokens=False, return_offsets_mapping=True)
+    ids = encoding["input_ids"]
+    if not ids:
+        return []
+    offsets = encoding["offset_mapping"]
+    token_starts = np.fromiter((s for s, _ in offsets), dtype=np.int64, count=len(offsets))
+    prefix_ids = tokenizer.encode(prefix, add_special_tokens=False) if prefix else []
+
+    chunks = []
+    for start, end in _pack(_segments(text, token_starts, window), window, min(overlap, window // 2)):
+        char_start, char_end = offsets[start][0], offsets[end - 1][1]
+        chunks.append(Chunk(
+            text=text[char_start:char_end],
+            input_ids=tokenizer.build_inputs_with_special_tokens(prefix_ids + ids[start:end]),
+            prefix=prefix,
+            start=char_start,
+            end=char_end,
+        ))
+    return chunks
+
+
+def query_chunk(text: str, tokenizer, prefix: str = "", max_seq_length: int = 512) -> Chunk:
+    """A query as a single chunk, truncated to the usable window."""
+    limit = min(max_seq_length, tokenizer.model_max_length) - tokenizer.num_special_tokens_to_add(pair=False)
+    ids = tokenizer.encode(prefix + text, add_special_tokens=False)[:limit]
+    return Chunk(
+        text=text,
+        input_ids=tokenizer.build_inputs_with_special_tokens(ids),
+        prefix=prefix,
+        start=0,
+        end=len(text),
+    )
@@ -0,0 +1,161 @@
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import List
+
+from langchain.schema import AIMessage, BaseMessage, HumanMessage, SystemMessage
+
+from app.core.metrics import registry
+from app.services.history_cache import CachedMessage
+from app.services.retrieval import RetrievedChunk, format_context
+from app.services.tokens import count_tokens, message_tokens, uses_default_encoding
+
+_prompt_tokens = registry.histogram("context.prompt_tokens", "estimated prompt tokens per turn")
+_history_packed = registry.histogram("context.history_messages", "history messages packed per turn")
+_retrieved_packed = registry.histogram("context.retrieved_chunks", "retrieved chunks packed per turn")
+_duplicates = registry.counter("context.retrieved_duplicates", "retrieved chunks dropped as already in history")
+
+
+def to_langchain(message: CachedMessage) -> BaseMessage:
+    if message.role == "system":
+        return SystemMessage(content=message.content)
+    if message.role == "ai":
+        return AIMessage(content=message.content)
+    return HumanMessage(content=message.content)
+
+
+@lru_cache(maxsize=16)
+def _context_header_tokens(model: str | None) -> int:
+    # computed on first use: loading an encoding may download it
+    return count_tokens("[Retrieved context from memory]\n", model)
+
+
+def _content_tokens(message: CachedMessage, model: str | None) -> int:
+    # stored counts use settings.token_encoding; other tokenizers count on the fly
+    if not uses_default_encoding(model):
+        return count_tokens(message.content, model)
+    # rows stored before content_tokens existed are counted on the fly
+    if message.content_tokens is None:
+        message.content_tokens = count_tokens(message.content)
+    return message.content_tokens
+
+
+def _chunk_line(chunk: RetrievedChunk) -> str:
+    return f"- {chunk.role}: {chunk.text}"
+
+
+@dataclass
+class PromptContext:
+    messages: List[BaseMessage]
+    prompt_tokens: int
+    history_messages: int
+    retrieved_chunks: int
+
+
+def build_context(
+    history: List[CachedMessage],
+    retrieved: List[RetrievedChunk],
+    user_input: str,
+    budget: int,
+    history_share: float = 0.7,
+    summary: str | None = None,
+    model: str | None = None,
+) -> PromptContext:
+    """
+    Pack recent history and retrieved chunks into a prompt token budget.
+
+    History is taken newest-first up to `history_share` of the budget left after
+    the user's input, retrieved chunks (closest first) fill what remains, and any
+    room still left goes back to older history. History always stays a
+    contiguous suffix of the conversation. Retrieved chunks whose message is
+    already in the packed history, or whose text repeats an earlier hit, are
+    dropped.
+
+    Parameters
+    ----------
+    history : List[CachedMessage]
+        Recent messages in chronological order.
+    retrieved : List[RetrievedChunk]
+        Retrieval hits, closest first.
+    user_input : str
+        The new user message; always included.
+    budget : int
+        Maximum prompt tokens.
+    history_share : float
+        Fraction of the budget history may take before retrieval gets a turn.
+    summary : str | None
+        Rolling summary of older messages, sent first as a SystemMessage.
+    model : str | None
+        Model the prompt is for; tokens are counted with its tokenizer when tiktoken knows it.
+
+    Returns
+    -------
+    PromptContext
+        Messages to send (summary, history, context message, user input) and their estimated size.
+    """
+    used = message_tokens(count_tokens(user_input, model))
+    summary_message = None
+    if summary:
+        summary_message = SystemMessage(content=f"Summary of the earlier conversation:\n{summary}")
+        used += message_tokens(count_tokens(summary_message.content, model))
+    remaining = max(budget - used, 0)
+
+    # newest-first history up to its share
+    history_limit = int(remaining * history_share)
+    start = len(history)
+    history_used = 0
+    while start > 0:
+        cost = message_tokens(_content_tokens(history[start - 1], model))
+        if history_used + cost > history_limit:
+            break
+        history_used += cost
+        start -= 1
+
+    packed_ids = {m.id for m in history[start:]}
+    chunks: List[RetrievedChunk] = []
+    seen_texts = set()
+    retrieved_used = 0
+    retrieval_limit = remaining - history_used
+    for chunk in retrieved:
+        if str(chunk.message_id) in packed_ids or chunk.text in seen_texts:
+            _duplicates.inc()
+            continue
+        cost = count_tokens(_chunk_line(chunk), model) + 1
+        overhead = 0 if chunks else message_tokens(_context_header_tokens(model))
+        if retrieved_used + overhead + cost > retrieval_limit:
+            continue
+        retrieved_used += overhead + cost
+        seen_texts.add(chunk.text)
+        chunks.append(chunk)
+
+    # leftover room goes back to older history
+    while start > 0:
+        cost = message_tokens(_content_tokens(history[start - 1], model))
+        if history_used + retrieved_used + cost > remaining:
+            break
+        history_used += cost
+        start -= 1
+
+    # a hit may have become redundant once older history was added back
+    backfilled_ids = {m.id for m in history[start:]} - packed_ids
+    if backfilled_ids:
+        kept = [c for c in chunks if str(c.message_id) not in backfilled_ids]
+        _duplicates.inc(len(chunks) - len(kept))
+        chunks = kept
+
+    messages = [summary_message] if summary_message else []
+    messages.extend(to_langchain(m) for m in history[start:])
+    context_message = format_context(chunks)
+    if context_message:
+        messages.append(context_message)
+    messages.append(HumanMessage(content=user_input))
+
+    total = used + history_used + retrieved_used
+    _prompt_tokens.observe(total)
+    _history_packed.observe(len(history) - start)
+    _retrieved_packed.observe(len(chunks))
+    return PromptContext(
+        messages=messages,
+        prompt_tokens=total,
+        history_messages=len(history) - start,
+        retrieved_chunks=len(chunks),
+    )
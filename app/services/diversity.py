@@ -0,0 +1,84 @@
+from collections import defaultdict
+from typing import List, Sequence, Tuple, TypeVar
+
+import numpy as np
+
+from app.services.embedding_cache import normalize_text
+
+T = TypeVar("T")
+
+
+def dedupe_chunks(chunks: Sequence[T], vectors: np.ndarray, key=lambda c: c.text) -> Tuple[List[T], np.ndarray]:
+    """Drop chunks whose normalized text repeats a better-ranked one (pasted twice, regenerated answers)."""
+    seen = set()
+    keep = []
+    for i, chunk in enumerate(chunks):
+        text = normalize_text(key(chunk))
+        if text in seen:
+            continue
+        seen.add(text)
+        keep.append(i)
+    return [chunks[i] for i in keep], vectors[keep]
+
+
+def collapse_per_message(
+    chunks: Sequence[T], vectors: np.ndarray, max_per_message: int, key=lambda c: c.message_id,
+) -> Tuple[List[T], np.ndarray]:
+    """Keep only the best `max_per_message` chunks of each message, preserving rank order."""
+    counts = defaultdict(int)
+    keep = []
+    for i, chunk in enumerate(chunks):
+        owner = key(chunk)
+        if counts[owner] >= max_per_message:
+            continue
+        counts[owner] += 1
+        keep.append(i)
+    return [chunks[i] for i in keep], vectors[keep]
+
+
+def mmr(query: np.ndarray, vectors: np.ndarray, k: int, lambda_: float = 0.7) -> List[int]:
+    """
+    Maximal marginal relevance: pick k rows that are relevant to the query but not to each other.
+
+    Each step takes the candidate maximising
+    ``lambda_ * sim(query, c) - (1 - lambda_) * max(sim(c, selected))``.
+    Vectors are expected L2-normalized, so dot products are cosine
+    similarities. Similarities are computed once as matrix products; each
+    step is a vectorized update, O(n) per pick.
+
+    Parameters
+    ----------
+    query : np.ndarray
+        Query vector, shape (dim,).
+    vectors : np.ndarray
+        Candidate vectors, shape (n, dim), in any order.
+    k : int
+        Number of rows to select.
+    lambda_ : float
+        1.0 ranks by relevance only; lower values favour diversity.
+
+    Returns
+    -------
+    List[int]
+        Indices into `vectors`, in selection order.
+    """
+    n = len(vectors)
+    if n == 0 or k <= 0:
+        return []
+    vectors = np.asarray(vectors, dtype=np.float32)
+    relevance = vectors @ np.asarray(query, dtype=np.float32)
+    similarity = vectors @ vectors.T
+
+    first = int(np.argmax(relevance))
+    selected = [first]
+    chosen = np.zeros(n, dtype=bool)
+    chosen[first] = True
+    redundancy = similarity[first].copy()
+    while len(selected) < min(k, n):
+        scores = lambda_ * relevance - (1.0 - lambda_) * redundancy
+        scores[chosen] = -np.inf
+        pick = int(np.argmax(scores))
+        selected.append(pick)
+        chosen[pick] = True
+        np.maximum(redundancy, similarity[pick], out=redundancy)
+    return selected
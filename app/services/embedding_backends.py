@@ -0,0 +1,104 @@
+import logging
+import os
+from typing import Callable, Dict, List, Sequence
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# output dimension of the models we have tried; anything else is read from the loaded model
+KNOWN_DIMENSIONS: Dict[str, int] = {
+    "intfloat/e5-large": 1024,
+    "intfloat/e5-large-v2": 1024,
+    "intfloat/e5-base-v2": 768,
+    "intfloat/e5-small-v2": 384,
+    "intfloat/multilingual-e5-large": 1024,
+    "intfloat/multilingual-e5-base": 768,
+    "intfloat/multilingual-e5-small": 384,
+}
+
+
+def _torch(model_name: str, options: dict):
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer(model_name, device="cpu")
+
+
+def _onnx(model_name: str, options: dict):
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer(model_name, device="cpu", backend="onnx")
+
+
+def _onnx_int8(model_name: str, options: dict):
+    """
+    Dynamically quantized (int8 weights) ONNX export of the model.
+
+    The quantized file is produced once with sentence-transformers' exporter
+    into `onnx_dir` and loaded from there afterwards.
+    """
+    from sentence_transformers import SentenceTransformer, export_dynamic_quantized_onnx_model
+
+    config = options.get("quantization", "avx2")
+    local_dir = os.path.join(options.get("onnx_dir", ".cache/onnx"), model_name.replace("/", "__"))
+    file_name = f"model_qint8_{config}.onnx"
+    if not os.path.exists(os.path.join(local_dir, "onnx", file_name)):
+        logger.info("exporting int8 ONNX model for %s to %s", model_name, local_dir)
+        model = SentenceTransformer(model_name, device="cpu", backend="onnx")
+        model.save(local_dir)
+        export_dynamic_quantized_onnx_model(model, config, local_dir)
+    return SentenceTransformer(
+        local_dir, device="cpu", backend="onnx", model_kwargs={"file_name": f"onnx/{file_name}"}
+    )
+
+
+BACKENDS: Dict[str, Callable[[str, dict], object]] = {
+    "torch": _torch,
+    "onnx": _onnx,
+    "onnx-int8": _onnx_int8,
+}
+
+
+def build_embedder(model_name: str, backend: str = "torch", **options):
+    """
+    Load a SentenceTransformer for `model_name` on the requested runtime.
+
+    Every backend yields the same interface (modules that take tokenized
+    features), so the rest of the code does not care which one is active.
+
+    Parameters
+    ----------
+    model_name : str
+        Hugging Face model id or local path, e.g. ``intfloat/e5-small-v2``.
+    backend : str
+        ``torch`` (fp32 PyTorch), ``onnx`` (ONNX Runtime) or ``onnx-int8``
+        (dynamically quantized ONNX). The ONNX backends need the ``onnx`` extra.
+    **options
+        ``onnx_dir`` and ``quantization`` for ``onnx-int8``.
+    """
+    try:
+        build = BACKENDS[backend]
+    except KeyError:
+        raise ValueError(f"unknown embedding backend {backend!r}; expected one of {sorted(BACKENDS)}")
+    return build(model_name, options)
+
+
+def encode_ids(embedder, tokenizer, batch: Sequence[List[int]], batch_size: int = 32) -> np.ndarray:
+    """
+    Normalized embeddings for pre-tokenized inputs.
+
+    The ids go straight into the SentenceTransformer modules, skipping the
+    re-tokenization `SentenceTransformer.encode` would do on strings. Inputs
+    are sorted by length so each mini-batch pads as little as possible.
+    """
+    import torch
+
+    order = np.argsort([len(ids) for ids in batch], kind="stable")
+    out = np.empty((len(batch), embedder.get_sentence_embedding_dimension()), dtype=np.float32)
+    with torch.inference_mode():
+        for i in range(0, len(order), batch_size):
+            idx = order[i : i + batch_size]
+            features = tokenizer.pad({"input_ids": [batch[j] for j in idx]}, padding=True, return_tensors="pt")
+            features = {k: v.to(embedder.device) for k, v in features.items()}
+            vectors = embedder(features)["sentence_embedding"]
+            vectors = torch.nn.functional.normalize(vectors, p=2, dim=1)
+            out[idx] = vectors.float().cpu().numpy()
+    return out
@@ -0,0 +1,266 @@
+import asyncio
+import hashlib
+import logging
+import time
+import unicodedata
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable, Dict, List, Sequence, Set, Tuple
+
+import numpy as np
+from sqlalchemy import func, select, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import SQLAlchemyError
+
+from app.core.cache import TTLCache
+from app.core.metrics import registry
+from app.db.engine import AsyncSessionLocal, SessionLocal
+from app.models.embedding_cache import EmbeddingCacheEntry
+
+logger = logging.getLogger(__name__)
+
+# a hit refreshes its row's last_used_at at most this often, so reads rarely turn into writes
+_TOUCH_AFTER = timedelta(days=1)
+
+
+def normalize_text(text: str) -> str:
+    """NFC-normalize and collapse whitespace, so trivially different copies share one entry."""
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+def content_key(text: str, model_name: str, runtime: str = "") -> str:
+    """sha256 of the model name, the runtime that encodes it and the normalized text."""
+    return hashlib.sha256(f"{model_name}\x00{runtime}\x00{normalize_text(text)}".encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """
+    Content-addressed cache of embeddings, in front of whatever encodes them.
+
+    Lookups go to an in-process LRU first and then, for the remaining keys, to
+    the `embedding_cache` table in one query; only texts missing from both
+    are encoded, each distinct text once. New vectors are written back to
+    both tiers. The table is best effort: if it cannot be read or written the
+    cache degrades to memory only instead of failing the caller. Rows record
+    when they were last read (refreshed at most daily), so the purge task can
+    expire those unused for `embed_cache_ttl_days`.
+
+    Items may be plain strings or richer objects (e.g. tokenized chunks);
+    `key` maps an item to the exact text its vector represents.
+
+    Hits are turned into model time saved using the measured average encode
+    time per text.
+
+    Parameters
+    ----------
+    model_name : str
+        Part of every key, so switching models never returns stale vectors.
+    maxsize : int
+        Entries kept in memory.
+    persistent : bool
+        Whether to read and write the `embedding_cache` table.
+    runtime : str
+        Backend and quantization the vectors come from (e.g. `onnx-int8/avx2`), also part of
+        every key: differently quantized copies of a model do not produce the same vectors.
+    """
+
+    def __init__(
+        self,
+        model_name: str,
+        maxsize: int = 10_000,
+        persistent: bool = True,
+        name: str = "embedding_cache",
+        runtime: str = "",
+    ):
+        self.model_name = model_name
+        self.runtime = runtime
+        self.persistent = persistent
+        self._memory: TTLCache[np.ndarray] = TTLCache(maxsize, float("inf"), f"{name}.memory")
+        self._memory_hits = registry.counter(f"{name}.memory_hits")
+        self._store_hits = registry.counter(f"{name}.store_hits")
+        self._misses = registry.counter(f"{name}.misses", "texts sent to the model")
+        self._encode_seconds = 0.0
+        self._encoded = 0
+        self._writes: Set[asyncio.Task] = set()
+        registry.gauge(f"{name}.hit_ratio", self.hit_ratio)
+        registry.gauge(f"{name}.model_seconds_saved", self.model_seconds_saved)
+
+    def hit_ratio(self) -> float | None:
+        hits = self._memory_hits.value + self._store_hits.value
+        total = hits + self._misses.value
+        return hits / total if total else None
+
+    def model_seconds_saved(self) -> float:
+        if not self._encoded:
+            return 0.0
+        hits = self._memory_hits.value + self._store_hits.value
+        return hits * self._encode_seconds / self._encoded
+
+    def _from_memory(self, keys: List[str], found: Dict[str, np.ndarray]) -> List[str]:
+        missing = []
+        for key in dict.fromkeys(keys):
+            vec = self._memory.get(key)
+            if vec is None:
+                missing.append(key)
+            else:
+                found[key] = vec
+                self._memory_hits.inc()
+        return missing
+
+    def _remember(self, rows: Dict[str, np.ndarray], found: Dict[str, np.ndarray]) -> None:
+        for key, vec in rows.items():
+            vec = np.asarray(vec, dtype=np.float32)
+            self._memory.set(key, vec)
+            found[key] = vec
+
+    def _rows(self, vectors: Dict[str, np.ndarray]) -> List[dict]:
+        return [
+            {"content_hash": key, "model": self.model_name, "embedding": vec}
+            for key, vec in vectors.items()
+        ]
+
+    def _finish(
+        self, missing: List[str], encoded: np.ndarray, found: Dict[str, np.ndarray], elapsed: float,
+    ) -> Dict[str, np.ndarray]:
+        if missing:
+            self._encode_seconds += elapsed
+            self._encoded += len(missing)
+            self._misses.inc(len(missing))
+        fresh = dict(zip(missing, np.asarray(encoded, dtype=np.float32)))
+        self._remember(fresh, found)
+        return fresh
+
+    @staticmethod
+    def _stack(keys: List[str], found: Dict[str, np.ndarray]) -> np.ndarray:
+        return np.stack([found[key] for key in keys]) if keys else np.empty((0, 0), dtype=np.float32)
+
+    def _miss_items(self, items: Sequence[Any], keys: List[str], missing: List[str]) -> List[Any]:
+        first = {}
+        for item, key in zip(items, keys):
+            first.setdefault(key, item)
+        return [first[key] for key in missing]
+
+    def encode(
+        self,
+        items: Sequence[Any],
+        encode_fn: Callable[[List[Any]], np.ndarray],
+        key: Callable[[Any], str] = str,
+    ) -> np.ndarray:
+        """Embeddings for items, one row each, encoding only cache misses with `encode_fn`."""
+        keys = [content_key(key(item), self.model_name, self.runtime) for item in items]
+        found: Dict[str, np.ndarray] = {}
+        missing = self._from_memory(keys, found)
+        if missing and self.persistent:
+            missing = self._load(missing, found)
+        encoded, elapsed = np.empty((0, 0), dtype=np.float32), 0.0
+        if missing:
+            start = time.perf_counter()
+            encoded = encode_fn(self._miss_items(items, keys, missing))
+            elapsed = time.perf_counter() - start
+        fresh = self._finish(missing, encoded, found, elapsed)
+        if fresh and self.persistent:
+            self._store(fresh)
+        return self._stack(keys, found)
+
+    async def aencode(
+        self,
+        items: Sequence[Any],
+        aencode_fn: Callable[[List[Any]], Awaitable[np.ndarray]],
+        key: Callable[[Any], str] = str,
+    ) -> np.ndarray:
+        """Async variant of `encode`; new entries are written to the table in the background."""
+        keys = [content_key(key(item), self.model_name, self.runtime) for item in items]
+        found: Dict[str, np.ndarray] = {}
+        missing = self._from_memory(keys, found)
+        if missing and self.persistent:
+            missing = await self._aload(missing, found)
+        encoded, elapsed = np.empty((0, 0), dtype=np.float32), 0.0
+        if missing:
+            start = time.perf_counter()
+            encoded = await aencode_fn(self._miss_items(items, keys, missing))
+            elapsed = time.perf_counter() - start
+        fresh = self._finish(missing, encoded, found, elapsed)
+        if fresh and self.persistent:
+            self._background(self._astore(fresh))
+        return self._stack(keys, found)
+
+    def _background(self, write: Awaitable[None]) -> None:
+        task = asyncio.create_task(write)
+        self._writes.add(task)
+        task.add_done_callback(self._writes.discard)
+
+    def _select(self, keys: List[str]):
+        return select(EmbeddingCacheEntry.content_hash, EmbeddingCacheEntry.embedding, EmbeddingCacheEntry.last_used_at)\
+            .where(EmbeddingCacheEntry.content_hash.in_(keys))
+
+    def _touch(self, keys: List[str]):
+        return update(EmbeddingCacheEntry)\
+            .where(EmbeddingCacheEntry.content_hash.in_(keys))\
+            .values(last_used_at=func.now())
+
+    def _insert(self, vectors: Dict[str, np.ndarray]):
+        return insert(EmbeddingCacheEntry).values(self._rows(vectors)).on_conflict_do_nothing()
+
+    def _loaded(self, rows, missing: List[str], found: Dict[str, np.ndarray]) -> Tuple[List[str], List[str]]:
+        """Keys still missing, and the loaded keys whose `last_used_at` is due for a refresh."""
+        loaded = {row.content_hash: row.embedding for row in rows}
+        self._store_hits.inc(len(loaded))
+        self._remember(loaded, found)
+        cutoff = datetime.now(timezone.utc) - _TOUCH_AFTER
+        stale = [row.content_hash for row in rows if row.last_used_at < cutoff]
+        return [key for key in missing if key not in loaded], stale
+
+    def _load(self, missing: List[str], found: Dict[str, np.ndarray]) -> List[str]:
+        try:
+            with SessionLocal() as db:
+                rows = db.execute(self._select(missing)).all()
+        except SQLAlchemyError:
+            logger.warning("embedding cache lookup failed; encoding instead", exc_info=True)
+            return missing
+        missing, stale = self._loaded(rows, missing, found)
+        if stale:
+            self._refresh(stale)
+        return missing
+
+    async def _aload(self, missing: List[str], found: Dict[str, np.ndarray]) -> List[str]:
+        try:
+            async with AsyncSessionLocal() as db:
+                rows = (await db.execute(self._select(missing))).all()
+        except SQLAlchemyError:
+            logger.warning("embedding cache lookup failed; encoding instead", exc_info=True)
+            return missing
+        missing, stale = self._loaded(rows, missing, found)
+        if stale:
+            self._background(self._arefresh(stale))
+        return missing
+
+    def _store(self, vectors: Dict[str, np.ndarray]) -> None:
+        try:
+            with SessionLocal() as db:
+                db.execute(self._insert(vectors))
+                db.commit()
+        except SQLAlchemyError:
+            logger.warning("embedding cache write failed", exc_info=True)
+
+    async def _astore(self, vectors: Dict[str, np.ndarray]) -> None:
+        try:
+            async with AsyncSessionLocal() as db:
+                await db.execute(self._insert(vectors))
+                await db.commit()
+        except SQLAlchemyError:
+            logger.warning("embedding cache write failed", exc_info=True)
+
+    def _refresh(self, keys: List[str]) -> None:
+        try:
+            with SessionLocal() as db:
+                db.execute(self._touch(keys))
+                db.commit()
+        except SQLAlchemyError:
+            logger.warning("embedding cache last_used_at refresh failed", exc_info=True)
+
+    async def _arefresh(self, keys: List[str]) -> None:
+        try:
+            async with AsyncSessionLocal() as db:
+                await db.execute(self._touch(keys))
+                await db.commit()
+        except SQLAlchemyError:
+            logger.warning("embedding cache last_used_at refresh failed", exc_info=True)
@@ -0,0 +1,151 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import Callable, List, Sequence
+
+import numpy as np
+
+from app.core.metrics import registry
+from app.services.chunker import Chunk
+
+
+@dataclass
+class _Pending:
+    chunks: List[Chunk]
+    future: Future
+    enqueued_at: float = field(default_factory=time.monotonic)
+
+
+class EmbeddingBatcher:
+    """
+    Collect chunks from concurrent callers and encode them in shared batches.
+
+    Every `submit` call gets its own Future resolving to a (len(chunks), dim)
+    float32 array. A single background thread drains the queue: it takes the
+    first pending request, then keeps pulling requests until either
+    `max_batch_size` chunks are collected or `max_wait_ms` has elapsed, and runs
+    one `encode_fn` call over the whole batch.
+
+    Parameters
+    ----------
+    encode_fn : Callable[[List[Chunk]], np.ndarray]
+        Encodes a list of tokenized chunks into a 2-D array, one row per chunk.
+    max_batch_size : int
+        Upper bound on chunks per model call. A single request larger than this
+        is still encoded in one call on its own.
+    max_wait_ms : float
+        How long the first request of a batch may wait for others to join.
+    name : str
+        Prefix for the metrics reported by this batcher.
+    """
+
+    def __init__(
+        self,
+        encode_fn: Callable[[List[Chunk]], np.ndarray],
+        max_batch_size: int = 32,
+        max_wait_ms: float = 5.0,
+        name: str = "embedding_batcher",
+    ):
+        self._encode_fn = encode_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue: "queue.Queue[_Pending | None]" = queue.Queue()
+        self._thread: threading.Thread | None = None
+        self._lock = threading.Lock()
+        self._closed = False
+
+        self._batch_size = registry.histogram(f"{name}.batch_size", "chunks per model call")
+        self._queue_wait = registry.histogram(f"{name}.queue_wait_ms", "time from submit to batch start")
+        self._encode_ms = registry.histogram(f"{name}.encode_ms", "model time per batch")
+        registry.gauge(f"{name}.queue_depth", self._queue.qsize, "requests waiting for a batch")
+
+    def submit(self, chunks: Sequence[Chunk]) -> Future:
+        """Queue chunks for encoding and return a Future of their embeddings."""
+        future: Future = Future()
+        if not chunks:
+            future.set_result(np.empty((0, 0), dtype=np.float32))
+            return future
+        if self._closed:
+            raise RuntimeError("EmbeddingBatcher is closed")
+        self._ensure_started()
+        self._queue.put(_Pending(chunks=list(chunks), future=future))
+        return future
+
+    def encode(self, chunks: Sequence[Chunk]) -> np.ndarray:
+        """Blocking convenience wrapper around `submit`."""
+        return self.submit(chunks).result()
+
+    def close(self) -> None:
+        """Stop the worker thread after the queued requests are served."""
+        self._closed = True
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+
+    def _ensure_started(self) -> None:
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="embedding-batcher", daemon=True
+                )
+                self._thread.start()
+
+    def _collect(self, first: _Pending) -> tuple[List[_Pending], bool]:
+        batch = [first]
+        size = len(first.chunks)
+        deadline = time.monotonic() + self.max_wait
+        while size < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is None:
+                return batch, True
+            batch.append(item)
+            size += len(item.chunks)
+        return batch, False
+
+    def _run(self) -> None:
+        while True:
+            first = self._queue.get()
+            if first is None:
+                return
+            batch, stop = self._collect(first)
+            self._process(batch)
+            if stop:
+                return
+
+    def _process(self, batch: List[_Pending]) -> None:
+        # drop callers that gave up while waiting
+        batch = [p for p in batch if p.future.set_running_or_notify_cancel()]
+        if not batch:
+            return
+
+        started = time.monotonic()
+        chunks: List[Chunk] = []
+        for pending in batch:
+            self._queue_wait.observe((started - pending.enqueued_at) * 1000.0)
+            chunks.extend(pending.chunks)
+        self._batch_size.observe(len(chunks))
+
+        try:
+            with self._encode_ms.time():
+                vectors = np.asarray(self._encode_fn(chunks), dtype=np.float32)
+        except Exception as e:
+            for pending in batch:
+                pending.future.set_exception(e)
+            return
+
+        offset = 0
+        for pending in batch:
+            n = len(pending.chunks)
+            pending.future.set_result(vectors[offset : offset + n])
+            offset += n
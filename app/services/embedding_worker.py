@@ -0,0 +1,225 @@
+import asyncio
+import logging
+import multiprocessing
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Tuple
+
+import numpy as np
+from sqlalchemy import delete, func, select, update
+
+from app.core.metrics import registry
+from app.core.settings import settings
+from app.db.engine import AsyncSessionLocal
+from app.models.conversation import Conversation
+from app.models.message import EmbeddingStatus, Message
+from app.models.message_embeddings import MessageEmbedding
+from app.services.persistence import insert_embeddings
+from app.services.vector_index import bump_embeddings_version
+
+logger = logging.getLogger(__name__)
+
+_embedded = registry.counter("embedding_worker.messages", "messages embedded by the worker")
+_failed = registry.counter("embedding_worker.failures", "messages marked failed")
+_batch_size = registry.histogram("embedding_worker.batch_size", "messages claimed per batch")
+_batch_ms = registry.histogram("embedding_worker.batch_ms", "claim to commit, per batch")
+_lag_ms = registry.histogram("embedding_worker.lag_ms", "message stored to embedding committed")
+_depth = {"value": 0, "oldest_seconds": 0.0}
+registry.gauge("embedding_worker.queue_depth", lambda: _depth["value"], "pending messages at the last poll")
+registry.gauge("embedding_worker.queue_lag_s", lambda: _depth["oldest_seconds"], "age of the oldest pending message")
+
+
+def _init_process() -> None:
+    # each pool process loads its own copy of the model once, before the first batch
+    from app.services.model_registry import model_registry
+    model_registry.warm_up()
+
+
+def embed_texts(texts: List[str]) -> List[List[Tuple[str, np.ndarray]]]:
+    """
+    Chunk and embed several messages with one model call; runs inside a pool process.
+
+    Returns one list of (chunk_text, float32 vector) per input text.
+    """
+    from app.services.embeddings import _cache, _encode, _model_text, chunk_text
+
+    chunked = [chunk_text(text) for text in texts]
+    flat = [chunk for chunks in chunked for chunk in chunks]
+    vectors = _cache.encode(flat, _encode, key=_model_text)
+    results, offset = [], 0
+    for chunks in chunked:
+        results.append([(c.text, v) for c, v in zip(chunks, vectors[offset : offset + len(chunks)])])
+        offset += len(chunks)
+    return results
+
+
+async def queue_stats(db) -> Dict[str, float]:
+    """Number of pending messages and the age in seconds of the oldest one."""
+    row = (await db.execute(
+        select(
+            func.count(),
+            func.coalesce(func.extract('epoch', func.now() - func.min(Message.created_at)), 0),
+        ).where(Message.embedding_status == EmbeddingStatus.Pending)
+    )).one()
+    _depth["value"], _depth["oldest_seconds"] = int(row[0]), float(row[1])
+    return {"depth": int(row[0]), "oldest_pending_seconds": float(row[1])}
+
+
+async def retry_failed(db) -> int:
+    """Put every failed message back in the queue; returns how many were reset."""
+    result = await db.execute(
+        update(Message)
+        .where(Message.embedding_status == EmbeddingStatus.Failed)
+        .values(embedding_status=EmbeddingStatus.Pending)
+    )
+    await db.commit()
+    return result.rowcount
+
+
+async def embed_pending(db, pool: ProcessPoolExecutor, batch_size: int) -> int:
+    """
+    Claim up to `batch_size` pending messages, embed them on the pool and store the vectors.
+
+    Rows are claimed with `FOR UPDATE SKIP LOCKED`, so any number of workers
+    can drain the queue without handing out the same message twice. Embedding
+    rows and the status change commit together, which means retrieval (an
+    inner join on `message_embeddings`) only ever sees fully embedded messages.
+    If the process dies mid-batch the transaction rolls back and the rows are
+    simply claimed again.
+
+    Returns
+    -------
+    int
+        Messages processed; 0 when the queue was empty.
+    """
+    loop = asyncio.get_running_loop()
+    rows = (await db.execute(
+        select(
+            Message.id,
+            Message.conversation_id,
+            Message.content,
+            Conversation.user_id,
+            func.extract('epoch', func.now() - Message.created_at).label("age"),
+        )
+        .join(Conversation, Conversation.id == Message.conversation_id)
+        .where(Message.embedding_status == EmbeddingStatus.Pending)
+        .order_by(Message.created_at)
+        .limit(batch_size)
+        .with_for_update(of=Message, skip_locked=True)
+    )).all()
+    if not rows:
+        await db.commit()
+        return 0
+
+    ids = [row.id for row in rows]
+    claimed = time.monotonic()
+    _batch_size.observe(len(rows))
+    with _batch_ms.time():
+        try:
+            embeddings = await loop.run_in_executor(pool, embed_texts, [row.content or "" for row in rows])
+        except Exception:
+            logger.exception("embedding a batch of %d messages failed", len(rows))
+            await db.execute(
+                update(Message).where(Message.id.in_(ids)).values(embedding_status=EmbeddingStatus.Failed)
+            )
+            await db.commit()
+            _failed.inc(len(rows))
+            return len(rows)
+
+        # re-embedding (e.g. after a model change) replaces whatever the message had
+        await db.execute(delete(MessageEmbedding).where(MessageEmbedding.message_id.in_(ids)))
+        await insert_embeddings(db, [
+            {
+                "id": uuid.uuid4(),
+                "message_id": row.id,
+                "conversation_id": row.conversation_id,
+                "user_id": row.user_id,
+                "chunk_index": idx,
+                "text_chunk": text,
+                "embedding_model": settings.embed_model_name,
+                "embedding": vec,
+            }
+            for row, chunks in zip(rows, embeddings)
+            for idx, (text, vec) in enumerate(chunks)
+        ])
+        await db.execute(
+            update(Message).where(Message.id.in_(ids)).values(embedding_status=EmbeddingStatus.Done)
+        )
+        await bump_embeddings_version(db, {row.conversation_id for row in rows})
+        await db.commit()
+
+    _embedded.inc(len(rows))
+    elapsed = time.monotonic() - claimed
+    for row in rows:
+        _lag_ms.observe((float(row.age) + elapsed) * 1000.0)
+    return len(rows)
+
+
+class EmbeddingWorker:
+    """
+    Drains the pending-embedding queue with a pool of model processes.
+
+    Runs outside the API workers (see scripts/embedding_worker.py). One
+    claim loop per process keeps every process busy: while one batch is being
+    encoded, the others are claiming or writing theirs.
+
+    Parameters
+    ----------
+    processes : int
+        Pool processes, each holding its own copy of the model.
+    batch_size : int
+        Messages claimed per batch.
+    poll_seconds : float
+        Sleep between polls once the queue is empty.
+    """
+
+    def __init__(self, processes: int = 2, batch_size: int | None = None, poll_seconds: float | None = None):
+        self.processes = processes
+        self.batch_size = batch_size or settings.embedding_worker_batch_size
+        self.poll_seconds = poll_seconds if poll_seconds is not None else settings.embedding_worker_poll_seconds
+        # spawn, not fork: the parent holds an event loop and pooled database connections
+        self.pool = ProcessPoolExecutor(
+            max_workers=processes,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_process,
+        )
+
+    async def _loop(self) -> None:
+        while True:
+            async with AsyncSessionLocal() as db:
+                processed = await embed_pending(db, self.pool, self.batch_size)
+            if processed == 0:
+                await asyncio.sleep(self.poll_seconds)
+
+    async def _report(self, every: float = 10.0) -> None:
+        while True:
+            async with AsyncSessionLocal() as db:
+                stats = await queue_stats(db)
+            logger.info(
+                "embedding queue: %d pending, oldest %.1fs, %d embedded, %d failed",
+                stats["depth"], stats["oldest_pending_seconds"], _embedded.value, _failed.value,
+            )
+            await asyncio.sleep(every)
+
+    async def _drain_loop(self) -> int:
+        total = 0
+        while True:
+            async with AsyncSessionLocal() as db:
+                processed = await embed_pending(db, self.pool, self.batch_size)
+            if processed == 0:
+                return total
+            total += processed
+
+    async def drain(self) -> int:
+        """Work until the queue is empty instead of polling forever; returns messages processed."""
+        try:
+            return sum(await asyncio.gather(*(self._drain_loop() for _ in range(self.processes))))
+        finally:
+            self.pool.shutdown()
+
+    async def run(self) -> None:
+        try:
+            await asyncio.gather(self._report(), *(self._loop() for _ in range(self.processes)))
+        finally:
+            self.pool.shutdown(cancel_futures=True)
@@ -0,0 +1,178 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Tuple
+
+import numpy as np
+
+from app.core.settings import settings
+from app.services.chunker import Chunk, chunk_document, query_chunk
+from app.services.embedding_backends import encode_ids
+from app.services.embedding_cache import EmbeddingCache
+from app.services.embedding_queue import EmbeddingBatcher
+from app.services.model_registry import model_registry
+
+
+def _encode(chunks: List[Chunk]) -> np.ndarray:
+    """Run the configured embedding backend on pre-tokenized chunks."""
+    return encode_ids(
+        model_registry.embedder,
+        model_registry.tokenizer,
+        [c.input_ids for c in chunks],
+        batch_size=settings.embed_max_batch_size,
+    )
+
+
+def _model_text(chunk: Chunk) -> str:
+    return chunk.model_text
+
+
+# shared by every in-flight request so concurrent turns are encoded together
+_batcher = EmbeddingBatcher(
+    _encode,
+    max_batch_size=settings.embed_max_batch_size,
+    max_wait_ms=settings.embed_max_wait_ms,
+)
+
+# identical texts (greetings, pasted prompts, repeated queries) are encoded once per model
+_cache = EmbeddingCache(
+    settings.embed_model_name,
+    maxsize=settings.embed_cache_size,
+    persistent=settings.embed_cache_persistent,
+    runtime=f"{settings.embed_backend}/{settings.embed_onnx_quantization}",
+)
+
+
+async def _aencode(chunks: List[Chunk]) -> np.ndarray:
+    return await asyncio.wrap_future(_batcher.submit(chunks))
+
+
+# tokenization/chunking is CPU-bound; keep it off the event loop and out of the default threadpool
+_cpu_executor = ThreadPoolExecutor(
+    max_workers=settings.embed_cpu_workers,
+    thread_name_prefix="embed-cpu",
+)
+
+
+def chunk_text(text: str, max_len: int | None = None) -> List[Chunk]:
+    """
+    Split text into sentence-aligned, overlapping passage chunks, tokenizing it once.
+
+    Parameters
+    ----------
+    text : str
+        Input text to chunk.
+    max_len : int | None
+        Content tokens per chunk; defaults to the model's usable window
+        (`embed_max_seq_length` minus special tokens and the passage prefix).
+
+    Returns
+    -------
+    List[Chunk]
+        Chunks with their source text and model-ready input ids.
+    """
+    return chunk_document(
+        text,
+        model_registry.tokenizer,
+        prefix=settings.embed_passage_prefix,
+        max_seq_length=settings.embed_max_seq_length,
+        overlap=settings.embed_chunk_overlap_tokens,
+        max_tokens=max_len or settings.embed_chunk_max_tokens,
+    )
+
+
+def encode_chunks(chunks: List[Chunk]) -> np.ndarray:
+    """Embeddings for already chunked text, through the cache and the shared batcher."""
+    return _cache.encode(chunks, _batcher.encode, key=_model_text)
+
+
+def get_embeddings(text: str) -> List[Tuple[str, List[float]]]:
+    """
+    Split long text into passage chunks, embed each, and return list of (chunk_text, embedding).
+
+    Parameters
+    ----------
+    text : str
+        Text to embed.
+
+    Returns
+    -------
+    List[Tuple[str, List[float]]]
+        Each item is (chunk_text, embedding_vector_as_list).
+    """
+    chunks = chunk_text(text)
+    embeddings = encode_chunks(chunks)
+
+    results: List[Tuple[str, List[float]]] = []
+    for chunk, vec in zip(chunks, embeddings):
+        results.append((chunk.text, vec.astype(np.float32).tolist()))
+    return results
+
+
+def _query_chunk(query: str) -> Chunk:
+    return query_chunk(
+        query,
+        model_registry.tokenizer,
+        prefix=settings.embed_query_prefix,
+        max_seq_length=settings.embed_max_seq_length,
+    )
+
+
+def embed_query(query: str) -> np.ndarray:
+    """
+    Embed a retrieval query (with the query prefix) through the embedding cache and the shared batcher.
+
+    Parameters
+    ----------
+    query : str
+        Search query string.
+
+    Returns
+    -------
+    np.ndarray
+        Normalized float32 query vector.
+    """
+    return encode_chunks([_query_chunk(query)])[0]
+
+
+async def aget_embeddings(text: str) -> List[Tuple[str, List[float]]]:
+    """
+    Async variant of `get_embeddings`.
+
+    Chunking runs on the dedicated CPU executor and encoding of cache misses
+    on the batcher thread, so the event loop only awaits their futures.
+    """
+    loop = asyncio.get_running_loop()
+    chunks = await loop.run_in_executor(_cpu_executor, chunk_text, text)
+    embeddings = await _cache.aencode(chunks, _aencode, key=_model_text)
+    return [(chunk.text, vec.astype(np.float32).tolist()) for chunk, vec in zip(chunks, embeddings)]
+
+
+def _chunk_texts(texts: List[str]) -> List[List[Chunk]]:
+    return [chunk_text(text) for text in texts]
+
+
+async def aembed_texts(texts: List[str]) -> List[List[Tuple[str, np.ndarray]]]:
+    """
+    Chunk and embed many messages together, e.g. a bulk import batch.
+
+    One executor hop chunks every text and one cache/batcher pass encodes all
+    chunks, so large batches keep the model busy. Returns one list of
+    (chunk_text, float32 vector) per input text, like the worker's `embed_texts`.
+    """
+    loop = asyncio.get_running_loop()
+    chunked = await loop.run_in_executor(_cpu_executor, _chunk_texts, texts)
+    flat = [chunk for chunks in chunked for chunk in chunks]
+    vectors = await _cache.aencode(flat, _aencode, key=_model_text) if flat else []
+    results, offset = [], 0
+    for chunks in chunked:
+        results.append([(c.text, v) for c, v in zip(chunks, vectors[offset : offset + len(chunks)])])
+        offset += len(chunks)
+    return results
+
+
+async def aembed_query(query: str) -> np.ndarray:
+    """Async variant of `embed_query`."""
+    loop = asyncio.get_running_loop()
+    chunk = await loop.run_in_executor(_cpu_executor, _query_chunk, query)
+    vectors = await _cache.aencode([chunk], _aencode, key=_model_text)
+    return vectors[0]
@@ -0,0 +1,238 @@
+import json
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict, deque
+from dataclasses import asdict, dataclass
+from typing import Deque, List, Optional
+from uuid import UUID
+
+from app.core.metrics import registry
+from app.core.settings import settings
+
+
+@dataclass
+class CachedMessage:
+    """The subset of a `Message` row needed to rebuild chat history."""
+    id: str
+    role: str
+    content: str
+    token_count: int
+    content_tokens: int | None = None
+
+    @classmethod
+    def from_message(cls, message) -> "CachedMessage":
+        role = message.role.value if hasattr(message.role, "value") else message.role
+        return cls(
+            id=str(message.id),
+            role=role,
+            content=message.content,
+            token_count=message.token_count,
+            content_tokens=message.content_tokens,
+        )
+
+
+class HistoryCache(ABC):
+    """
+    Ring buffer of the latest `size` messages per conversation.
+
+    An entry is only ever created by `fill` with the conversation's true latest
+    window (read from Postgres on a miss); `append` extends an existing entry
+    and is a no-op when there is none, so a cached window is never partial.
+    Entries expire after `ttl` seconds as a backstop against a fill racing a
+    concurrent write.
+    """
+
+    def __init__(self, size: int, ttl: float):
+        self.size = size
+        self.ttl = ttl
+
+    @abstractmethod
+    async def get(self, conversation_id: UUID) -> Optional[List[CachedMessage]]:
+        """Cached window in chronological order, or None on a miss."""
+
+    @abstractmethod
+    async def fill(self, conversation_id: UUID, messages: List[CachedMessage]) -> None:
+        """Replace the window with `messages` (chronological, newest last)."""
+
+    @abstractmethod
+    async def append(self, conversation_id: UUID, message: CachedMessage) -> None:
+        """Write-through of a newly stored message."""
+
+    @abstractmethod
+    async def invalidate(self, conversation_id: UUID) -> None:
+        """Drop the window, e.g. after a message or the conversation is deleted."""
+
+
+class InMemoryHistoryCache(HistoryCache):
+    """
+    Per-process LRU of conversation windows.
+
+    Only coherent when a single process serves all writes for a conversation;
+    with several API workers use the Redis backend instead.
+    """
+
+    def __init__(self, size: int, ttl: float, max_conversations: int = 10_000):
+        super().__init__(size, ttl)
+        self.max_conversations = max_conversations
+        self._data: "OrderedDict[UUID, tuple[float, Deque[CachedMessage]]]" = OrderedDict()
+
+    async def get(self, conversation_id: UUID) -> Optional[List[CachedMessage]]:
+        item = self._data.get(conversation_id)
+        if item is None:
+            return None
+        expires_at, window = item
+        if expires_at <= time.time():
+            del self._data[conversation_id]
+            return None
+        self._data.move_to_end(conversation_id)
+        return list(window)
+
+    async def fill(self, conversation_id: UUID, messages: List[CachedMessage]) -> None:
+        self._data[conversation_id] = (time.time() + self.ttl, deque(messages, maxlen=self.size))
+        self._data.move_to_end(conversation_id)
+        while len(self._data) > self.max_conversations:
+            self._data.popitem(last=False)
+
+    async def append(self, conversation_id: UUID, message: CachedMessage) -> None:
+        item = self._data.get(conversation_id)
+        if item is not None:
+            item[1].append(message)
+
+    async def invalidate(self, conversation_id: UUID) -> None:
+        self._data.pop(conversation_id, None)
+
+
+class RedisHistoryCache(HistoryCache):
+    """
+    Redis list per conversation, trimmed to the latest `size` entries.
+
+    Only plain list commands are used (RPUSH/RPUSHX/LTRIM/LRANGE/EXPIRE), so
+    any Redis-protocol server, or an in-process stand-in such as
+    `fakeredis.aioredis.FakeRedis`, can back it.
+
+    Parameters
+    ----------
+    client : redis.asyncio.Redis | None
+        Client to use; built from `url` when omitted.
+    url : str | None
+        Redis URL, e.g. `redis://localhost:6379/0`.
+    """
+
+    def __init__(self, size: int, ttl: float, client=None, url: str | None = None, prefix: str = "history:"):
+        super().__init__(size, ttl)
+        if client is None:
+            import redis.asyncio as redis
+            client = redis.from_url(url)
+        self.client = client
+        self.prefix = prefix
+
+    def _key(self, conversation_id: UUID) -> str:
+        return f"{self.prefix}{conversation_id}"
+
+    async def get(self, conversation_id: UUID) -> Optional[List[CachedMessage]]:
+        raw = await self.client.lrange(self._key(conversation_id), 0, -1)
+        if not raw:
+            return None
+        return [CachedMessage(**json.loads(item)) for item in raw]
+
+    async def fill(self, conversation_id: UUID, messages: List[CachedMessage]) -> None:
+        if not messages:
+            return
+        key = self._key(conversation_id)
+        async with self.client.pipeline(transaction=True) as pipe:
+            pipe.delete(key)
+            pipe.rpush(key, *(json.dumps(asdict(m)) for m in messages[-self.size:]))
+            pipe.expire(key, int(self.ttl))
+            await pipe.execute()
+
+    async def append(self, conversation_id: UUID, message: CachedMessage) -> None:
+        key = self._key(conversation_id)
+        async with self.client.pipeline(transaction=True) as pipe:
+            # RPUSHX only pushes onto an existing list, so a missing window stays missing
+            pipe.rpushx(key, json.dumps(asdict(message)))
+            pipe.ltrim(key, -self.size, -1)
+            pipe.expire(key, int(self.ttl))
+            await pipe.execute()
+
+    async def invalidate(self, conversation_id: UUID) -> None:
+        await self.client.delete(self._key(conversation_id))
+
+
+_hits = registry.counter("history_cache.hits")
+_misses = registry.counter("history_cache.misses")
+_hit_ms = registry.histogram("history_cache.hit_ms", "history served from the cache")
+_db_ms = registry.histogram("history_cache.db_fetch_ms", "history loaded from Postgres on a miss")
+registry.gauge(
+    "history_cache.hit_ratio",
+    lambda: _hits.value / ((_hits.value + _misses.value) or 1),
+)
+registry.gauge(
+    "history_cache.saved_ms_per_hit",
+    lambda: max(_db_ms.mean - _hit_ms.mean, 0.0) if _db_ms.count and _hit_ms.count else 0.0,
+    "mean Postgres fetch latency minus mean cache hit latency",
+)
+
+_history_cache: HistoryCache | None = None
+_history_cache_built = False
+
+
+def get_history_cache() -> HistoryCache | None:
+    """The configured backend (`history_cache_backend`), or None when caching is off."""
+    global _history_cache, _history_cache_built
+    if not _history_cache_built:
+        backend = settings.history_cache_backend
+        if backend == "memory":
+            _history_cache = InMemoryHistoryCache(settings.history_cache_size, settings.history_cache_ttl)
+        elif backend == "redis":
+            _history_cache = RedisHistoryCache(
+                settings.history_cache_size, settings.history_cache_ttl, url=settings.redis_url
+            )
+        elif backend != "none":
+            raise ValueError(f"Unknown history_cache_backend: {backend!r}")
+        _history_cache_built = True
+    return _history_cache
+
+
+async def get_cached_history(k: int, conversation_id: UUID, load) -> List[CachedMessage]:
+    """
+    Latest k messages (chronological), served from the cache when possible.
+
+    Parameters
+    ----------
+    k : int
+        Number of messages wanted; must not exceed `history_cache_size` for the cache to be used.
+    conversation_id : UUID
+        Conversation identifier.
+    load : Callable[[int], Awaitable[list]]
+        Fallback that loads the latest n messages from Postgres as ORM rows.
+    """
+    cache = get_history_cache()
+    if cache is None or k > cache.size:
+        return [CachedMessage.from_message(m) for m in await load(k)]
+
+    start = time.perf_counter()
+    window = await cache.get(conversation_id)
+    if window is not None:
+        _hits.inc()
+        _hit_ms.observe((time.perf_counter() - start) * 1000.0)
+        return window[-k:]
+
+    _misses.inc()
+    start = time.perf_counter()
+    window = [CachedMessage.from_message(m) for m in await load(cache.size)]
+    _db_ms.observe((time.perf_counter() - start) * 1000.0)
+    await cache.fill(conversation_id, window)
+    return window[-k:]
+
+
+async def append_to_history(message) -> None:
+    """Write-through hook for a committed `Message`."""
+    cache = get_history_cache()
+    if cache is not None:
+        await cache.append(message.conversation_id, CachedMessage.from_message(message))
+
+
+async def invalidate_history(conversation_id: UUID) -> None:
+    cache = get_history_cache()
+    if cache is not None:
+        await cache.invalidate(conversation_id)
@@ -0,0 +1,127 @@
+import asyncio
+import hashlib
+import logging
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Dict, Generic, Hashable, Tuple, TypeVar
+
+from fastapi import HTTPException
+from starlette.status import HTTP_422_UNPROCESSABLE_ENTITY
+
+from app.core.cache import TTLCache
+from app.core.metrics import registry
+from app.core.settings import settings
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+def request_fingerprint(body: str) -> str:
+    """sha256 of a request body, so a key reused for a different request is caught."""
+    return hashlib.sha256(body.encode("utf-8")).hexdigest()
+
+
+@dataclass
+class _Flight(Generic[T]):
+    fingerprint: str
+    task: "asyncio.Task[T]"
+
+
+class IdempotencyStore(Generic[T]):
+    """
+    Single-flight execution and short-lived replay of requests carrying an idempotency key.
+
+    The first request with a key starts the work as a task of its own; requests
+    with the same key that arrive while it runs await that task instead of
+    starting another, and requests that arrive after it succeeded get its result
+    from a TTL cache. Because the work is not tied to the request that started
+    it, a client that times out and retries joins the original computation
+    rather than repeating it. Failures are not remembered, so a retry after an
+    error runs again.
+
+    Keys are per worker; retries routed to another worker are not deduplicated.
+
+    Parameters
+    ----------
+    maxsize : int
+        Completed results kept for replay; the least recently used are dropped first.
+    ttl : float
+        Seconds a completed result is replayed for.
+    name : str
+        Metrics prefix.
+    """
+
+    def __init__(self, maxsize: int, ttl: float, name: str = "idempotency"):
+        self._inflight: Dict[Hashable, _Flight[T]] = {}
+        self._done: TTLCache[Tuple[str, T]] = TTLCache(maxsize, ttl, f"{name}.results")
+        self.executed = registry.counter(f"{name}.executed", "keyed requests that ran")
+        self.coalesced = registry.counter(f"{name}.coalesced", "requests that joined an in-flight request with the same key")
+        self.replayed = registry.counter(f"{name}.replayed", "requests answered from a completed request with the same key")
+        self.conflicts = registry.counter(f"{name}.conflicts", "keys reused with a different request body")
+        registry.gauge(f"{name}.in_flight", lambda: len(self._inflight))
+
+    async def run(self, key: Hashable, fingerprint: str, fn: Callable[[], Awaitable[T]]) -> T:
+        """
+        Result of `fn()` for `key`, computing it at most once while it is in flight or remembered.
+
+        Parameters
+        ----------
+        key : Hashable
+            Idempotency key, scoped by the caller (e.g. with the user and conversation).
+        fingerprint : str
+            Identifies the request body; see `request_fingerprint`.
+        fn : Callable[[], Awaitable[T]]
+            The work; must not depend on the calling request's lifetime (e.g. its database session).
+
+        Raises
+        ------
+        HTTPException
+            422 when the key was used for a request with a different body.
+        """
+        done = self._done.get(key)
+        if done is not None:
+            self._check(done[0], fingerprint)
+            self.replayed.inc()
+            return done[1]
+
+        flight = self._inflight.get(key)
+        if flight is None:
+            flight = _Flight(fingerprint, asyncio.create_task(fn()))
+            self._inflight[key] = flight
+            flight.task.add_done_callback(lambda task: self._finish(key, flight))
+            self.executed.inc()
+        else:
+            self._check(flight.fingerprint, fingerprint)
+            self.coalesced.inc()
+        # shielded: a waiter that goes away does not cancel the work for the others
+        return await asyncio.shield(flight.task)
+
+    def _check(self, stored: str, fingerprint: str) -> None:
+        if stored != fingerprint:
+            self.conflicts.inc()
+            raise HTTPException(
+                status_code=HTTP_422_UNPROCESSABLE_ENTITY,
+                detail="Idempotency-Key was already used for a different request"
+            )
+
+    def _finish(self, key: Hashable, flight: _Flight[T]) -> None:
+        if self._inflight.get(key) is flight:
+            del self._inflight[key]
+        task = flight.task
+        if task.cancelled():
+            return
+        if task.exception() is not None:
+            logger.info("request with idempotency key %s failed; not stored for replay", key)
+            return
+        self._done.set(key, (flight.fingerprint, task.result()))
+
+
+_idempotency_store: IdempotencyStore | None = None
+
+
+def get_idempotency_store() -> IdempotencyStore:
+    """The process-wide store behind the chat route's `Idempotency-Key` header."""
+    global _idempotency_store
+    if _idempotency_store is None:
+        _idempotency_store = IdempotencyStore(settings.idempotency_max_keys, settings.idempotency_ttl)
+    return _idempotency_store
@@ -0,0 +1,266 @@
+import asyncio
+import logging
+import time
+import uuid
+from dataclasses import dataclass
+from datetime import datetime
+from typing import AsyncIterator, Awaitable, Callable, List, Optional, Tuple
+from uuid import UUID
+
+import numpy as np
+from fastapi import HTTPException
+from pydantic import BaseModel, ValidationError
+from sqlalchemy import insert, select, update
+from sqlalchemy.exc import SQLAlchemyError
+from starlette.status import HTTP_422_UNPROCESSABLE_ENTITY, HTTP_500_INTERNAL_SERVER_ERROR
+
+from app.core.metrics import registry
+from app.core.settings import settings
+from app.db.engine import AsyncSessionLocal
+from app.models.message import EmbeddingStatus, Message, MessageRole
+from app.services.embeddings import aembed_texts
+from app.services.history_cache import invalidate_history
+from app.services.message import allocate_message_counts
+from app.services.persistence import insert_embeddings
+from app.services.tokens import count_tokens
+from app.services.vector_index import bump_embeddings_version
+
+logger = logging.getLogger(__name__)
+
+EmbedFn = Callable[[List[str]], Awaitable[List[List[Tuple[str, np.ndarray]]]]]
+
+_imported = registry.counter("import.messages", "messages inserted by bulk imports")
+_embedded = registry.counter("import.embedded", "imported messages embedded by the import pipeline")
+_deferred = registry.counter("import.left_pending", "imported messages left to the embedding worker")
+_embed_ms = registry.histogram("import.embed_batch_ms", "chunk + embed + vector insert, per batch")
+
+
+class ImportMessage(BaseModel):
+    """One JSONL line of a transcript."""
+    role: MessageRole
+    content: str
+    created_at: Optional[datetime] = None
+    # running token count; computed from content when omitted
+    token_count: Optional[int] = None
+    provider: Optional[str] = None
+    model: Optional[str] = None
+
+
+@dataclass
+class ImportStats:
+    messages: int = 0
+    embedded: int = 0
+    chunks: int = 0
+    seconds: float = 0.0
+
+    @property
+    def messages_per_second(self) -> float:
+        return self.messages / self.seconds if self.seconds else 0.0
+
+
+async def aiter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    """Split a byte stream (e.g. `Request.stream()`) into lines without buffering more than one line."""
+    pending = b""
+    async for chunk in chunks:
+        pending += chunk
+        *lines, pending = pending.split(b"\n")
+        for line in lines:
+            yield line.decode("utf-8")
+    if pending:
+        yield pending.decode("utf-8")
+
+
+async def _parse(lines: AsyncIterator[str], batch_size: int) -> AsyncIterator[List[ImportMessage]]:
+    batch: List[ImportMessage] = []
+    number = 0
+    async for line in lines:
+        number += 1
+        if not line.strip():
+            continue
+        try:
+            batch.append(ImportMessage.model_validate_json(line))
+        except ValidationError as e:
+            raise HTTPException(
+                status_code=HTTP_422_UNPROCESSABLE_ENTITY,
+                detail=f"line {number}: {e.errors()[0]['msg']}"
+            )
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+async def _insert_batch(db, conversation_id: UUID, batch: List[ImportMessage], token_count: int) -> Tuple[List[dict], int]:
+    """Insert one batch of messages as `Pending` in its own transaction; returns the rows and the running token count."""
+    first = await allocate_message_counts(db, conversation_id, len(batch))
+    rows = []
+    for i, message in enumerate(batch):
+        content_tokens = count_tokens(message.content)
+        token_count = message.token_count if message.token_count is not None else token_count + content_tokens
+        row = {
+            "id": uuid.uuid4(),
+            "conversation_id": conversation_id,
+            "message_count": first + i,
+            "role": message.role,
+            "content": message.content,
+            "token_count": token_count,
+            "content_tokens": content_tokens,
+            "embedding_status": EmbeddingStatus.Pending,
+            "provider": message.provider,
+            "model": message.model,
+        }
+        if message.created_at is not None:
+            row["created_at"] = message.created_at
+        rows.append(row)
+    # rows with and without created_at would need different INSERT shapes; split them
+    with_time = [r for r in rows if "created_at" in r]
+    without_time = [r for r in rows if "created_at" not in r]
+    for group in (with_time, without_time):
+        if group:
+            await db.execute(insert(Message), group)
+    await db.commit()
+    return rows, token_count
+
+
+async def _embed_batch(rows: List[dict], user_id: UUID, embed: EmbedFn, stats: ImportStats) -> None:
+    """
+    Embed one inserted batch and mark it `Done`, in a session of its own.
+
+    Claims the rows with `FOR UPDATE SKIP LOCKED`, the embedding worker's
+    protocol, so a worker running at the same time never embeds them twice.
+    """
+    async with AsyncSessionLocal() as db:
+        claimed = set((await db.scalars(
+            select(Message.id)
+            .where(Message.id.in_([r["id"] for r in rows]), Message.embedding_status == EmbeddingStatus.Pending)
+            .with_for_update(skip_locked=True)
+        )).all())
+        rows = [r for r in rows if r["id"] in claimed]
+        if not rows:
+            await db.commit()
+            return
+        embeddings = await embed([r["content"] for r in rows])
+        vectors = [
+            {
+                "id": uuid.uuid4(),
+                "message_id": row["id"],
+                "conversation_id": row["conversation_id"],
+                "user_id": user_id,
+                "chunk_index": idx,
+                "text_chunk": text,
+                "embedding_model": settings.embed_model_name,
+                "embedding": vec,
+            }
+            for row, chunks in zip(rows, embeddings)
+            for idx, (text, vec) in enumerate(chunks)
+        ]
+        await insert_embeddings(db, vectors)
+        await bump_embeddings_version(db, {row["conversation_id"] for row in rows})
+        await db.execute(
+            update(Message).where(Message.id.in_([r["id"] for r in rows])).values(embedding_status=EmbeddingStatus.Done)
+        )
+        await db.commit()
+    stats.embedded += len(rows)
+    stats.chunks += len(vectors)
+    _embedded.inc(len(rows))
+
+
+async def _embed_stage(queue: "asyncio.Queue[List[dict] | None]", user_id: UUID, embed: EmbedFn, stats: ImportStats) -> None:
+    while (rows := await queue.get()) is not None:
+        try:
+            with _embed_ms.time():
+                await _embed_batch(rows, user_id, embed, stats)
+        except Exception:
+            # the rows stay Pending, so the embedding worker finishes them later
+            logger.exception("embedding an import batch of %d messages failed; left pending", len(rows))
+            _deferred.inc(len(rows))
+
+
+async def import_messages(
+    db,
+    conversation_id: UUID,
+    user_id: UUID,
+    lines: AsyncIterator[str],
+    batch_size: int | None = None,
+    embed: EmbedFn | None = None,
+) -> ImportStats:
+    """
+    Append a JSONL transcript to a conversation, embedding it as it goes.
+
+    A three-stage pipeline with bounded memory: lines are parsed as they
+    arrive, every `import_batch_size` messages are inserted with one
+    multi-row `INSERT` and committed as `Pending`, and a concurrent stage
+    chunks, embeds and stores the vectors of inserted batches, marking them
+    `Done`. At most `import_pipeline_depth` inserted batches wait for the
+    embedding stage; when it falls behind, parsing pauses. With
+    `embedding_mode = 'deferred'`, or when a batch fails to embed, messages
+    are left `Pending` for the embedding worker, so an interrupted import
+    never leaves messages invisible to retrieval for good.
+
+    Each line is an `ImportMessage`: `{"role": "user", "content": "...",
+    "created_at": "2024-01-01T12:00:00Z"}`; lines are appended in order after
+    the conversation's existing messages.
+
+    Parameters
+    ----------
+    db : AsyncSession
+        Session used for the insert stage.
+    conversation_id : UUID
+        Conversation to append to; must belong to `user_id`.
+    user_id : UUID
+        Owner of the conversation, denormalized onto each embedding row.
+    lines : AsyncIterator[str]
+        JSONL lines, e.g. `aiter_lines(request.stream())`.
+    batch_size : int | None
+        Messages per insert batch; defaults to `import_batch_size`.
+    embed : EmbedFn | None
+        Coroutine turning texts into (chunk_text, vector) lists; defaults to
+        the in-process batcher (`aembed_texts`). The CLI passes a process pool.
+
+    Returns
+    -------
+    ImportStats
+        Messages inserted and embedded, chunks stored and elapsed seconds.
+        Batches committed before a parse error stay imported.
+    """
+    batch_size = batch_size or settings.import_batch_size
+    embed = embed or aembed_texts
+    stats = ImportStats()
+    start = time.perf_counter()
+
+    queue: "asyncio.Queue[List[dict] | None]" = asyncio.Queue(maxsize=settings.import_pipeline_depth)
+    embedder = None
+    if settings.embedding_mode != "deferred":
+        embedder = asyncio.create_task(_embed_stage(queue, user_id, embed, stats))
+
+    try:
+        last = await db.scalar(
+            select(Message.token_count)
+            .where(Message.conversation_id == conversation_id)
+            .order_by(Message.message_count.desc())
+            .limit(1)
+        )
+        token_count = last or 0
+        async for batch in _parse(lines, batch_size):
+            rows, token_count = await _insert_batch(db, conversation_id, batch, token_count)
+            stats.messages += len(rows)
+            _imported.inc(len(rows))
+            if embedder is not None:
+                # blocks while the embedding stage is import_pipeline_depth batches behind
+                await queue.put(rows)
+    except SQLAlchemyError:
+        await db.rollback()
+        raise HTTPException(
+            status_code=HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to store messages after {stats.messages} were imported"
+        )
+    finally:
+        if embedder is not None:
+            await queue.put(None)
+            await embedder
+        await invalidate_history(conversation_id)
+        stats.seconds = time.perf_counter() - start
+    if embedder is None:
+        _deferred.inc(stats.messages)
+    return stats
@@ -0,0 +1,262 @@
+import threading
+import time
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set, Tuple
+from uuid import UUID
+
+import httpx
+from langchain_core.callbacks import BaseCallbackHandler, CallbackManagerForLLMRun
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage, HumanMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_openai import ChatOpenAI
+from fastapi import HTTPException
+from starlette.status import HTTP_400_BAD_REQUEST
+
+from app.core.metrics import registry
+from app.core.settings import settings
+
+OPENAI_PROVIDER = "openai"
+FAKE_PROVIDER = "fake"
+
+
+class EchoChatModel(BaseChatModel):
+    """
+    Offline stand-in for a real chat model.
+
+    Replies with the last human message, prefixed with `prefix`, and streams it
+    back word by word. Token usage is reported as whitespace-separated word
+    counts in the same `token_usage` shape OpenAI uses, so callers that read
+    `response_metadata["token_usage"]` work unchanged.
+    """
+
+    prefix: str = "echo: "
+    # seconds to wait before replying, standing in for model latency
+    delay: float = 0.0
+
+    @property
+    def _llm_type(self) -> str:
+        return "echo"
+
+    def _reply(self, messages: List[BaseMessage]) -> str:
+        last_human = next(
+            (m.content for m in reversed(messages) if isinstance(m, HumanMessage)), ""
+        )
+        return f"{self.prefix}{last_human}"
+
+    @staticmethod
+    def _usage(messages: List[BaseMessage], reply: str) -> dict:
+        prompt_tokens = sum(len(str(m.content).split()) for m in messages)
+        completion_tokens = len(reply.split())
+        return {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        }
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        time.sleep(self.delay)
+        reply = self._reply(messages)
+        usage = self._usage(messages, reply)
+        message = AIMessage(
+            content=reply,
+            response_metadata={"token_usage": usage},
+            usage_metadata={
+                "input_tokens": usage["prompt_tokens"],
+                "output_tokens": usage["completion_tokens"],
+                "total_tokens": usage["total_tokens"],
+            },
+        )
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _stream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> Iterator[ChatGenerationChunk]:
+        time.sleep(self.delay)
+        reply = self._reply(messages)
+        words = reply.split(" ")
+        for i, word in enumerate(words):
+            text = word if i == len(words) - 1 else word + " "
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=text))
+            if run_manager:
+                run_manager.on_llm_new_token(text, chunk=chunk)
+            yield chunk
+        usage = self._usage(messages, reply)
+        yield ChatGenerationChunk(
+            message=AIMessageChunk(
+                content="",
+                usage_metadata={
+                    "input_tokens": usage["prompt_tokens"],
+                    "output_tokens": usage["completion_tokens"],
+                    "total_tokens": usage["total_tokens"],
+                },
+            )
+        )
+
+
+class _LatencyCallback(BaseCallbackHandler):
+    """Records call latency, time to first token and errors of one provider in the metrics registry."""
+
+    run_inline = True
+
+    def __init__(self, provider: str):
+        self.latency = registry.histogram(f"llm.{provider}.latency_ms", "request start to last token")
+        self.first_token = registry.histogram(f"llm.{provider}.first_token_ms", "request start to first streamed token")
+        self.errors = registry.counter(f"llm.{provider}.errors")
+        self._started: Dict[UUID, float] = {}
+        self._streaming: Set[UUID] = set()
+
+    def on_chat_model_start(self, serialized, messages, *, run_id: UUID, **kwargs: Any) -> None:
+        self._started[run_id] = time.perf_counter()
+
+    def on_llm_new_token(self, token: str, *, run_id: UUID, **kwargs: Any) -> None:
+        start = self._started.get(run_id)
+        if start is not None and run_id not in self._streaming:
+            self._streaming.add(run_id)
+            self.first_token.observe((time.perf_counter() - start) * 1000.0)
+
+    def on_llm_end(self, response, *, run_id: UUID, **kwargs: Any) -> None:
+        self._streaming.discard(run_id)
+        start = self._started.pop(run_id, None)
+        if start is not None:
+            self.latency.observe((time.perf_counter() - start) * 1000.0)
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        self._streaming.discard(run_id)
+        self._started.pop(run_id, None)
+        self.errors.inc()
+
+
+class ProviderRegistry:
+    """
+    Long-lived chat model clients, one per (provider, model).
+
+    Clients are built on first use and reused by every later request, so
+    OpenAI calls go through one pooled `httpx` client per provider and reuse
+    its keep-alive connections instead of opening (and TLS-handshaking) a new
+    connection per turn. Each provider's calls are timed into
+    `llm.<provider>.latency_ms` / `llm.<provider>.first_token_ms`.
+
+    Requested models are checked against `llm_models`; a provider without an
+    entry there (such as the fake one) accepts any model name.
+    """
+
+    def __init__(self):
+        self._factories: Dict[str, Callable[[str], BaseChatModel]] = {
+            OPENAI_PROVIDER: self._openai,
+            FAKE_PROVIDER: lambda model: EchoChatModel(
+                delay=settings.llm_fake_delay_ms / 1000.0, callbacks=[self._callback(FAKE_PROVIDER)]
+            ),
+        }
+        self._models: Dict[Tuple[str, str], BaseChatModel] = {}
+        self._callbacks: Dict[str, _LatencyCallback] = {}
+        self._http: Dict[str, Tuple[httpx.Client, httpx.AsyncClient]] = {}
+        self._lock = threading.Lock()
+
+    def register(self, provider: str, factory: Callable[[str], BaseChatModel]) -> None:
+        """Add a provider; `factory(model)` is called once per model and its result reused."""
+        self._factories[provider] = factory
+
+    def get(self, provider: str, model: str | None = None) -> BaseChatModel:
+        if provider == FAKE_PROVIDER and not settings.llm_fake_enabled:
+            raise HTTPException(
+                status_code=HTTP_400_BAD_REQUEST,
+                detail="The fake provider is disabled"
+            )
+        factory = self._factories.get(provider)
+        if factory is None:
+            raise HTTPException(
+                status_code=HTTP_400_BAD_REQUEST,
+                detail=f"Unknown provider '{provider}'"
+            )
+        allowed = settings.llm_models.get(provider)
+        if model is None:
+            model = allowed[0] if allowed else provider
+        elif allowed is not None and model not in allowed:
+            raise HTTPException(
+                status_code=HTTP_400_BAD_REQUEST,
+                detail=f"Model '{model}' is not available for provider '{provider}'"
+            )
+
+        key = (provider, model)
+        with self._lock:
+            llm = self._models.get(key)
+            if llm is None:
+                llm = self._models[key] = factory(model)
+        return llm
+
+    def http_clients(self, provider: str) -> Tuple[httpx.Client, httpx.AsyncClient]:
+        """The provider's shared sync and async HTTP clients, with `llm_*` pool limits."""
+        with self._lock:
+            clients = self._http.get(provider)
+            if clients is None:
+                limits = httpx.Limits(
+                    max_connections=settings.llm_max_connections,
+                    max_keepalive_connections=settings.llm_max_keepalive_connections,
+                    keepalive_expiry=settings.llm_keepalive_expiry_seconds,
+                )
+                timeout = httpx.Timeout(settings.llm_timeout_seconds)
+                clients = self._http[provider] = (
+                    httpx.Client(limits=limits, timeout=timeout),
+                    httpx.AsyncClient(limits=limits, timeout=timeout),
+                )
+        return clients
+
+    def _callback(self, provider: str) -> _LatencyCallback:
+        with self._lock:
+            callback = self._callbacks.get(provider)
+            if callback is None:
+                callback = self._callbacks[provider] = _LatencyCallback(provider)
+        return callback
+
+    def _openai(self, model: str) -> BaseChatModel:
+        http_client, http_async_client = self.http_clients(OPENAI_PROVIDER)
+        return ChatOpenAI(
+            model=model,
+            api_key=settings.OPENAI_API_KEY,
+            base_url=settings.openai_base_url,
+            stream_usage=True,
+            http_client=http_client,
+            http_async_client=http_async_client,
+            callbacks=[self._callback(OPENAI_PROVIDER)],
+        )
+
+    async def aclose(self) -> None:
+        """Close the pooled HTTP clients; models built afterwards get fresh ones."""
+        with self._lock:
+            http, self._http = self._http, {}
+            self._models.clear()
+        for client, async_client in http.values():
+            client.close()
+            await async_client.aclose()
+
+
+llm_registry = ProviderRegistry()
+
+
+def get_chat_model(provider: str, model: str | None = None) -> BaseChatModel:
+    """
+    Return the chat model to use for a request.
+
+    Parameters
+    ----------
+    provider : str
+        Provider named in the request; `"fake"` selects the offline echo model.
+    model : str | None
+        Model named in the request; the provider's first `llm_models` entry when omitted.
+
+    Returns
+    -------
+    BaseChatModel
+        A shared LangChain chat model supporting `invoke` and `astream`.
+    """
+    return llm_registry.get(provider, model)
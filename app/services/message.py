@@ -1,69 +1,121 @@
-from sqlalchemy.orm import Session
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.exc import SQLAlchemyError
-from app.schemas.messages import MessageCreate, MessageRead
+from app.schemas.messages import MessageCreate, MessagePage, MessageRead
 from app.models.message import Message
+from app.models.conversation import Conversation
+from app.services.history_cache import append_to_history, invalidate_history
+from app.services.pagination import decode_cursor, split_page
+from app.services.tokens import count_tokens
 from fastapi import HTTPException
 from starlette.status import HTTP_500_INTERNAL_SERVER_ERROR, HTTP_404_NOT_FOUND
 from uuid import UUID
 from typing import List
 
-def create_message(
-        db: Session,
+async def allocate_message_counts(db: AsyncSession, conversation_id: UUID, n: int = 1) -> int:
+    """
+    Reserve the next n values of a conversation's message sequence and return the first.
+
+    Locks the conversation row until the caller's transaction ends, so concurrent
+    turns in the same conversation get consecutive, non-overlapping numbers.
+    The max() is a single backward step on the (conversation_id, message_count) index.
+    """
+    await db.execute(
+        select(Conversation.id)\
+        .where(Conversation.id == conversation_id)\
+        .with_for_update()
+    )
+    last = await db.scalar(
+        select(func.max(Message.message_count))\
+        .where(Message.conversation_id == conversation_id)
+    )
+    return (last or 0) + 1
+
+
+async def create_message(
+        db: AsyncSession,
         message: MessageCreate
 )->MessageRead:
     try:
+        message_count = message.message_count
+        if message_count is None:
+            message_count = await allocate_message_counts(db, message.conversation_id)
         new_message = Message(
             conversation_id = message.conversation_id,
-            message_count = message.message_count,
+            message_count = message_count,
             role = message.role,
             content = message.content,
             token_count = message.token_count,
+            content_tokens = count_tokens(message.content),
             provider = getattr(message,"provider",None),
             model = getattr(message,"model",None)
         )
         db.add(new_message)
-        db.commit()
-        db.refresh(new_message)
-        return new_message
+        await db.commit()
+        await db.refresh(new_message)
     
     except SQLAlchemyError:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status_code=HTTP_500_INTERNAL_SERVER_ERROR,
             detail=' Failed to Create new message'
         )
+    if message.message_count is None:
+        await append_to_history(new_message)
+    else:
+        # a caller-chosen position need not be the newest; let the next read refill the window
+        await invalidate_history(message.conversation_id)
+    return new_message
     
-def get_messages(
-        db: Session, 
+async def get_messages(
+        db: AsyncSession, 
         conversation_id: UUID,
-        skip: int, 
+        cursor: str | None,
         limit: int
-)-> List[MessageRead]:
+)-> MessagePage:
+    """
+    One page of a conversation's messages in chronological order.
+
+    Keyset pagination on the conversation's message sequence: each page is a
+    range scan of the (conversation_id, message_count) index starting after
+    the cursor, so deep pages cost the same as the first. `message_count` is
+    used rather than `created_at` because messages stored in one transaction
+    (a user message and its reply) share the same timestamp.
+    """
+    stmt = select(Message).where(Message.conversation_id == conversation_id)
+    if cursor is not None:
+        (after,) = decode_cursor(cursor, int)
+        stmt = stmt.where(Message.message_count > after)
     try:
-            
-        messages =  db.query(Message)\
-                    .filter(Message.conversation_id == conversation_id)\
-                    .offset(skip)\
-                    .limit(limit)\
-                    .all()
-        if not messages:
-            raise HTTPException(
-                status_code=HTTP_404_NOT_FOUND,
-                detail="No messsages for given conversation id"
-            )
-        return messages
+        result = await db.execute(
+                    stmt\
+                    .order_by(Message.message_count)\
+                    .limit(limit + 1)
+                )
+        messages = result.scalars().all()
     except SQLAlchemyError:
         raise HTTPException(
             status_code=HTTP_500_INTERNAL_SERVER_ERROR,
             detail = "Unable to get data from DB"
         )
+    if not messages and cursor is None:
+        raise HTTPException(
+            status_code=HTTP_404_NOT_FOUND,
+            detail="No messsages for given conversation id"
+        )
+    items, next_cursor = split_page(messages, limit, key=lambda m: (m.message_count,))
+    return MessagePage(items=items, next_cursor=next_cursor)
     
 
-def get_k_messages(k: int, conversation_id: UUID, db: Session) -> List[MessageRead]:
+async def get_k_messages(k: int, conversation_id: UUID, db: AsyncSession) -> List[MessageRead]:
     """Return k latest messages in ASC order"""
-    messages = db.query(Message)\
-               .filter(Message.conversation_id == conversation_id)\
-               .order_by(Message.created_at.asc())\
-               .limit(k)\
-               .all()
-    return messages
\ No newline at end of file
+    # newest k via a backward scan of the (conversation_id, message_count) index, then flip to chronological
+    result = await db.execute(
+                select(Message)\
+                .where(Message.conversation_id == conversation_id)\
+                .order_by(Message.message_count.desc())\
+                .limit(k)
+             )
+    messages = result.scalars().all()
+    messages.reverse()
+    return messages
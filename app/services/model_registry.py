@@ -0,0 +1,136 @@
+import gc
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict
+
+from app.core.metrics import registry as metrics_registry
+from app.core.settings import settings
+from app.services.embedding_backends import build_embedder
+
+logger = logging.getLogger(__name__)
+
+
+def _rss_bytes() -> int:
+    """Current resident set size of this process (0 where /proc is unavailable)."""
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return 0
+
+
+class ModelRegistry:
+    """
+    Lazily constructed, process-wide holder for the embedding model and tokenizer.
+
+    Nothing heavy is imported or loaded until `embedder` / `tokenizer` is first
+    accessed (or `warm_up` is called), so routes and tools that never embed
+    text never pay for torch, transformers or the model weights.
+
+    When `warm_up` runs before the server forks its workers (e.g. gunicorn
+    `--preload` with `embed_preload=true`), the weights are inherited by every
+    worker copy-on-write instead of being loaded once per worker.
+    """
+
+    def __init__(self, model_name: str, backend: str = "torch", dim: int | None = None):
+        self.model_name = model_name
+        self.backend = backend
+        self.dim = dim
+        self._embedder = None
+        self._tokenizer = None
+        self._lock = threading.Lock()
+        self.load_seconds: Dict[str, float] = {}
+        self.resident_bytes: Dict[str, int] = {}
+
+    @property
+    def embedder(self):
+        if self._embedder is None:
+            with self._lock:
+                if self._embedder is None:
+                    self._embedder = self._load("embedder", self._build_embedder)
+        return self._embedder
+
+    @property
+    def tokenizer(self):
+        if self._tokenizer is None:
+            with self._lock:
+                if self._tokenizer is None:
+                    self._tokenizer = self._load("tokenizer", self._build_tokenizer)
+        return self._tokenizer
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._embedder is not None and self._tokenizer is not None
+
+    def _build_embedder(self):
+        embedder = build_embedder(
+            self.model_name,
+            self.backend,
+            onnx_dir=settings.embed_onnx_dir,
+            quantization=settings.embed_onnx_quantization,
+        )
+        actual = embedder.get_sentence_embedding_dimension()
+        if self.dim is not None and actual != self.dim:
+            raise RuntimeError(
+                f"{self.model_name} produces {actual}-d vectors but embed_dim is {self.dim}; "
+                "set EMBED_DIM and run scripts/reembed.py"
+            )
+        return embedder
+
+    def _build_tokenizer(self):
+        from transformers import AutoTokenizer
+        return AutoTokenizer.from_pretrained(self.model_name)
+
+    def _load(self, kind: str, build) -> Any:
+        rss_before = _rss_bytes()
+        start = time.perf_counter()
+        obj = build()
+        self.load_seconds[kind] = time.perf_counter() - start
+        self.resident_bytes[kind] = max(_rss_bytes() - rss_before, 0)
+        logger.info(
+            "loaded %s for %s in %.2fs (+%.0f MB RSS)",
+            kind, self.model_name, self.load_seconds[kind], self.resident_bytes[kind] / 2**20,
+        )
+        return obj
+
+    def warm_up(self) -> None:
+        """Load both models and run one forward pass so the first request is not the slow one."""
+        self.tokenizer
+        self.embedder.encode(["warm up"], convert_to_numpy=True, normalize_embeddings=True)
+
+    def freeze(self) -> None:
+        """
+        Move everything allocated so far out of the GC's tracked generations.
+
+        Called after a pre-fork load so the collector in each worker does not
+        write to (and thereby copy) the pages holding the model objects.
+        """
+        gc.collect()
+        gc.freeze()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "model": self.model_name,
+            "backend": self.backend,
+            "loaded": self.is_loaded,
+            "load_seconds": dict(self.load_seconds),
+            "resident_mb": {k: v / 2**20 for k, v in self.resident_bytes.items()},
+        }
+
+
+model_registry = ModelRegistry(settings.embed_model_name, settings.embed_backend, settings.embed_dim)
+
+metrics_registry.gauge(
+    "models.embedder.load_seconds",
+    lambda: model_registry.load_seconds.get("embedder"),
+    "time taken to load the embedding model",
+)
+metrics_registry.gauge(
+    "models.embedder.resident_mb",
+    lambda: model_registry.resident_bytes.get("embedder", 0) / 2**20,
+    "RSS growth attributed to loading the embedding model",
+)
+metrics_registry.gauge("process.rss_mb", lambda: _rss_bytes() / 2**20, "resident set size")
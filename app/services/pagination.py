@@ -0,0 +1,48 @@
+import base64
+import json
+from datetime import datetime
+from typing import Any, Callable, List, Sequence, Tuple, TypeVar
+
+from fastapi import HTTPException
+from starlette.status import HTTP_400_BAD_REQUEST
+
+T = TypeVar("T")
+
+
+def encode_cursor(*values: Any) -> str:
+    """Opaque cursor for the sort key of the last row on a page."""
+    raw = json.dumps([v.isoformat() if isinstance(v, datetime) else str(v) for v in values])
+    return base64.urlsafe_b64encode(raw.encode()).rstrip(b"=").decode()
+
+
+def decode_cursor(cursor: str, *parsers: Callable[[str], Any]) -> Tuple[Any, ...]:
+    """
+    Sort key stored in a cursor, each part converted by the matching parser.
+
+    Raises
+    ------
+    HTTPException
+        400 when the cursor was not produced by `encode_cursor` with the same key shape.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(raw)
+        if not isinstance(values, list) or len(values) != len(parsers):
+            raise ValueError(cursor)
+        return tuple(parse(value) for parse, value in zip(parsers, values))
+    except (ValueError, TypeError):
+        raise HTTPException(
+            status_code=HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
+
+
+def split_page(rows: Sequence[T], limit: int, key: Callable[[T], Tuple[Any, ...]]) -> Tuple[List[T], str | None]:
+    """
+    Turn a `limit + 1` row fetch into the page and the cursor that continues after it.
+
+    The extra row only signals that another page exists; the cursor is None on the last page.
+    """
+    page = list(rows[:limit])
+    next_cursor = encode_cursor(*key(page[-1])) if len(rows) > limit else None
+    return page, next_cursor
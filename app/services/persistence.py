@@ -0,0 +1,209 @@
+import asyncio
+import uuid
+from typing import List, Sequence, Tuple
+from uuid import UUID
+
+import numpy as np
+import psycopg
+from fastapi import HTTPException
+from pgvector import Bit, HalfVector
+from pgvector.psycopg import register_vector_async
+from sqlalchemy import insert
+from sqlalchemy.exc import SQLAlchemyError
+from starlette.status import HTTP_500_INTERNAL_SERVER_ERROR
+
+from app.core.metrics import registry
+from app.core.settings import settings
+from app.models.message import EmbeddingStatus, Message
+from app.models.message_embeddings import MessageEmbedding
+from app.schemas.messages import MessageCreate
+from app.services.embeddings import aget_embeddings
+from app.services.history_cache import append_to_history
+from app.services.message import allocate_message_counts
+from app.services.tokens import count_tokens
+from app.services.vector_index import add_to_index, bump_embeddings_version
+
+_EMBEDDING_COLUMNS = (
+    "id", "message_id", "conversation_id", "user_id", "chunk_index", "text_chunk", "embedding_model", "embedding",
+)
+_EMBEDDING_TYPES = ["uuid", "uuid", "uuid", "uuid", "int4", "text", "text", "vector"]
+_COMPACT_TYPES = {"embedding_half": "halfvec", "embedding_bit": "bit"}
+
+_commit_ms = registry.histogram("persistence.commit_ms", "time to commit one batch of messages")
+_rows = registry.counter("persistence.embedding_rows", "embedding rows written")
+
+
+async def _copy_embeddings(db, rows: List[dict]) -> None:
+    """
+    Stream embedding rows with binary COPY on the session's own connection.
+
+    Runs inside the session's transaction, so it commits or rolls back
+    together with the message rows.
+    """
+    connection = await db.connection()
+    raw = await connection.get_raw_connection()
+    if not raw.info.get("pgvector_registered"):
+        await register_vector_async(raw.driver_connection)
+        raw.info["pgvector_registered"] = True
+    compact = [c for c in _COMPACT_TYPES if c in rows[0]]
+    columns = ", ".join(_EMBEDDING_COLUMNS + tuple(compact))
+    async with raw.driver_connection.cursor() as cur:
+        async with cur.copy(
+            f"COPY {MessageEmbedding.__tablename__} ({columns}) FROM STDIN WITH (FORMAT BINARY)"
+        ) as copy:
+            copy.set_types(_EMBEDDING_TYPES + [_COMPACT_TYPES[c] for c in compact])
+            for row in rows:
+                values = [row[c] for c in _EMBEDDING_COLUMNS]
+                # the binary dumper is registered for ndarray, not plain lists
+                values[-1] = np.asarray(values[-1], dtype=np.float32)
+                if "embedding_half" in compact:
+                    values.append(HalfVector(row["embedding_half"]))
+                if "embedding_bit" in compact:
+                    values.append(Bit(row["embedding_bit"]))
+                await copy.write_row(values)
+
+
+def add_compact_vectors(rows: List[dict]) -> None:
+    """
+    Fill the halfvec / binary-quantized copies of each row's vector, as `embedding_compact` asks.
+
+    The bit form keeps the sign of every dimension, the same as pgvector's
+    `binary_quantize`, so rows written here match rows backfilled in SQL.
+    """
+    mode = settings.embedding_compact
+    half, bit = mode in ("halfvec", "both"), mode in ("bit", "both")
+    if not (half or bit):
+        return
+    for row in rows:
+        vec = np.asarray(row["embedding"], dtype=np.float32)
+        if half:
+            row["embedding_half"] = vec
+        if bit:
+            row["embedding_bit"] = Bit(vec > 0).to_text()
+
+
+async def insert_embeddings(db, rows: List[dict]) -> None:
+    """
+    Insert embedding rows without the ORM unit of work.
+
+    `embedding_insert_mode` picks between a multi-row `INSERT` (default) and
+    binary `COPY`, which skips formatting every vector as text. Compact copies
+    of the vectors are added first when `embedding_compact` is enabled.
+    """
+    if not rows:
+        return
+    add_compact_vectors(rows)
+    if settings.embedding_insert_mode == "copy":
+        await _copy_embeddings(db, rows)
+    else:
+        await db.execute(insert(MessageEmbedding), rows)
+    _rows.inc(len(rows))
+
+
+async def persist_messages(
+    db,
+    messages: Sequence[MessageCreate],
+    user_id: UUID,
+    embeddings: Sequence[List[Tuple[str, object]]] | None = None,
+) -> List[Message]:
+    """
+    Store messages of one conversation and all their chunk embeddings in a single transaction.
+
+    Messages go in with one `INSERT ... RETURNING` and embeddings with one bulk
+    insert; nothing is refreshed row by row. Messages without a `message_count`
+    get consecutive numbers from the conversation's sequence.
+
+    With `embedding_mode = 'deferred'` no embeddings are computed here: the
+    messages are stored as `EmbeddingStatus.Pending` and picked up by the
+    embedding worker, so the caller only waits for the insert.
+
+    Parameters
+    ----------
+    db : AsyncSession
+        SQLAlchemy session.
+    messages : Sequence[MessageCreate]
+        Messages in conversation order, all for the same conversation.
+    user_id : UUID
+        Owner of the conversation, denormalized onto each embedding row.
+    embeddings : Sequence[List[Tuple[str, vector]]] | None
+        Precomputed (chunk_text, vector) lists, one per message; computed here when
+        omitted, unless embedding is deferred.
+
+    Returns
+    -------
+    List[Message]
+        The stored messages, in the order given.
+    """
+    if not messages:
+        return []
+    conversation_id = messages[0].conversation_id
+    if any(m.conversation_id != conversation_id for m in messages):
+        raise ValueError("persist_messages expects messages from a single conversation")
+
+    deferred = embeddings is None and settings.embedding_mode == "deferred"
+    status = EmbeddingStatus.Pending if deferred else EmbeddingStatus.Done
+    if deferred:
+        embeddings = [[] for _ in messages]
+    elif embeddings is None:
+        # one gather lets the batcher encode every message of the turn in the same model call
+        embeddings = await asyncio.gather(*(aget_embeddings(m.content) for m in messages))
+
+    try:
+        next_count = None
+        if any(m.message_count is None for m in messages):
+            next_count = await allocate_message_counts(db, conversation_id, len(messages))
+
+        message_rows = []
+        for message in messages:
+            count = message.message_count
+            if count is None:
+                count, next_count = next_count, next_count + 1
+            message_rows.append({
+                "id": uuid.uuid4(),
+                "conversation_id": conversation_id,
+                "message_count": count,
+                "role": message.role,
+                "content": message.content,
+                "token_count": message.token_count,
+                "content_tokens": count_tokens(message.content),
+                "embedding_status": status,
+                "provider": message.provider,
+                "model": message.model,
+            })
+        result = await db.scalars(
+            insert(Message).returning(Message, sort_by_parameter_order=True),
+            message_rows,
+        )
+        stored = list(result.all())
+
+        embedding_rows = [
+            {
+                "id": uuid.uuid4(),
+                "message_id": msg.id,
+                "conversation_id": conversation_id,
+                "user_id": user_id,
+                "chunk_index": idx,
+                "text_chunk": chunk_text_value,
+                "embedding_model": settings.embed_model_name,
+                "embedding": vec,
+            }
+            for msg, chunks in zip(stored, embeddings)
+            for idx, (chunk_text_value, vec) in enumerate(chunks)
+        ]
+        await insert_embeddings(db, embedding_rows)
+        versions = await bump_embeddings_version(db, [conversation_id] if embedding_rows else [])
+
+        with _commit_ms.time():
+            await db.commit()
+    except (SQLAlchemyError, psycopg.Error):
+        await db.rollback()
+        raise HTTPException(
+            status_code=HTTP_500_INTERNAL_SERVER_ERROR,
+            detail='Failed to store messages'
+        )
+
+    for msg in stored:
+        await append_to_history(msg)
+    if embedding_rows:
+        add_to_index(conversation_id, stored, embedding_rows, versions[conversation_id])
+    return stored
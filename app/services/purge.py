@@ -0,0 +1,184 @@
+import asyncio
+import logging
+from datetime import timedelta
+from typing import List
+from uuid import UUID
+
+from sqlalchemy import delete, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.metrics import registry
+from app.core.settings import settings
+from app.db.engine import AsyncSessionLocal
+from app.models.conversation import Conversation
+from app.models.conversation_summary import ConversationSummary
+from app.models.embedding_cache import EmbeddingCacheEntry
+from app.models.message import Message
+from app.models.message_embeddings import MessageEmbedding
+
+logger = logging.getLogger(__name__)
+
+_purged_rows = registry.counter("purge.rows", "child rows of soft-deleted conversations removed")
+_purged_conversations = registry.counter("purge.conversations", "soft-deleted conversations removed")
+_batch_ms = registry.histogram("purge.batch_ms", "one purge transaction")
+_failures = registry.counter("purge.failures", "purge batches that raised")
+_expired_cache_rows = registry.counter("purge.embedding_cache_rows", "embedding_cache rows removed for disuse")
+
+# leaves first, so the ON DELETE CASCADE lookups behind each batch find nothing left to remove
+_CHILDREN = (
+    (MessageEmbedding, MessageEmbedding.conversation_id),
+    (Message, Message.conversation_id),
+    (ConversationSummary, ConversationSummary.conversation_id),
+)
+
+
+async def purge_batch(db: AsyncSession, batch_size: int | None = None) -> int:
+    """
+    Remove up to `batch_size` rows of the oldest soft-deleted conversation, in one transaction.
+
+    The conversation row is claimed with `FOR NO KEY UPDATE SKIP LOCKED`, so
+    several workers purge different conversations, and each transaction
+    (and the WAL and lock footprint it leaves) stays bounded however large
+    the conversation is. Once no children remain the conversation row itself
+    is deleted.
+
+    Parameters
+    ----------
+    db : AsyncSession
+        Session to run in; committed before returning.
+    batch_size : int | None
+        Rows to delete per transaction; defaults to `purge_batch_size`.
+
+    Returns
+    -------
+    int
+        Rows deleted; 0 when no soft-deleted conversation is left to claim.
+    """
+    batch_size = batch_size or settings.purge_batch_size
+    conversation_id = await db.scalar(
+        select(Conversation.id)
+        .where(Conversation.deleted_at.isnot(None))
+        .order_by(Conversation.deleted_at)
+        .limit(1)
+        .with_for_update(skip_locked=True, key_share=True)
+    )
+    if conversation_id is None:
+        await db.commit()
+        return 0
+
+    with _batch_ms.time():
+        for model, column in _CHILDREN:
+            ids = select(model.id).where(column == conversation_id).limit(batch_size).scalar_subquery()
+            result = await db.execute(delete(model).where(model.id.in_(ids)))
+            if result.rowcount:
+                await db.commit()
+                _purged_rows.inc(result.rowcount)
+                return result.rowcount
+        await db.execute(delete(Conversation).where(Conversation.id == conversation_id))
+        await db.commit()
+    _purged_conversations.inc()
+    logger.info("purged conversation %s", conversation_id)
+    return 1
+
+
+async def purge_conversation(db: AsyncSession, conversation_id: UUID, batch_size: int | None = None) -> int:
+    """
+    Remove one conversation and its rows in batches of `batch_size`, committing after each.
+
+    Used by scripts and benchmarks to purge a specific conversation without
+    waiting for the worker; the conversation need not be soft-deleted first.
+
+    Returns
+    -------
+    int
+        Rows deleted, the conversation included.
+    """
+    batch_size = batch_size or settings.purge_batch_size
+    total = 0
+    for model, column in _CHILDREN:
+        while True:
+            ids = select(model.id).where(column == conversation_id).limit(batch_size).scalar_subquery()
+            result = await db.execute(delete(model).where(model.id.in_(ids)))
+            await db.commit()
+            total += result.rowcount
+            if result.rowcount < batch_size:
+                break
+    result = await db.execute(delete(Conversation).where(Conversation.id == conversation_id))
+    await db.commit()
+    return total + result.rowcount
+
+
+async def expire_embedding_cache(db: AsyncSession, max_age: timedelta, batch_size: int | None = None) -> int:
+    """
+    Remove up to `batch_size` embedding_cache rows not read for `max_age`, in one transaction.
+
+    Rows are claimed with `FOR UPDATE SKIP LOCKED` on the `last_used_at`
+    index, so several workers (or the cleanup script) can expire at once.
+
+    Returns
+    -------
+    int
+        Rows deleted; fewer than `batch_size` once nothing older is left.
+    """
+    batch_size = batch_size or settings.purge_batch_size
+    keys = (
+        select(EmbeddingCacheEntry.content_hash)
+        .where(EmbeddingCacheEntry.last_used_at < func.now() - max_age)
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+        .scalar_subquery()
+    )
+    with _batch_ms.time():
+        result = await db.execute(delete(EmbeddingCacheEntry).where(EmbeddingCacheEntry.content_hash.in_(keys)))
+        await db.commit()
+    _expired_cache_rows.inc(result.rowcount)
+    return result.rowcount
+
+
+class PurgeWorker:
+    """
+    Background task that empties soft-deleted conversations and expires unused embedding_cache rows.
+
+    Conversations are purged with `conversation_delete_mode = 'soft'`, cache
+    rows when `embed_cache_ttl_days` is set; both in bounded batches. Batches
+    run back to back while there is work and the task sleeps
+    `purge_interval_seconds` once none is left.
+
+    Parameters
+    ----------
+    concurrency : int
+        Number of worker tasks; each claims a different conversation.
+    """
+
+    def __init__(self, concurrency: int = 1):
+        self.concurrency = concurrency
+        self._tasks: List[asyncio.Task] = []
+
+    def start(self) -> None:
+        for _ in range(self.concurrency):
+            self._tasks.append(asyncio.create_task(self._run()))
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks.clear()
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                async with AsyncSessionLocal() as db:
+                    if settings.conversation_delete_mode == "soft":
+                        while await purge_batch(db):
+                            pass
+                    if settings.embed_cache_persistent and settings.embed_cache_ttl_days is not None:
+                        max_age = timedelta(days=settings.embed_cache_ttl_days)
+                        while await expire_embedding_cache(db, max_age) == settings.purge_batch_size:
+                            pass
+            except Exception:
+                _failures.inc()
+                logger.exception("purge failed")
+            await asyncio.sleep(settings.purge_interval_seconds)
+
+
+purge_worker = PurgeWorker()
@@ -0,0 +1,215 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Hashable, Sequence, Tuple
+
+import numpy as np
+from langchain.schema import BaseMessage
+
+from app.core.metrics import registry
+from app.core.settings import settings
+from app.services.embedding_cache import normalize_text
+
+
+@dataclass
+class CachedResponse:
+    """An LLM reply and what producing it cost."""
+    content: str
+    prompt_tokens: int
+    completion_tokens: int
+    # duration of the LLM call that produced it; each hit saves about this much
+    latency_ms: float
+    # embedding of the prompt, for semantic matching; None in exact mode
+    vector: np.ndarray | None = None
+
+
+def context_hash(messages: Sequence[BaseMessage]) -> str:
+    """
+    sha256 over the type and content of every prompt message but the last (the user's input).
+
+    Covers the system prompt, summary, recent history and retrieved context,
+    so a reply is only reused when the model would see exactly the same context.
+    Every turn changes the history, so in practice hits are stateless repeats:
+    the same prompt opening different conversations, not a repeat within one.
+    """
+    digest = hashlib.sha256()
+    for message in messages[:-1]:
+        digest.update(message.type.encode("utf-8"))
+        digest.update(b"\x00")
+        digest.update(str(message.content).encode("utf-8"))
+        digest.update(b"\x00")
+    return digest.hexdigest()
+
+
+class ResponseCache:
+    """
+    Per-worker LRU of LLM replies keyed by (provider, model, normalized prompt, context hash).
+
+    Entries expire after `ttl` seconds. With a `threshold`, a prompt that
+    misses exactly may reuse the reply to an earlier prompt under the same
+    (provider, model, context) whose embedding has cosine similarity of at
+    least `threshold` with it. The embedding is the one retrieval already
+    computed for the turn, so matching costs no extra model call.
+
+    Parameters
+    ----------
+    maxsize : int
+        Maximum number of replies; the least recently used is evicted first.
+    ttl : float
+        Lifetime of a reply in seconds.
+    threshold : float | None
+        Minimum cosine similarity for a semantic hit; None = exact matches only.
+    name : str
+        Metrics prefix.
+    """
+
+    def __init__(self, maxsize: int, ttl: float, threshold: float | None = None, name: str = "response_cache"):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.threshold = threshold
+        self._data: "OrderedDict[Hashable, Tuple[float, CachedResponse]]" = OrderedDict()
+        # (provider, model, context hash) -> keys of _data, the candidates of a semantic lookup
+        self._groups: Dict[Hashable, Dict[Hashable, None]] = {}
+        self._lock = threading.Lock()
+        self.hits = registry.counter(f"{name}.hits", "exact prompt matches")
+        self.semantic_hits = registry.counter(f"{name}.semantic_hits", "near-duplicate prompt matches")
+        self.misses = registry.counter(f"{name}.misses")
+        self.evictions = registry.counter(f"{name}.evictions")
+        self.latency_saved_ms = registry.counter(f"{name}.latency_saved_ms", "LLM time of the replies served from cache")
+        registry.gauge(f"{name}.size", lambda: len(self._data))
+        registry.gauge(f"{name}.hit_ratio", self.hit_ratio)
+
+    def hit_ratio(self) -> float | None:
+        hits = self.hits.value + self.semantic_hits.value
+        total = hits + self.misses.value
+        return hits / total if total else None
+
+    @staticmethod
+    def _keys(provider: str, model: str, prompt: str, context: Sequence[BaseMessage]) -> Tuple[Hashable, Hashable]:
+        group = (provider, model, context_hash(context))
+        return group, (*group, normalize_text(prompt))
+
+    def get(
+        self,
+        provider: str,
+        model: str,
+        prompt: str,
+        context: Sequence[BaseMessage],
+        vector: np.ndarray | None = None,
+    ) -> CachedResponse | None:
+        """
+        The cached reply for this prompt in this context, or None.
+
+        Parameters
+        ----------
+        provider, model : str
+            Model the turn is routed to.
+        prompt : str
+            The user's input.
+        context : Sequence[BaseMessage]
+            The assembled prompt, ending with the user's input.
+        vector : np.ndarray | None
+            Embedding of `prompt`; enables semantic matching when a threshold is set.
+        """
+        group, key = self._keys(provider, model, prompt, context)
+        now = time.time()
+        with self._lock:
+            entry = self._lookup(key, now)
+            counter = self.hits
+            if entry is None and self.threshold is not None and vector is not None:
+                entry = self._nearest(group, vector, now)
+                counter = self.semantic_hits
+        if entry is None:
+            self.misses.inc()
+            return None
+        counter.inc()
+        self.latency_saved_ms.inc(entry.latency_ms)
+        return entry
+
+    def set(
+        self,
+        provider: str,
+        model: str,
+        prompt: str,
+        context: Sequence[BaseMessage],
+        response: CachedResponse,
+    ) -> None:
+        group, key = self._keys(provider, model, prompt, context)
+        if response.vector is not None:
+            vector = np.asarray(response.vector, dtype=np.float32)
+            norm = np.linalg.norm(vector)
+            response.vector = vector / norm if norm else vector
+        with self._lock:
+            self._data[key] = (time.time() + self.ttl, response)
+            self._data.move_to_end(key)
+            self._groups.setdefault(group, {})[key] = None
+            while len(self._data) > self.maxsize:
+                old, _ = self._data.popitem(last=False)
+                self._forget(old)
+                self.evictions.inc()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self._groups.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def _lookup(self, key: Hashable, now: float) -> CachedResponse | None:
+        item = self._data.get(key)
+        if item is None:
+            return None
+        expires_at, entry = item
+        if expires_at <= now:
+            del self._data[key]
+            self._forget(key)
+            return None
+        self._data.move_to_end(key)
+        return entry
+
+    def _nearest(self, group: Hashable, vector: np.ndarray, now: float) -> CachedResponse | None:
+        keys = []
+        for key in list(self._groups.get(group, ())):
+            expires_at, entry = self._data[key]
+            if expires_at <= now:
+                del self._data[key]
+                self._forget(key)
+            elif entry.vector is not None:
+                keys.append(key)
+        if not keys:
+            return None
+        matrix = np.stack([self._data[key][1].vector for key in keys])
+        query = np.asarray(vector, dtype=np.float32)
+        scores = matrix @ (query / (np.linalg.norm(query) or 1.0))
+        best = int(np.argmax(scores))
+        if scores[best] < self.threshold:
+            return None
+        return self._lookup(keys[best], now)
+
+    def _forget(self, key: Hashable) -> None:
+        group = key[:3]
+        members = self._groups.get(group)
+        if members is not None:
+            members.pop(key, None)
+            if not members:
+                del self._groups[group]
+
+
+_response_cache: ResponseCache | None = None
+
+
+def get_response_cache() -> ResponseCache | None:
+    """The process-wide response cache, or None when `response_cache_mode` is 'off'."""
+    global _response_cache
+    if settings.response_cache_mode == "off":
+        return None
+    if _response_cache is None:
+        _response_cache = ResponseCache(
+            settings.response_cache_size,
+            settings.response_cache_ttl,
+            threshold=settings.response_cache_similarity if settings.response_cache_mode == "semantic" else None,
+        )
+    return _response_cache
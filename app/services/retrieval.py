@@ -0,0 +1,401 @@
+import enum
+from dataclasses import dataclass
+from typing import Dict, List, Tuple
+from uuid import UUID
+
+import numpy as np
+from langchain.schema import HumanMessage
+from pgvector import Bit
+from sqlalchemy import Float, Text, cast, func, literal_column, null, select
+from sqlalchemy.dialects.postgresql import TSQUERY
+
+from app.core.metrics import registry
+from app.core.settings import settings
+from app.models.conversation import Conversation
+from app.models.message import Message
+from app.models.message_embeddings import TEXT_SEARCH_CONFIG, MessageEmbedding
+from app.services.diversity import collapse_per_message, dedupe_chunks, mmr
+from app.services.embeddings import aembed_query
+from app.services.vector_index import ConversationIndex, get_vector_index
+
+_candidates_dropped = registry.counter(
+    "retrieval.candidates_dropped", "retrieved chunks dropped as duplicates or extra chunks of a message"
+)
+
+
+class RetrievalScope(str, enum.Enum):
+    Conversation = 'conversation'   # only the current conversation
+    User = 'user'                   # every conversation owned by the user
+
+
+@dataclass
+class RetrievedChunk:
+    """One retrieved chunk of a stored message, best first."""
+    message_id: UUID
+    role: str
+    text: str
+    distance: float
+    # fused reciprocal-rank score in hybrid mode, None for vector-only search
+    score: float | None = None
+
+
+async def _apply_search_knobs(db, ef_search: int | None, probes: int | None) -> None:
+    """
+    Set per-query ANN tuning parameters for the current transaction only.
+
+    `set_config(..., true)` is the bind-parameter friendly form of `SET LOCAL`,
+    so the values never leak to other requests sharing the pooled connection.
+    """
+    if ef_search is not None:
+        await db.execute(select(func.set_config('hnsw.ef_search', str(ef_search), True)))
+    if probes is not None:
+        await db.execute(select(func.set_config('ivfflat.probes', str(probes), True)))
+    if settings.retrieval_iterative_scan:
+        # keep scanning the graph until enough rows pass the scope filter (pgvector >= 0.8)
+        await db.execute(select(func.set_config('hnsw.iterative_scan', 'relaxed_order', True)))
+
+
+async def search_context(
+    db,
+    query: str,
+    user_id: UUID,
+    conversation_id: UUID | None = None,
+    scope: RetrievalScope = RetrievalScope.Conversation,
+    top_k: int = 5,
+    ef_search: int | None = None,
+    probes: int | None = None,
+    query_vec: np.ndarray | None = None,
+) -> List[RetrievedChunk]:
+    """
+    Find the top_k stored chunks most relevant to a query.
+
+    In `hybrid` mode (the default) dense cosine search and Postgres full-text
+    search over `text_chunk` run in the same statement and are fused by
+    reciprocal rank, so exact identifiers, error codes and names are found even
+    when the embedding misses them. `vector` mode uses the dense channel only.
+    Either way each hit is a chunk's own text, not its whole message.
+
+    The search fetches `top_k * retrieval_pool_factor` candidates and trims
+    them in Python: chunks repeating a better hit's text are dropped, each
+    message keeps at most `retrieval_max_chunks_per_message` chunks (its
+    overlapping neighbours mostly say the same thing), and when
+    `retrieval_mmr_lambda` is set the final top_k is picked by maximal
+    marginal relevance over the candidate vectors instead of by rank.
+
+    With `vector_index_enabled`, conversation-scoped searches of conversations
+    that fit in memory run the dense channel as an exact NumPy scan of an
+    in-process index (see `app.services.vector_index`) instead of pgvector;
+    `ef_search` and `probes` then do not apply.
+
+    Messages still waiting for the deferred embedding worker have no embedding
+    rows yet and are simply not candidates; recent ones are covered by history.
+    Only vectors of the configured `embed_model_name` are compared with the query.
+
+    Parameters
+    ----------
+    db : AsyncSession
+        SQLAlchemy session.
+    query : str
+        Search query string.
+    user_id : UUID
+        Owner of the conversations being searched; results never cross users.
+    conversation_id : UUID | None
+        Conversation to search, required for `RetrievalScope.Conversation`.
+    scope : RetrievalScope
+        Which embeddings are eligible: one conversation or all of the user's conversations.
+    top_k : int
+        Number of results to retrieve.
+    ef_search : int | None
+        HNSW candidate list size for this query (`hnsw.ef_search`); higher is slower but more accurate.
+    probes : int | None
+        IVFFlat lists to probe for this query (`ivfflat.probes`), if an IVFFlat index is in use.
+    query_vec : np.ndarray | None
+        Embedding of `query`, when the caller has already computed it.
+
+    Returns
+    -------
+    List[RetrievedChunk]
+        Hits, best first: by fused score in hybrid mode, by distance otherwise,
+        or in MMR selection order when diversity is enabled.
+    """
+    if scope == RetrievalScope.Conversation and conversation_id is None:
+        raise ValueError("conversation_id is required for conversation scoped retrieval")
+
+    if query_vec is None:
+        query_vec = await aembed_query(query)
+    filters = [
+        MessageEmbedding.user_id == user_id,
+        MessageEmbedding.embedding_model == settings.embed_model_name,
+    ]
+    if scope == RetrievalScope.Conversation:
+        filters.append(MessageEmbedding.conversation_id == conversation_id)
+    elif settings.conversation_delete_mode == "soft":
+        # soft-deleted conversations keep their embeddings until purged
+        deleted = select(Conversation.id).where(Conversation.user_id == user_id, Conversation.deleted_at.isnot(None))
+        filters.append(MessageEmbedding.conversation_id.not_in(deleted))
+
+    pool = top_k * max(1, settings.retrieval_pool_factor)
+    index = None
+    if scope == RetrievalScope.Conversation and (cache := get_vector_index()) is not None:
+        index = await cache.get(db, conversation_id, user_id)
+    if index is not None:
+        chunks, vectors = await _local_candidates(db, index, query, query_vec, filters, pool)
+    else:
+        await _apply_search_knobs(
+            db,
+            ef_search if ef_search is not None else settings.retrieval_ef_search,
+            probes if probes is not None else settings.retrieval_probes,
+        )
+        chunks, vectors = await _db_candidates(db, query, query_vec, filters, pool)
+    return diversify(chunks, vectors, query_vec, top_k)
+
+
+async def _db_candidates(db, query: str, query_vec, filters, limit: int) -> Tuple[List[RetrievedChunk], np.ndarray]:
+    """Ranked candidates and their vectors, searched by pgvector (and full-text in hybrid mode)."""
+    if settings.retrieval_mode == "hybrid":
+        stmt = _hybrid_search(query, query_vec, filters, limit)
+    else:
+        dense = _dense_candidates(query_vec, filters, limit).subquery()
+        stmt = (
+            select(
+                MessageEmbedding.message_id,
+                Message.role,
+                MessageEmbedding.text_chunk,
+                MessageEmbedding.embedding,
+                dense.c.distance,
+                null().label("score"),
+            )
+            .select_from(dense)
+            .join(MessageEmbedding, MessageEmbedding.id == dense.c.id)
+            .join(Message, Message.id == MessageEmbedding.message_id)
+            .order_by(dense.c.distance)
+        )
+
+    rows = (await db.execute(stmt)).all()
+    if not rows:
+        # nothing embedded yet (a new conversation, or deferred embedding still pending)
+        return [], np.empty((0, settings.embed_dim), dtype=np.float32)
+    chunks = [
+        RetrievedChunk(
+            message_id=row.message_id,
+            role=row.role.value if hasattr(row.role, 'value') else row.role,
+            text=row.text_chunk,
+            distance=row.distance,
+            score=row.score,
+        )
+        for row in rows
+    ]
+    vectors = np.array([row.embedding for row in rows], dtype=np.float32).reshape(len(rows), -1)
+    return chunks, vectors
+
+
+async def _local_candidates(
+    db, index: ConversationIndex, query: str, query_vec, filters, limit: int,
+) -> Tuple[List[RetrievedChunk], np.ndarray]:
+    """
+    The same ranking as `_db_candidates`, with the dense channel served by the in-process index.
+
+    The dense search is exact rather than approximate. In hybrid mode the
+    full-text channel still runs in Postgres (ids only) and the two rankings
+    are fused here with the same reciprocal-rank formula.
+    """
+    if settings.retrieval_mode != "hybrid":
+        positions, distances = index.search(query_vec, limit)
+        scores = [None] * len(positions)
+    else:
+        n, k = max(settings.retrieval_candidates, limit), settings.retrieval_rrf_k
+        dense, _ = index.search(query_vec, n)
+        lexical = (await db.execute(_lexical_candidates(query, filters, n))).scalars().all()
+        fused: Dict[int, float] = {}
+        for rank, position in enumerate(dense, start=1):
+            fused[int(position)] = 1.0 / (k + rank)
+        for rank, row_id in enumerate(lexical, start=1):
+            # rows written after the version check are not in the index yet
+            position = index.positions.get(row_id)
+            if position is not None:
+                fused[position] = fused.get(position, 0.0) + 1.0 / (k + rank)
+        ranked = sorted(fused.items(), key=lambda item: item[1], reverse=True)[:limit]
+        positions = np.array([p for p, _ in ranked], dtype=np.int64)
+        scores = [score for _, score in ranked]
+        distances = 1.0 - index.matrix[positions] @ np.asarray(query_vec, dtype=np.float32)
+
+    chunks = [
+        RetrievedChunk(
+            message_id=index.message_ids[p],
+            role=index.roles[p],
+            text=index.texts[p],
+            distance=float(d),
+            score=score,
+        )
+        for p, d, score in zip(positions, distances, scores)
+    ]
+    return chunks, index.matrix[positions]
+
+
+def diversify(
+    chunks: List[RetrievedChunk],
+    vectors: np.ndarray,
+    query_vec: np.ndarray,
+    top_k: int,
+    max_per_message: int | None = None,
+    mmr_lambda: float | None = None,
+) -> List[RetrievedChunk]:
+    """
+    Trim ranked candidates to top_k distinct, non-redundant chunks.
+
+    `max_per_message` and `mmr_lambda` default to the retrieval settings.
+    """
+    max_per_message = max_per_message or settings.retrieval_max_chunks_per_message
+    mmr_lambda = mmr_lambda if mmr_lambda is not None else settings.retrieval_mmr_lambda
+
+    candidates = len(chunks)
+    chunks, vectors = dedupe_chunks(chunks, vectors)
+    chunks, vectors = collapse_per_message(chunks, vectors, max_per_message)
+    if mmr_lambda is not None and len(chunks) > top_k:
+        chunks = [chunks[i] for i in mmr(query_vec, vectors, top_k, mmr_lambda)]
+    else:
+        chunks = chunks[:top_k]
+    _candidates_dropped.inc(candidates - len(chunks))
+    return chunks
+
+
+def _dense_candidates(query_vec, filters, limit: int):
+    """
+    Nearest chunks by cosine distance: (id, distance), closest first.
+
+    With `retrieval_first_pass` set to `halfvec` or `bit` the ANN search runs on
+    the compact column and its `limit * retrieval_rerank_factor` candidates are
+    re-ranked by exact distance on the full vectors.
+    """
+    exact = MessageEmbedding.embedding.cosine_distance(query_vec)
+    first_pass = settings.retrieval_first_pass
+    if first_pass == "vector":
+        return (
+            select(MessageEmbedding.id, exact.label("distance"))
+            .where(*filters)
+            .order_by(exact)
+            .limit(limit)
+        )
+    if first_pass == "halfvec":
+        approx = MessageEmbedding.embedding_half.cosine_distance(query_vec)
+    elif first_pass == "bit":
+        approx = MessageEmbedding.embedding_bit.hamming_distance(Bit(query_vec > 0).to_text())
+    else:
+        raise ValueError(f"unknown retrieval_first_pass {first_pass!r}")
+    candidates = (
+        select(MessageEmbedding.id, exact.label("distance"))
+        .where(*filters)
+        .order_by(approx)
+        .limit(limit * settings.retrieval_rerank_factor)
+        .subquery()
+    )
+    return (
+        select(candidates.c.id, candidates.c.distance)
+        .order_by(candidates.c.distance)
+        .limit(limit)
+    )
+
+
+def _or_tsquery(query: str):
+    """The query's lexemes OR-ed together, so a chunk matching any identifier or name qualifies."""
+    config = literal_column(f"'{TEXT_SEARCH_CONFIG}'::regconfig")
+    plain = cast(func.plainto_tsquery(config, query), Text)
+    return cast(func.replace(plain, " & ", " | "), TSQUERY)
+
+
+def _lexical_candidates(query: str, filters, limit: int):
+    """Full-text matches: (id, text_rank), best first."""
+    tsquery = _or_tsquery(query)
+    lexical_rank = func.ts_rank_cd(MessageEmbedding.text_chunk_tsv, tsquery)
+    return (
+        select(MessageEmbedding.id, lexical_rank.label("text_rank"))
+        .where(*filters, MessageEmbedding.text_chunk_tsv.op("@@")(tsquery))
+        .order_by(lexical_rank.desc())
+        .limit(limit)
+    )
+
+
+def _hybrid_search(query: str, query_vec, filters, top_k: int):
+    """
+    One statement that runs the dense and the full-text channel and fuses them.
+
+    Each channel ranks up to `retrieval_candidates` chunks; a chunk's score is
+    the sum over channels of 1 / (retrieval_rrf_k + rank), so chunks found by
+    both channels rise to the top and exact term matches the embedding missed
+    still make the cut.
+    """
+    n, k = max(settings.retrieval_candidates, top_k), settings.retrieval_rrf_k
+    dense = _dense_candidates(query_vec, filters, n).subquery()
+    dense_ranked = select(
+        dense.c.id,
+        func.row_number().over(order_by=dense.c.distance).label("rank"),
+    ).subquery()
+
+    lexical = _lexical_candidates(query, filters, n).subquery()
+    lexical_ranked = select(
+        lexical.c.id,
+        func.row_number().over(order_by=lexical.c.text_rank.desc()).label("rank"),
+    ).subquery()
+
+    score = (
+        func.coalesce(1.0 / (k + dense_ranked.c.rank), 0.0)
+        + func.coalesce(1.0 / (k + lexical_ranked.c.rank), 0.0)
+    )
+    fused = (
+        select(
+            func.coalesce(dense_ranked.c.id, lexical_ranked.c.id).label("id"),
+            cast(score, Float).label("score"),
+        )
+        .select_from(dense_ranked)
+        .join(lexical_ranked, dense_ranked.c.id == lexical_ranked.c.id, full=True)
+        .subquery()
+    )
+    return (
+        select(
+            MessageEmbedding.message_id,
+            Message.role,
+            MessageEmbedding.text_chunk,
+            MessageEmbedding.embedding,
+            MessageEmbedding.embedding.cosine_distance(query_vec).label("distance"),
+            fused.c.score,
+        )
+        .select_from(fused)
+        .join(MessageEmbedding, MessageEmbedding.id == fused.c.id)
+        .join(Message, Message.id == MessageEmbedding.message_id)
+        .order_by(fused.c.score.desc())
+        .limit(top_k)
+    )
+
+
+def format_context(chunks: List[RetrievedChunk]) -> HumanMessage | None:
+    """Render retrieval hits as the context message placed before the user's input."""
+    if not chunks:
+        return None
+    context_texts = "\n".join([f"- {chunk.role}: {chunk.text}" for chunk in chunks])
+    return HumanMessage(content=f"[Retrieved context from memory]\n{context_texts}")
+
+
+async def retrieve_relevant_context(
+    db,
+    query: str,
+    user_id: UUID,
+    conversation_id: UUID | None = None,
+    scope: RetrievalScope = RetrievalScope.Conversation,
+    top_k: int = 5,
+    ef_search: int | None = None,
+    probes: int | None = None,
+) -> HumanMessage | None:
+    """
+    Retrieve top_k most relevant messages for a query as a single context message.
+
+    Same parameters as `search_context`.
+
+    Returns
+    -------
+    HumanMessage | None
+        A constructed HumanMessage containing retrieved context lines, or None if no rows.
+    """
+    chunks = await search_context(
+        db, query, user_id, conversation_id, scope, top_k, ef_search, probes
+    )
+    return format_context(chunks)
@@ -0,0 +1,198 @@
+import asyncio
+import logging
+from typing import Dict, List, Optional, Set
+from uuid import UUID
+
+from langchain.schema import HumanMessage, SystemMessage
+from langchain_core.language_models.chat_models import BaseChatModel
+from sqlalchemy import func, select
+from sqlalchemy.exc import IntegrityError
+
+from app.core.metrics import registry
+from app.core.settings import settings
+from app.db.engine import AsyncSessionLocal
+from app.models.conversation_summary import ConversationSummary
+from app.models.message import Message
+from app.services.llm import get_chat_model
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_INSTRUCTIONS = (
+    "You maintain a running summary of a conversation between a user and an AI assistant. "
+    "Update the summary so it also covers the new messages. Keep facts, names, decisions, "
+    "open questions and user preferences; drop pleasantries. Reply with the summary only."
+)
+
+_runs = registry.counter("summary.runs", "summaries written")
+_skipped = registry.counter("summary.skipped", "jobs with too few messages to fold")
+_failures = registry.counter("summary.failures")
+_run_ms = registry.histogram("summary.run_ms", "time to produce one summary")
+
+
+async def get_latest_summary(db, conversation_id: UUID) -> Optional[ConversationSummary]:
+    """Most recent summary of a conversation, or None if it has never been summarized."""
+    result = await db.execute(
+        select(ConversationSummary)
+        .where(ConversationSummary.conversation_id == conversation_id)
+        .order_by(ConversationSummary.end_message_count.desc())
+        .limit(1)
+    )
+    return result.scalars().first()
+
+
+def _render(messages: List[Message]) -> str:
+    return "\n".join(
+        f"[{m.message_count}] {m.role.value if hasattr(m.role, 'value') else m.role}: {m.content}"
+        for m in messages
+    )
+
+
+async def summarize_conversation(conversation_id: UUID, llm: BaseChatModel, window: int | None = None) -> bool:
+    """
+    Fold messages that have left the history window into the conversation's summary.
+
+    The newest `window` messages stay raw: the number `build_context` last fit
+    into the prompt, which is fewer than `history_max_messages` when the token
+    budget trims history. Everything older that the latest summary does not
+    cover yet is folded in, at most `summary_max_fold` messages per run, once
+    at least `summary_min_fold` have accumulated.
+
+    Parameters
+    ----------
+    conversation_id : UUID
+        Conversation to summarize.
+    llm : BaseChatModel
+        Model that writes the summary.
+    window : int | None
+        History messages in the conversation's latest prompt; None = `history_max_messages`.
+
+    Returns
+    -------
+    bool
+        True if more messages are still waiting to be folded.
+    """
+    async with AsyncSessionLocal() as db:
+        latest = await get_latest_summary(db, conversation_id)
+        covered = latest.end_message_count if latest else 0
+        last = await db.scalar(
+            select(func.max(Message.message_count)).where(Message.conversation_id == conversation_id)
+        )
+        raw = settings.history_max_messages if window is None else min(window, settings.history_max_messages)
+        cutoff = (last or 0) - raw
+        if cutoff - covered < settings.summary_min_fold:
+            _skipped.inc()
+            return False
+
+        end = min(cutoff, covered + settings.summary_max_fold)
+        result = await db.execute(
+            select(Message)
+            .where(
+                Message.conversation_id == conversation_id,
+                Message.message_count > covered,
+                Message.message_count <= end,
+            )
+            .order_by(Message.message_count.asc())
+        )
+        messages = result.scalars().all()
+        # release the connection while the LLM works
+        await db.commit()
+
+        previous = latest.summary if latest else "(no summary yet)"
+        with _run_ms.time():
+            response = await llm.ainvoke([
+                SystemMessage(content=SUMMARY_INSTRUCTIONS),
+                HumanMessage(content=f"Current summary:\n{previous}\n\nNew messages:\n{_render(messages)}"),
+            ])
+
+        db.add(ConversationSummary(
+            conversation_id=conversation_id,
+            end_message_count=end,
+            summary=response.content,
+        ))
+        try:
+            await db.commit()
+        except IntegrityError:
+            # another worker summarized the same range first
+            await db.rollback()
+            return False
+        _runs.inc()
+        return end < cutoff
+
+
+class SummaryWorker:
+    """
+    In-process queue of conversations to summarize, drained by background tasks.
+
+    `enqueue` never blocks and never touches the database, so scheduling a
+    summary adds nothing to a chat turn's latency. A conversation already
+    waiting in the queue is not queued twice.
+
+    Parameters
+    ----------
+    llm : BaseChatModel | None
+        Model used to write summaries; defaults to `summary_provider` / `summary_model`. Pass a
+        fake model in tests.
+    concurrency : int
+        Number of worker tasks.
+    """
+
+    def __init__(self, llm: BaseChatModel | None = None, concurrency: int = 1, maxsize: int = 1000):
+        self._llm = llm
+        self.concurrency = concurrency
+        self._queue: "asyncio.Queue[UUID]" = asyncio.Queue(maxsize=maxsize)
+        self._pending: Set[UUID] = set()
+        # history messages build_context packed into each conversation's latest prompt
+        self._windows: Dict[UUID, int] = {}
+        self._tasks: List[asyncio.Task] = []
+        registry.gauge("summary.queue_depth", self._queue.qsize)
+
+    @property
+    def llm(self) -> BaseChatModel:
+        if self._llm is None:
+            self._llm = get_chat_model(settings.summary_provider, settings.summary_model)
+        return self._llm
+
+    def record_window(self, conversation_id: UUID, history_messages: int) -> None:
+        """Remember how much history the latest prompt kept, so the summary starts where it ends."""
+        self._windows[conversation_id] = history_messages
+
+    def enqueue(self, conversation_id: UUID) -> None:
+        if conversation_id in self._pending:
+            return
+        try:
+            self._queue.put_nowait(conversation_id)
+        except asyncio.QueueFull:
+            logger.warning("summary queue full; dropping conversation %s", conversation_id)
+            return
+        self._pending.add(conversation_id)
+
+    def start(self) -> None:
+        for _ in range(self.concurrency):
+            self._tasks.append(asyncio.create_task(self._run()))
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks.clear()
+
+    async def join(self) -> None:
+        """Wait until every queued conversation has been processed (useful in tests)."""
+        await self._queue.join()
+
+    async def _run(self) -> None:
+        while True:
+            conversation_id = await self._queue.get()
+            self._pending.discard(conversation_id)
+            try:
+                more = await summarize_conversation(conversation_id, self.llm, self._windows.pop(conversation_id, None))
+                if more:
+                    self.enqueue(conversation_id)
+            except Exception:
+                _failures.inc()
+                logger.exception("summarizing conversation %s failed", conversation_id)
+            finally:
+                self._queue.task_done()
+
+
+summary_worker = SummaryWorker(concurrency=settings.summary_workers)
@@ -0,0 +1,40 @@
+from functools import lru_cache
+
+import tiktoken
+
+from app.core.settings import settings
+
+# chat formatting overhead per message (role markers and separators) in OpenAI's accounting
+MESSAGE_OVERHEAD_TOKENS = 4
+
+
+@lru_cache(maxsize=16)
+def _encoding(model: str | None) -> tiktoken.Encoding:
+    if model:
+        try:
+            return tiktoken.encoding_for_model(model)
+        except KeyError:
+            pass
+    return tiktoken.get_encoding(settings.token_encoding)
+
+
+def uses_default_encoding(model: str | None) -> bool:
+    """Whether `model` tokenizes like `settings.token_encoding`, the encoding stored counts were made with."""
+    return _encoding(model).name == settings.token_encoding
+
+
+def count_tokens(text: str | None, model: str | None = None) -> int:
+    """
+    Number of tokens `text` encodes to for `model`.
+
+    Falls back to `settings.token_encoding` for models tiktoken does not know,
+    which is close enough for budgeting across providers.
+    """
+    if not text:
+        return 0
+    return len(_encoding(model).encode(text, disallowed_special=()))
+
+
+def message_tokens(content_tokens: int) -> int:
+    """Prompt cost of one chat message whose content is `content_tokens` long."""
+    return content_tokens + MESSAGE_OVERHEAD_TOKENS
@@ -1,8 +1,25 @@
 from app.models.user import User
-from app.db.engine import SessionLocal
+from app.db.engine import SessionLocal, AsyncSessionLocal
+from sqlalchemy import select
+from app.core.cache import TTLCache
+from app.core.settings import settings
+from app.schemas.users import CurrentUser
 from starlette.status import HTTP_401_UNAUTHORIZED, HTTP_500_INTERNAL_SERVER_ERROR
 from fastapi import HTTPException
 from sqlalchemy.exc import SQLAlchemyError
+# Cognito sub -> CurrentUser; saves a users lookup on every authenticated request
+_current_users: TTLCache[CurrentUser] = TTLCache(
+    maxsize=settings.auth_user_cache_size,
+    ttl=settings.auth_user_cache_ttl,
+    name="auth.user_cache",
+)
+
+
+def invalidate_cached_user(sub: str) -> None:
+    """Drop a cached sub -> user mapping; call when a user is deleted or re-linked."""
+    _current_users.invalidate(sub)
+
+
 def create_user(user: dict[str, str]) -> None:
     """Create a new user in the database."""
     db = SessionLocal()
@@ -22,32 +39,39 @@ def create_user(user: dict[str, str]) -> None:
     finally:
         db.close()
 
-def get_user_by_sub(sub: str) -> User | None:
+async def get_user_by_sub(sub: str) -> User | None:
     """Retrieve a user from the database by their Cognito sub."""
-    db = SessionLocal()
-    try:
-        user = db.query(User).filter(User.cognito_sub == sub).first()
-        
-        if not user:
+    async with AsyncSessionLocal() as db:
+        try:
+            result = await db.execute(select(User).where(User.cognito_sub == sub))
+            user = result.scalars().first()
+            
+            if not user:
+                raise HTTPException(
+                    status_code=HTTP_401_UNAUTHORIZED,
+                    detail="User not found"
+                )
+            return user
+        except SQLAlchemyError as e:
+            await db.rollback()
             raise HTTPException(
-                status_code=HTTP_401_UNAUTHORIZED,
-                detail="User not found"
+                status_code=HTTP_500_INTERNAL_SERVER_ERROR,
+                detail="Database error"
+            )
+        except Exception as e:
+            if isinstance(e, HTTPException):
+                raise
+            raise HTTPException(
+                status_code=HTTP_500_INTERNAL_SERVER_ERROR,
+                detail="Internal server error"
             )
-        return user
-    except SQLAlchemyError as e:
-        db.rollback()
-        raise HTTPException(
-            status_code=HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="Database error"
-        )
-    except Exception as e:
-        if isinstance(e, HTTPException):
-            raise
-        raise HTTPException(
-            status_code=HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="Internal server error"
-        )
-    finally:
-        db.close()
 
 
+async def get_current_user(sub: str) -> CurrentUser:
+    """Resolve a Cognito sub to the caller's id, from cache when possible."""
+    cached = _current_users.get(sub)
+    if cached is not None:
+        return cached
+    user = CurrentUser.model_validate(await get_user_by_sub(sub))
+    _current_users.set(sub, user)
+    return user
@@ -0,0 +1,270 @@
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Sequence, Tuple
+from uuid import UUID
+
+import numpy as np
+from sqlalchemy import select, update
+
+from app.core.metrics import registry
+from app.core.settings import settings
+from app.models.conversation import Conversation
+from app.models.message import Message
+from app.models.message_embeddings import MessageEmbedding
+
+# rough per-row cost of the Python lists next to the matrix (UUIDs, list slots, str headers)
+_ROW_OVERHEAD = 200
+# conversations remembered as too large for memory
+_MAX_OVERSIZED = 10_000
+
+
+async def bump_embeddings_version(db, conversation_ids: Iterable[UUID]) -> Dict[UUID, int]:
+    """
+    Advance `conversations.embeddings_version` in the caller's transaction.
+
+    Call it wherever a conversation's `message_embeddings` rows are inserted or
+    deleted, so that indexes cached by any process are reloaded. The rows are
+    locked in id order, so writers spanning several conversations cannot
+    deadlock, and `updated_at` is left alone.
+
+    Returns
+    -------
+    Dict[UUID, int]
+        The new version of each conversation.
+    """
+    ids = sorted(set(conversation_ids))
+    if not ids:
+        return {}
+    locked = select(Conversation.id)\
+        .where(Conversation.id.in_(ids))\
+        .order_by(Conversation.id)\
+        .with_for_update(key_share=True)
+    result = await db.execute(
+        update(Conversation)
+        .where(Conversation.id.in_(locked.scalar_subquery()))
+        .values(embeddings_version=Conversation.embeddings_version + 1, updated_at=Conversation.updated_at)
+        .returning(Conversation.id, Conversation.embeddings_version)
+    )
+    return {row.id: row.embeddings_version for row in result}
+
+
+@dataclass
+class ConversationIndex:
+    """
+    One conversation's chunks with their vectors stacked in a float32 matrix.
+
+    `version` is the conversation's `embeddings_version` when the rows were
+    read; it is compared with Postgres before every use, so rows written or
+    deleted by another process are noticed.
+    """
+    ids: List[UUID]
+    message_ids: List[UUID]
+    roles: List[str]
+    texts: List[str]
+    matrix: np.ndarray
+    version: int
+    positions: Dict[UUID, int] = field(init=False)
+    nbytes: int = field(init=False)
+
+    def __post_init__(self) -> None:
+        self.positions = {row_id: i for i, row_id in enumerate(self.ids)}
+        self.nbytes = self.matrix.nbytes + sum(len(t) for t in self.texts) + _ROW_OVERHEAD * len(self.ids)
+
+    def search(self, query_vec: np.ndarray, limit: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Exact cosine search: (positions, distances) of the `limit` closest rows, closest first."""
+        similarity = self.matrix @ np.asarray(query_vec, dtype=np.float32)
+        if limit < len(similarity):
+            top = np.argpartition(-similarity, limit - 1)[:limit]
+        else:
+            top = np.arange(len(similarity))
+        top = top[np.argsort(-similarity[top], kind="stable")]
+        return top, 1.0 - similarity[top]
+
+    def extend(self, rows: Sequence[dict], roles: Dict[UUID, str]) -> int:
+        """Append embedding rows (as written by `persist_messages`); returns the added bytes."""
+        rows = [r for r in rows if r["id"] not in self.positions]
+        if not rows:
+            return 0
+        before = self.nbytes
+        vectors = np.asarray([r["embedding"] for r in rows], dtype=np.float32)
+        self.matrix = np.vstack([self.matrix, vectors])
+        for row in rows:
+            self.positions[row["id"]] = len(self.ids)
+            self.ids.append(row["id"])
+            self.message_ids.append(row["message_id"])
+            self.roles.append(roles[row["message_id"]])
+            self.texts.append(row["text_chunk"])
+        self.nbytes += vectors.nbytes + sum(len(r["text_chunk"]) + _ROW_OVERHEAD for r in rows)
+        return self.nbytes - before
+
+
+class VectorIndexCache:
+    """
+    Per-process LRU of conversation indexes, bounded by total bytes.
+
+    An index is loaded from `message_embeddings` on first use and extended in
+    place when this process stores new messages. Before each use the cached
+    version is compared with the conversation's `embeddings_version` (a
+    primary-key lookup); on a mismatch, e.g. another API worker or the
+    embedding worker wrote rows, the index is reloaded. Conversations found
+    to hold more than `max_rows` chunks are remembered and left to pgvector.
+
+    Parameters
+    ----------
+    max_bytes : int
+        Memory cap over all cached indexes; least recently used are evicted first.
+    max_rows : int
+        Largest conversation (in chunks) served from memory.
+    """
+
+    def __init__(self, max_bytes: int, max_rows: int, name: str = "vector_index"):
+        self.max_bytes = max_bytes
+        self.max_rows = max_rows
+        self._data: "OrderedDict[UUID, ConversationIndex]" = OrderedDict()
+        # conversations too large for memory; they rarely shrink again, so they are not re-checked
+        self._oversized: "OrderedDict[UUID, None]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = registry.counter(f"{name}.hits")
+        self.loads = registry.counter(f"{name}.loads", "indexes loaded on first use")
+        self.reloads = registry.counter(f"{name}.reloads", "indexes reloaded after a version mismatch")
+        self.evictions = registry.counter(f"{name}.evictions")
+        self.load_ms = registry.histogram(f"{name}.load_ms", "time to load one conversation's index")
+        registry.gauge(f"{name}.size", lambda: len(self._data))
+        registry.gauge(f"{name}.bytes", lambda: self._bytes)
+
+    async def get(self, db, conversation_id: UUID, user_id: UUID) -> ConversationIndex | None:
+        """The conversation's up-to-date index, or None when it is empty or too large for memory."""
+        with self._lock:
+            if conversation_id in self._oversized:
+                return None
+        version = await db.scalar(
+            select(Conversation.embeddings_version)
+            .where(Conversation.id == conversation_id, Conversation.user_id == user_id)
+        )
+        if version is None:
+            self.invalidate(conversation_id)
+            return None
+
+        with self._lock:
+            index = self._data.get(conversation_id)
+            if index is not None and index.version == version:
+                self._data.move_to_end(conversation_id)
+                self.hits.inc()
+                return index
+        (self.reloads if index is not None else self.loads).inc()
+
+        filters = [
+            MessageEmbedding.conversation_id == conversation_id,
+            MessageEmbedding.user_id == user_id,
+            MessageEmbedding.embedding_model == settings.embed_model_name,
+        ]
+
+        with self.load_ms.time():
+            rows = (await db.execute(
+                select(
+                    MessageEmbedding.id,
+                    MessageEmbedding.message_id,
+                    Message.role,
+                    MessageEmbedding.text_chunk,
+                    MessageEmbedding.embedding,
+                )
+                .join(Message, Message.id == MessageEmbedding.message_id)
+                .where(*filters)
+                .limit(self.max_rows + 1)
+            )).all()
+        if len(rows) > self.max_rows:
+            with self._lock:
+                self._too_large(conversation_id)
+            return None
+        if not rows:
+            self.invalidate(conversation_id)
+            return None
+        # version read before the rows, so a write racing the load shows up as a mismatch next time
+        index = ConversationIndex(
+            ids=[r.id for r in rows],
+            message_ids=[r.message_id for r in rows],
+            roles=[r.role.value if hasattr(r.role, "value") else r.role for r in rows],
+            texts=[r.text_chunk for r in rows],
+            matrix=np.asarray([r.embedding for r in rows], dtype=np.float32),
+            version=version,
+        )
+        with self._lock:
+            old = self._data.pop(conversation_id, None)
+            if old is not None:
+                self._bytes -= old.nbytes
+            self._data[conversation_id] = index
+            self._bytes += index.nbytes
+            self._evict()
+        return index
+
+    def extend(self, conversation_id: UUID, rows: Sequence[dict], roles: Dict[UUID, str], version: int) -> None:
+        """
+        Write-through of freshly committed embedding rows; a no-op unless the conversation is cached.
+
+        `version` is the `embeddings_version` the write committed. Unless the
+        index was exactly one version behind, another process wrote in between
+        and the index is dropped instead.
+        """
+        with self._lock:
+            index = self._data.get(conversation_id)
+            if index is None:
+                return
+            if len(index.ids) + len(rows) > self.max_rows:
+                self._too_large(conversation_id)
+                return
+            if index.version != version - 1:
+                self._data.pop(conversation_id)
+                self._bytes -= index.nbytes
+                return
+            self._bytes += index.extend(rows, roles)
+            index.version = version
+            self._evict()
+
+    def invalidate(self, conversation_id: UUID) -> None:
+        with self._lock:
+            index = self._data.pop(conversation_id, None)
+            if index is not None:
+                self._bytes -= index.nbytes
+
+    def _too_large(self, conversation_id: UUID) -> None:
+        """Drop the conversation's index and leave it to pgvector from now on; the caller holds the lock."""
+        index = self._data.pop(conversation_id, None)
+        if index is not None:
+            self._bytes -= index.nbytes
+        self._oversized[conversation_id] = None
+        while len(self._oversized) > _MAX_OVERSIZED:
+            self._oversized.popitem(last=False)
+
+    def _evict(self) -> None:
+        while self._bytes > self.max_bytes and self._data:
+            _, index = self._data.popitem(last=False)
+            self._bytes -= index.nbytes
+            self.evictions.inc()
+
+
+_vector_index: VectorIndexCache | None = None
+
+
+def get_vector_index() -> VectorIndexCache | None:
+    """The process-wide index cache, or None when `vector_index_enabled` is off."""
+    global _vector_index
+    if not settings.vector_index_enabled:
+        return None
+    if _vector_index is None:
+        _vector_index = VectorIndexCache(
+            settings.vector_index_max_mb * 2**20, settings.vector_index_max_rows
+        )
+    return _vector_index
+
+
+def add_to_index(conversation_id: UUID, messages, rows: Sequence[dict], version: int) -> None:
+    """Extend the conversation's cached index with rows `persist_messages` just committed at `version`."""
+    cache = get_vector_index()
+    if cache is None or not rows:
+        return
+    roles = {m.id: m.role.value if hasattr(m.role, "value") else m.role for m in messages}
+    cache.extend(
+        conversation_id, [r for r in rows if r["embedding_model"] == settings.embed_model_name], roles, version
+    )
@@ -0,0 +1,73 @@
+"""
+Fill `embedding_half` / `embedding_bit` for rows stored before EMBEDDING_COMPACT was enabled.
+
+Works in short transactions of `--batch-size` rows, claimed with
+`FOR UPDATE SKIP LOCKED`, so it can run next to live traffic (and several
+copies can run at once). The conversion happens in Postgres
+(`embedding::halfvec`, `binary_quantize(embedding)`), so no vectors cross
+the wire.
+
+Usage:
+    uv run python -m scripts.backfill_compact_embeddings --columns both --batch-size 5000
+"""
+import argparse
+import asyncio
+import logging
+import time
+
+from sqlalchemy import text
+
+from app.db.engine import AsyncSessionLocal
+
+logger = logging.getLogger(__name__)
+
+EXPRESSIONS = {
+    "embedding_half": "embedding::halfvec",
+    "embedding_bit": "binary_quantize(embedding)",
+}
+
+
+async def backfill_batch(db, columns, batch_size: int) -> int:
+    missing = " OR ".join(f"{c} IS NULL" for c in columns)
+    assignments = ", ".join(f"{c} = {EXPRESSIONS[c]}" for c in columns)
+    result = await db.execute(
+        text(
+            f"UPDATE message_embeddings SET {assignments} "
+            f"WHERE id IN (SELECT id FROM message_embeddings WHERE {missing} "
+            "LIMIT :n FOR UPDATE SKIP LOCKED)"
+        ),
+        {"n": batch_size},
+    )
+    await db.commit()
+    return result.rowcount
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--columns", choices=["halfvec", "bit", "both"], default="both")
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument("--pause", type=float, default=0.0, help="seconds to sleep between batches")
+    args = parser.parse_args()
+
+    columns = {
+        "halfvec": ["embedding_half"],
+        "bit": ["embedding_bit"],
+        "both": ["embedding_half", "embedding_bit"],
+    }[args.columns]
+
+    total, start = 0, time.perf_counter()
+    while True:
+        async with AsyncSessionLocal() as db:
+            n = await backfill_batch(db, columns, args.batch_size)
+        if n == 0:
+            break
+        total += n
+        logger.info("backfilled %d rows (%.0f rows/s)", total, total / (time.perf_counter() - start))
+        if args.pause:
+            await asyncio.sleep(args.pause)
+    logger.info("done: %d rows in %.1fs", total, time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    asyncio.run(main())
@@ -0,0 +1,67 @@
+"""Helpers shared by the benchmark scripts in this folder."""
+import statistics
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List
+
+import numpy as np
+import psycopg
+from pgvector.psycopg import register_vector
+
+from app.core.settings import settings
+
+
+def connect(autocommit: bool = True) -> psycopg.Connection:
+    """Raw psycopg connection to the configured database, with pgvector types registered."""
+    url = str(settings.database_url).replace("postgresql+psycopg://", "postgresql://")
+    conn = psycopg.connect(url, autocommit=autocommit)
+    register_vector(conn)
+    return conn
+
+
+def random_unit_vectors(n: int, dim: int = 1024, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    vecs = rng.standard_normal((n, dim), dtype=np.float32)
+    vecs /= np.linalg.norm(vecs, axis=1, keepdims=True)
+    return vecs
+
+
+def time_calls(fn: Callable[[], object], repeat: int = 50, warmup: int = 5) -> Dict[str, float]:
+    """Call fn repeatedly and return latency stats in milliseconds."""
+    for _ in range(warmup):
+        fn()
+    samples: List[float] = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000.0)
+    samples.sort()
+    return {
+        "p50_ms": statistics.median(samples),
+        "p99_ms": samples[min(len(samples) - 1, int(0.99 * len(samples)))],
+        "mean_ms": statistics.fmean(samples),
+    }
+
+
+@contextmanager
+def stopwatch() -> Iterator[Dict[str, float]]:
+    result: Dict[str, float] = {}
+    start = time.perf_counter()
+    try:
+        yield result
+    finally:
+        result["seconds"] = time.perf_counter() - start
+
+
+def print_table(rows: List[Dict[str, object]]) -> None:
+    if not rows:
+        return
+    cols = list(rows[0].keys())
+    widths = {c: max(len(c), *(len(_fmt(r[c])) for r in rows)) for c in cols}
+    print("  ".join(c.ljust(widths[c]) for c in cols))
+    for r in rows:
+        print("  ".join(_fmt(r[c]).ljust(widths[c]) for c in cols))
+
+
+def _fmt(value: object) -> str:
+    return f"{value:.2f}" if isinstance(value, float) else str(value)
@@ -0,0 +1,100 @@
+"""
+Throughput and peak memory of the bulk import pipeline on a synthetic transcript.
+
+Writes a transcript of `--messages` alternating user / AI messages (AI
+replies long enough to split into several chunks) to a temporary JSONL
+file, streams it through `import_messages` into a scratch conversation and
+reports:
+
+- `messages/s` : end-to-end, parse + insert + chunk + embed + vector insert
+- `chunks/s`   : embedding rows written
+- `peak_rss_mb`: this process (parser, insert stage, queue); flat as the transcript grows
+- `children_peak_rss_mb`: the largest model process
+
+`--deferred` measures the insert stage alone (messages left for the
+embedding worker). The scratch user is deleted afterwards.
+
+Usage:
+    uv run python -m scripts.benchmarks.bulk_import --messages 1000000 --processes 4
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import tempfile
+import uuid
+
+from sqlalchemy import delete
+
+from app.core.settings import settings
+from app.db.engine import AsyncSessionLocal
+from app.models.conversation import Conversation
+from app.models.message import Message
+from app.models.message_embeddings import MessageEmbedding
+from app.models.user import User
+from scripts.benchmarks._common import print_table
+from scripts.import_messages import peak_rss_mb, run_import
+
+WORDS = (
+    "the embedding pipeline stores every message chunk with its vector so retrieval can find "
+    "earlier answers about databases queues caching latency deployment tokens models prompts"
+).split()
+
+
+def write_transcript(path: str, n: int, seed: int = 0) -> None:
+    rng = random.Random(seed)
+    with open(path, "w", encoding="utf-8") as f:
+        for i in range(n):
+            role = "user" if i % 2 == 0 else "ai"
+            length = rng.randint(8, 40) if role == "user" else rng.randint(120, 700)
+            content = " ".join(rng.choice(WORDS) for _ in range(length)) + "."
+            f.write(json.dumps({"role": role, "content": content}) + "\n")
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--messages", type=int, default=1_000_000)
+    parser.add_argument("--processes", type=int, default=4)
+    parser.add_argument("--batch-size", type=int, default=None)
+    parser.add_argument("--deferred", action="store_true", help="insert only; leave embedding to the worker")
+    args = parser.parse_args()
+    if args.deferred:
+        settings.embedding_mode = "deferred"
+
+    user_id, conversation_id = uuid.uuid4(), uuid.uuid4()
+    async with AsyncSessionLocal() as db:
+        db.add(User(id=user_id, cognito_sub=f"bench-{user_id}"))
+        await db.flush()
+        db.add(Conversation(id=conversation_id, user_id=user_id, title="bulk import benchmark"))
+        await db.commit()
+
+    fd, path = tempfile.mkstemp(suffix=".jsonl")
+    os.close(fd)
+    try:
+        write_transcript(path, args.messages)
+        size_mb = os.path.getsize(path) / 2**20
+        stats = await run_import(path, conversation_id, user_id, args.processes, args.batch_size)
+        print(f"{args.messages} messages ({size_mb:.0f} MiB JSONL), {args.processes} model processes, "
+              f"batch {args.batch_size or settings.import_batch_size}, mode {settings.embedding_mode}")
+        print_table([{
+            "messages": stats.messages,
+            "embedded": stats.embedded,
+            "chunks": stats.chunks,
+            "seconds": stats.seconds,
+            "messages/s": stats.messages_per_second,
+            "chunks/s": stats.chunks / stats.seconds if stats.seconds else 0.0,
+            **peak_rss_mb(),
+        }])
+    finally:
+        os.remove(path)
+        async with AsyncSessionLocal() as db:
+            await db.execute(delete(MessageEmbedding).where(MessageEmbedding.conversation_id == conversation_id))
+            await db.execute(delete(Message).where(Message.conversation_id == conversation_id))
+            await db.execute(delete(Conversation).where(Conversation.id == conversation_id))
+            await db.execute(delete(User).where(User.id == user_id))
+            await db.commit()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,121 @@
+"""
+Chunking and embedding throughput on long documents.
+
+Compares:
+
+- `legacy`: tokenize, cut hard 512-token windows, decode each window back to a
+            string, then let SentenceTransformer.encode tokenize it again
+- `single`: chunk_text (one tokenization with offsets, sentence-aligned windows
+            with overlap, passage prefix) and _encode on the token ids
+
+Reports documents/s and tokens/s for chunking alone and end to end, the number
+of chunks produced and, for the legacy path, how many chunks the model had to
+truncate (a 512-token window plus special tokens does not fit in 512).
+
+Usage:
+    uv run python -m scripts.benchmarks.chunking --docs 50 --words 4000
+    uv run python -m scripts.benchmarks.chunking --chunk-only
+"""
+import argparse
+import random
+import time
+
+from app.core.settings import settings
+from app.services.embeddings import _encode, chunk_text
+from app.services.model_registry import model_registry
+from scripts.benchmarks._common import print_table
+
+_WORDS = (
+    "the a server request latency index vector query database token model cache batch worker "
+    "message conversation user answer context retrieval embedding error code timeout retry queue"
+).split()
+
+
+def synthetic_document(words: int, rng: random.Random) -> str:
+    sentences, n = [], 0
+    while n < words:
+        length = rng.randint(6, 30)
+        sentence = " ".join(rng.choice(_WORDS) for _ in range(length))
+        sentences.append(sentence.capitalize() + rng.choice([".", ".", ".", "?", "!"]))
+        n += length
+        if rng.random() < 0.1:
+            sentences.append("\n\n")
+    return " ".join(sentences)
+
+
+def legacy_chunks(text: str, tokenizer, max_len: int = 512):
+    tokens = tokenizer.encode(text, add_special_tokens=False)
+    windows = [tokens[i : i + max_len] for i in range(0, len(tokens), max_len)]
+    return [tokenizer.decode(w, skip_special_tokens=True) for w in windows]
+
+
+def legacy_encode(chunks):
+    return model_registry.embedder.encode(
+        chunks,
+        batch_size=settings.embed_max_batch_size,
+        convert_to_numpy=True,
+        normalize_embeddings=True,
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--docs", type=int, default=50)
+    parser.add_argument("--words", type=int, default=4000)
+    parser.add_argument("--chunk-only", action="store_true", help="skip the model forward passes")
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    docs = [synthetic_document(args.words, rng) for _ in range(args.docs)]
+    tokenizer = model_registry.tokenizer
+    if not args.chunk_only:
+        model_registry.warm_up()
+    total_tokens = sum(len(tokenizer.encode(d, add_special_tokens=False)) for d in docs)
+
+    rows = []
+
+    start = time.perf_counter()
+    legacy = [legacy_chunks(d, tokenizer) for d in docs]
+    chunk_s = time.perf_counter() - start
+    flat = [c for chunks in legacy for c in chunks]
+    truncated = sum(
+        len(tokenizer.encode(c, add_special_tokens=True)) > settings.embed_max_seq_length for c in flat
+    )
+    encode_s = 0.0
+    if not args.chunk_only:
+        start = time.perf_counter()
+        legacy_encode(flat)
+        encode_s = time.perf_counter() - start
+    rows.append({
+        "path": "legacy",
+        "chunks": len(flat),
+        "truncated": truncated,
+        "chunk_docs/s": args.docs / chunk_s,
+        "chunk_tok/s": total_tokens / chunk_s,
+        "e2e_tok/s": total_tokens / (chunk_s + encode_s) if encode_s else None,
+    })
+
+    start = time.perf_counter()
+    single = [chunk_text(d) for d in docs]
+    chunk_s = time.perf_counter() - start
+    flat = [c for chunks in single for c in chunks]
+    encode_s = 0.0
+    if not args.chunk_only:
+        start = time.perf_counter()
+        _encode(flat)
+        encode_s = time.perf_counter() - start
+    rows.append({
+        "path": "single",
+        "chunks": len(flat),
+        "truncated": sum(len(c.input_ids) > settings.embed_max_seq_length for c in flat),
+        "chunk_docs/s": args.docs / chunk_s,
+        "chunk_tok/s": total_tokens / chunk_s,
+        "e2e_tok/s": total_tokens / (chunk_s + encode_s) if encode_s else None,
+    })
+
+    print(f"{args.docs} documents, {total_tokens} tokens, overlap {settings.embed_chunk_overlap_tokens}")
+    print_table(rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""
+Storage size, query latency and recall of compact first-pass search versus full vectors.
+
+Loads clustered synthetic unit vectors (so nearest neighbours are meaningful)
+into a scratch table with `vector`, `halfvec` and `bit` columns, builds an
+HNSW index on each, and compares:
+
+- `vector`          : HNSW over the full vectors (the current layout)
+- `halfvec+rerank`  : HNSW over halfvec, top k*factor re-ranked by exact cosine
+- `bit+rerank`      : HNSW over binary_quantize (hamming), top k*factor re-ranked
+
+Recall@k is measured against an exact sequential scan. Sizes are the column
+data (sum of pg_column_size) and the HNSW index for each representation.
+
+Usage:
+    uv run python -m scripts.benchmarks.compact_vectors --rows 200000 --factors 2 4 10
+"""
+import argparse
+
+import numpy as np
+
+from scripts.benchmarks._common import connect, print_table, random_unit_vectors, time_calls
+
+TABLE = "bench_compact_embeddings"
+
+
+def clustered_vectors(n: int, dim: int, clusters: int = 200, noise: float = 0.35, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    centers = random_unit_vectors(clusters, dim, seed=seed + 1)
+    vecs = centers[rng.integers(0, clusters, n)] + noise * rng.standard_normal((n, dim), dtype=np.float32) / np.sqrt(dim)
+    vecs /= np.linalg.norm(vecs, axis=1, keepdims=True)
+    return vecs.astype(np.float32)
+
+
+def load(conn, n: int, dim: int) -> None:
+    with conn.cursor() as cur, cur.copy(f"COPY {TABLE} (embedding) FROM STDIN WITH (FORMAT BINARY)") as copy:
+        copy.set_types(["vector"])
+        for offset in range(0, n, 10_000):
+            for vec in clustered_vectors(min(10_000, n - offset), dim, seed=offset):
+                copy.write_row((vec,))
+    conn.execute(f"UPDATE {TABLE} SET embedding_half = embedding::halfvec, embedding_bit = binary_quantize(embedding)")
+
+
+def size_mb(conn, sql: str) -> float:
+    return conn.execute(sql).fetchone()[0] / 2**20
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--dim", type=int, default=1024)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--factors", type=int, nargs="+", default=[2, 4, 10])
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--ef-search", type=int, default=100)
+    args = parser.parse_args()
+
+    conn = connect()
+    conn.execute(f"DROP TABLE IF EXISTS {TABLE}")
+    conn.execute(f"""
+        CREATE TABLE {TABLE} (
+            id bigserial PRIMARY KEY,
+            embedding vector({args.dim}) NOT NULL,
+            embedding_half halfvec({args.dim}),
+            embedding_bit bit({args.dim})
+        )
+    """)
+    load(conn, args.rows, args.dim)
+    indexes = {
+        "embedding": "vector_cosine_ops",
+        "embedding_half": "halfvec_cosine_ops",
+        "embedding_bit": "bit_hamming_ops",
+    }
+    for column, opclass in indexes.items():
+        conn.execute(
+            f"CREATE INDEX {TABLE}_{column}_hnsw ON {TABLE} USING hnsw ({column} {opclass}) "
+            "WITH (m = 16, ef_construction = 64)"
+        )
+    conn.execute(f"VACUUM ANALYZE {TABLE}")
+
+    sizes = {
+        column: (
+            size_mb(conn, f"SELECT sum(pg_column_size({column})) FROM {TABLE}"),
+            size_mb(conn, f"SELECT pg_relation_size('{TABLE}_{column}_hnsw')"),
+        )
+        for column in indexes
+    }
+
+    queries = clustered_vectors(args.queries, args.dim, seed=10_000_000)
+    k = args.top_k
+    exact_sql = f"SELECT id FROM {TABLE} ORDER BY embedding <=> %s LIMIT %s"
+    truth = []
+    for q in queries:
+        with conn.transaction():
+            conn.execute("SET LOCAL enable_indexscan = off")
+            truth.append({r[0] for r in conn.execute(exact_sql, (q, k)).fetchall()})
+
+    def rerank_sql(column: str, op: str, cast: str) -> str:
+        return (
+            f"SELECT id FROM (SELECT id, embedding FROM {TABLE} ORDER BY {column} {op} {cast} LIMIT %s) c "
+            "ORDER BY embedding <=> %s LIMIT %s"
+        )
+
+    def measure(sql: str, params) -> dict:
+        def search(q):
+            with conn.transaction():
+                conn.execute(f"SET LOCAL hnsw.ef_search = {args.ef_search}")
+                return [r[0] for r in conn.execute(sql, params(q)).fetchall()]
+        recall = np.mean([len(set(search(q)) & t) / k for q, t in zip(queries, truth)])
+        return {**time_calls(lambda: search(queries[0]), repeat=50), f"recall@{k}": float(recall)}
+
+    rows = [{
+        "case": "vector",
+        "column_mb": sizes["embedding"][0],
+        "index_mb": sizes["embedding"][1],
+        **measure(f"SELECT id FROM {TABLE} ORDER BY embedding <=> %s LIMIT %s", lambda q: (q, k)),
+    }]
+    for factor in args.factors:
+        rows.append({
+            "case": f"halfvec+rerank x{factor}",
+            "column_mb": sizes["embedding_half"][0],
+            "index_mb": sizes["embedding_half"][1],
+            **measure(
+                rerank_sql("embedding_half", "<=>", "%s::vector::halfvec"),
+                lambda q: (q, k * factor, q, k),
+            ),
+        })
+        rows.append({
+            "case": f"bit+rerank x{factor}",
+            "column_mb": sizes["embedding_bit"][0],
+            "index_mb": sizes["embedding_bit"][1],
+            **measure(
+                rerank_sql("embedding_bit", "<~>", "binary_quantize(%s::vector)"),
+                lambda q: (q, k * factor, q, k),
+            ),
+        })
+
+    conn.execute(f"DROP TABLE {TABLE}")
+    print(f"{args.rows} rows x {args.dim}-d, top {k}, ef_search {args.ef_search}")
+    print_table(rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""
+Time to delete one large conversation, the way the app used to and the ways it does now.
+
+Each case gets a fresh conversation of `--messages` messages, each with
+`--chunks` embedding rows and a summary every 100 messages (all generated in
+SQL), then deletes it:
+
+- `orm`     : what `db.delete(conversation)` did before passive_deletes: load the
+              messages, lazy-load each message's embeddings (one SELECT per
+              message), then DELETE every row by primary key, children first
+- `cascade` : `DELETE FROM conversations WHERE id = ...`; the database removes the
+              children through ON DELETE CASCADE
+- `soft`    : `UPDATE ... SET deleted_at = now()` answers the request; the rows are
+              then removed by `purge_conversation` in batches of `--batch-size`
+
+`request_ms` is what the DELETE endpoint waits for; `total_ms` includes the
+purge for the soft case. Run after `alembic upgrade head`; on the previous
+schema the `cascade` case fails with a foreign key violation.
+
+Usage:
+    uv run python -m scripts.benchmarks.conversation_delete --messages 50000
+"""
+import argparse
+import asyncio
+import time
+import uuid
+
+from app.core.settings import settings
+from app.db.engine import AsyncSessionLocal
+from app.services.purge import purge_conversation
+from scripts.benchmarks._common import connect, print_table
+
+
+def fill(conn, user: uuid.UUID, messages: int, chunks: int) -> uuid.UUID:
+    conversation = uuid.uuid4()
+    conn.execute(
+        "INSERT INTO conversations (id, user_id, title, status) VALUES (%s, %s, 'delete benchmark', 'Active')",
+        (conversation, user),
+    )
+    conn.execute(
+        "INSERT INTO messages (id, conversation_id, message_count, role, content, token_count) "
+        "SELECT gen_random_uuid(), %s, g, 'User', 'message ' || g, 0 FROM generate_series(1, %s) g",
+        (conversation, messages),
+    )
+    # the subquery references m and c so Postgres draws a fresh random vector per row
+    conn.execute(
+        "INSERT INTO message_embeddings "
+        "(id, message_id, conversation_id, user_id, chunk_index, text_chunk, embedding_model, embedding) "
+        "SELECT gen_random_uuid(), m.id, m.conversation_id, %s, c, m.content, %s, "
+        "(SELECT array_agg(random()) FROM generate_series(1, %s) WHERE m.id IS NOT NULL AND c >= 0)::vector "
+        "FROM messages m CROSS JOIN generate_series(0, %s - 1) c WHERE m.conversation_id = %s",
+        (user, settings.embed_model_name, settings.embed_dim, chunks, conversation),
+    )
+    conn.execute(
+        "INSERT INTO conversation_summaries (id, conversation_id, end_message_count, summary) "
+        "SELECT gen_random_uuid(), %s, g, 'summary ' || g FROM generate_series(100, %s, 100) g",
+        (conversation, messages),
+    )
+    return conversation
+
+
+def orm_delete(conn, conversation: uuid.UUID) -> None:
+    with conn.transaction():
+        messages = [row[0] for row in conn.execute(
+            "SELECT id FROM messages WHERE conversation_id = %s", (conversation,)
+        )]
+        embeddings = []
+        for message in messages:
+            embeddings += conn.execute(
+                "SELECT id FROM message_embeddings WHERE message_id = %s", (message,)
+            ).fetchall()
+        summaries = conn.execute(
+            "SELECT id FROM conversation_summaries WHERE conversation_id = %s", (conversation,)
+        ).fetchall()
+        with conn.cursor() as cur:
+            cur.executemany("DELETE FROM message_embeddings WHERE id = %s", embeddings)
+            cur.executemany("DELETE FROM messages WHERE id = %s", [(m,) for m in messages])
+            cur.executemany("DELETE FROM conversation_summaries WHERE id = %s", summaries)
+        conn.execute("DELETE FROM conversations WHERE id = %s", (conversation,))
+
+
+def cascade_delete(conn, conversation: uuid.UUID) -> None:
+    conn.execute("DELETE FROM conversations WHERE id = %s", (conversation,))
+
+
+async def soft_purge(conversation: uuid.UUID, batch_size: int) -> int:
+    async with AsyncSessionLocal() as db:
+        return await purge_conversation(db, conversation, batch_size)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--messages", type=int, default=50_000)
+    parser.add_argument("--chunks", type=int, default=1, help="embedding rows per message")
+    parser.add_argument("--batch-size", type=int, default=settings.purge_batch_size)
+    parser.add_argument("--cases", nargs="+", default=["orm", "cascade", "soft"])
+    args = parser.parse_args()
+
+    conn = connect()
+    user = uuid.uuid4()
+    conn.execute("INSERT INTO users (id, cognito_sub) VALUES (%s, %s)", (user, f"bench-{user}"))
+    rows = []
+    try:
+        for case in args.cases:
+            conversation = fill(conn, user, args.messages, args.chunks)
+            conn.execute("ANALYZE messages")
+            conn.execute("ANALYZE message_embeddings")
+
+            start = time.perf_counter()
+            if case == "orm":
+                orm_delete(conn, conversation)
+            elif case == "cascade":
+                cascade_delete(conn, conversation)
+            else:
+                conn.execute("UPDATE conversations SET deleted_at = now() WHERE id = %s", (conversation,))
+            request_ms = (time.perf_counter() - start) * 1000.0
+            if case == "soft":
+                asyncio.run(soft_purge(conversation, args.batch_size))
+            total_ms = (time.perf_counter() - start) * 1000.0
+
+            left = conn.execute("SELECT count(*) FROM messages WHERE conversation_id = %s", (conversation,)).fetchone()[0]
+            rows.append({"case": case, "request_ms": request_ms, "total_ms": total_ms, "rows_left": left})
+    finally:
+        conn.execute("DELETE FROM message_embeddings WHERE user_id = %s", (user,))
+        conn.execute(
+            "DELETE FROM messages WHERE conversation_id IN (SELECT id FROM conversations WHERE user_id = %s)", (user,)
+        )
+        conn.execute(
+            "DELETE FROM conversation_summaries "
+            "WHERE conversation_id IN (SELECT id FROM conversations WHERE user_id = %s)", (user,)
+        )
+        conn.execute("DELETE FROM conversations WHERE user_id = %s", (user,))
+        conn.execute("DELETE FROM users WHERE id = %s", (user,))
+
+    print(f"{args.messages} messages x {args.chunks} chunks, purge batch {args.batch_size}")
+    print_table(rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""
+Encode throughput, query latency and retrieval quality of embedding backends.
+
+Each spec is `model:backend`, e.g. `intfloat/e5-large:torch` or
+`intfloat/e5-small-v2:onnx-int8`. Every spec embeds the same corpus (with the
+e5 passage prefix) and the same queries (with the query prefix) through
+chunk_document + encode_ids, the path the app uses. Reported per spec:
+
+- `load_s`      : model load time (includes the one-off int8 export)
+- `texts/s`     : corpus encode throughput
+- `query_p50_ms`: single-query encode latency
+- `recall@k`    : fraction of queries whose source passage is in the top k
+- `overlap@k`   : top-k agreement with the first spec (the reference)
+
+The fixture corpus is built from this repo's README and docstrings; each query
+is the first sentence of a sampled passage. Pass `--corpus` (one passage per
+line) to use your own.
+
+Usage:
+    uv run python -m scripts.benchmarks.embedding_backends \\
+        --specs intfloat/e5-large:torch intfloat/e5-large:onnx intfloat/e5-large:onnx-int8 \\
+                intfloat/e5-base-v2:torch intfloat/e5-small-v2:torch --k 5
+"""
+import argparse
+import ast
+import random
+import re
+import time
+from pathlib import Path
+from typing import List
+
+import numpy as np
+
+from app.core.settings import settings
+from app.services.chunker import chunk_document, query_chunk
+from app.services.embedding_backends import build_embedder, encode_ids
+from scripts.benchmarks._common import print_table, time_calls
+
+ROOT = Path(__file__).resolve().parents[2]
+
+
+def fixture_corpus() -> List[str]:
+    texts = (ROOT / "README.md").read_text(encoding="utf-8").split("\n\n")
+    for path in sorted((ROOT / "app").rglob("*.py")):
+        tree = ast.parse(path.read_text(encoding="utf-8"))
+        for node in ast.walk(tree):
+            if isinstance(node, (ast.Module, ast.ClassDef, ast.FunctionDef, ast.AsyncFunctionDef)):
+                doc = ast.get_docstring(node)
+                if doc:
+                    texts.extend(doc.split("\n\n"))
+    passages = [" ".join(t.split()) for t in texts]
+    return list(dict.fromkeys(p for p in passages if len(p.split()) >= 12))
+
+
+def first_sentence(passage: str) -> str:
+    return re.split(r"(?<=[.!?])\s+", passage, maxsplit=1)[0]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--specs", nargs="+", default=[
+        f"{settings.embed_model_name}:torch",
+        f"{settings.embed_model_name}:onnx",
+        f"{settings.embed_model_name}:onnx-int8",
+        "intfloat/e5-base-v2:torch",
+        "intfloat/e5-small-v2:torch",
+    ])
+    parser.add_argument("--corpus", type=Path, default=None)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--k", type=int, default=5)
+    args = parser.parse_args()
+
+    from transformers import AutoTokenizer
+
+    if args.corpus:
+        corpus = [line.strip() for line in args.corpus.read_text(encoding="utf-8").splitlines() if line.strip()]
+    else:
+        corpus = fixture_corpus()
+    rng = random.Random(0)
+    sources = rng.sample(range(len(corpus)), min(args.queries, len(corpus)))
+    queries = [first_sentence(corpus[i]) for i in sources]
+    print(f"{len(corpus)} passages, {len(queries)} queries")
+
+    rows, reference = [], None
+    for spec in args.specs:
+        model_name, _, backend = spec.rpartition(":")
+        start = time.perf_counter()
+        embedder = build_embedder(
+            model_name, backend, onnx_dir=settings.embed_onnx_dir, quantization=settings.embed_onnx_quantization
+        )
+        tokenizer = AutoTokenizer.from_pretrained(model_name)
+        load_s = time.perf_counter() - start
+
+        # one chunk per passage: the first window, as the app would store it
+        passages = [
+            chunk_document(p, tokenizer, settings.embed_passage_prefix, settings.embed_max_seq_length)[0].input_ids
+            for p in corpus
+        ]
+        query_ids = [
+            query_chunk(q, tokenizer, settings.embed_query_prefix, settings.embed_max_seq_length).input_ids
+            for q in queries
+        ]
+
+        start = time.perf_counter()
+        doc_vecs = encode_ids(embedder, tokenizer, passages, settings.embed_max_batch_size)
+        encode_s = time.perf_counter() - start
+        query_vecs = encode_ids(embedder, tokenizer, query_ids, settings.embed_max_batch_size)
+        latency = time_calls(lambda: encode_ids(embedder, tokenizer, query_ids[:1]), repeat=30)
+
+        top = np.argsort(-(query_vecs @ doc_vecs.T), axis=1)[:, : args.k]
+        recall = float(np.mean([src in row for src, row in zip(sources, top)]))
+        if reference is None:
+            reference = top
+        overlap = float(np.mean([len(set(a) & set(b)) / args.k for a, b in zip(top, reference)]))
+
+        rows.append({
+            "spec": spec,
+            "dim": doc_vecs.shape[1],
+            "load_s": load_s,
+            "texts/s": len(corpus) / encode_s,
+            "query_p50_ms": latency["p50_ms"],
+            f"recall@{args.k}": recall,
+            f"overlap@{args.k}": overlap,
+        })
+
+    print_table(rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Latency of the "latest k messages" history fetch for conversations of 10, 1k and 100k messages.
+
+Compares, on a scratch copy of the `messages` layout:
+
+- `old`        : `ORDER BY created_at ASC LIMIT k` with no index (what get_k_messages used to run;
+                 it also returned the *oldest* k)
+- `newest/noix`: `ORDER BY message_count DESC LIMIT k` without the composite index
+- `newest/ix`  : the same query backed by the (conversation_id, message_count) unique index
+
+Usage:
+    uv run python -m scripts.benchmarks.history --sizes 10 1000 100000 --k 20
+"""
+import argparse
+import uuid
+
+from scripts.benchmarks._common import connect, print_table, time_calls
+
+TABLE = "bench_messages"
+# background rows from other conversations, so the unindexed plans have something to scan past
+NOISE_ROWS = 200_000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 1_000, 100_000])
+    parser.add_argument("--k", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=100)
+    args = parser.parse_args()
+
+    conn = connect()
+    conn.execute(f"DROP TABLE IF EXISTS {TABLE}")
+    conn.execute(f"""
+        CREATE TABLE {TABLE} (
+            id uuid PRIMARY KEY DEFAULT gen_random_uuid(),
+            conversation_id uuid NOT NULL,
+            message_count integer NOT NULL,
+            content text,
+            created_at timestamptz NOT NULL
+        )
+    """)
+    conversations = {size: uuid.uuid4() for size in args.sizes}
+    conn.execute(f"""
+        INSERT INTO {TABLE} (conversation_id, message_count, content, created_at)
+        SELECT ('00000000-0000-0000-0000-' || lpad((g / 50)::text, 12, '0'))::uuid, g % 50 + 1,
+               repeat('x', 200), now() - g * interval '1 second'
+        FROM generate_series(1, {NOISE_ROWS}) AS g
+    """)
+    for size, conversation_id in conversations.items():
+        conn.execute(
+            f"""
+            INSERT INTO {TABLE} (conversation_id, message_count, content, created_at)
+            SELECT %s, g, repeat('x', 200), now() - (%s - g) * interval '1 second'
+            FROM generate_series(1, %s) AS g
+            """,
+            (conversation_id, size, size),
+        )
+    conn.execute(f"ANALYZE {TABLE}")
+
+    queries = {
+        "old": f"SELECT * FROM {TABLE} WHERE conversation_id = %s ORDER BY created_at ASC LIMIT %s",
+        "newest": f"SELECT * FROM {TABLE} WHERE conversation_id = %s ORDER BY message_count DESC LIMIT %s",
+    }
+
+    def bench(sql: str, conversation_id: uuid.UUID):
+        return time_calls(lambda: conn.execute(sql, (conversation_id, args.k)).fetchall(), repeat=args.repeat)
+
+    rows = []
+    for size, conversation_id in conversations.items():
+        rows.append({"messages": size, "case": "old", **bench(queries["old"], conversation_id)})
+        rows.append({"messages": size, "case": "newest/noix", **bench(queries["newest"], conversation_id)})
+
+    conn.execute(f"CREATE UNIQUE INDEX ON {TABLE} (conversation_id, message_count)")
+    conn.execute(f"ANALYZE {TABLE}")
+    for size, conversation_id in conversations.items():
+        rows.append({"messages": size, "case": "newest/ix", **bench(queries["newest"], conversation_id)})
+
+    conn.execute(f"DROP TABLE {TABLE}")
+    print_table(sorted(rows, key=lambda r: (r["messages"], r["case"])))
+
+
+if __name__ == "__main__":
+    main()
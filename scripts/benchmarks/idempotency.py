@@ -0,0 +1,121 @@
+"""
+Retry storm against the chat endpoint, with and without an Idempotency-Key.
+
+Drives the real app in-process (httpx ASGI transport, authentication
+overridden with a scratch user) against the fake LLM provider with
+`--llm-ms` of simulated latency. A wave of `--clients` concurrent clients
+sends the same chat request, and `--retries` more waves follow `--retry-ms`
+apart, landing while the first turn is still running or after it finished.
+The storm runs twice, into fresh conversations, once without and once with
+a shared `Idempotency-Key`, and reports for each:
+
+- `llm_calls`: model invocations (`llm.fake.latency_ms` samples)
+- `messages` : rows stored in the conversation (2 per executed turn)
+- `executed` / `coalesced` / `replayed`: how keyed requests were answered
+- `distinct_replies`: different response bodies seen by the clients
+
+Needs a migrated database; the embedding model is used for retrieval and
+for embedding the stored turns.
+
+Usage:
+    uv run python -m scripts.benchmarks.idempotency --clients 20 --retries 3 --llm-ms 500
+"""
+import argparse
+import asyncio
+import time
+import uuid
+
+import httpx
+from sqlalchemy import delete, func, select
+
+from app.api.deps import get_user_dependency
+from app.core.metrics import registry
+from app.core.settings import settings
+from app.db.engine import AsyncSessionLocal
+from app.models.conversation import Conversation
+from app.models.message import Message
+from app.models.user import User
+from app.services.idempotency import get_idempotency_store
+from scripts.benchmarks._common import print_table
+
+
+async def storm(client: httpx.AsyncClient, conversation_id: uuid.UUID, key: str | None, args) -> dict:
+    store = get_idempotency_store()
+    llm_calls = registry.histogram("llm.fake.latency_ms")
+    before = (llm_calls.count, store.executed.value, store.coalesced.value, store.replayed.value)
+    headers = {"Idempotency-Key": key} if key else {}
+    body = {"user_input": "what did we decide about the schema?", "provider": "fake", "model": "echo"}
+
+    async def send() -> str:
+        response = await client.post(f"/api/v1/conversation/{conversation_id}/chat", json=body, headers=headers)
+        response.raise_for_status()
+        return response.json()["content"]
+
+    async def wave(delay: float) -> list:
+        await asyncio.sleep(delay)
+        return await asyncio.gather(*(send() for _ in range(args.clients)))
+
+    start = time.perf_counter()
+    waves = await asyncio.gather(*(wave(i * args.retry_ms / 1000.0) for i in range(args.retries + 1)))
+    seconds = time.perf_counter() - start
+    async with AsyncSessionLocal() as db:
+        messages = await db.scalar(select(func.count(Message.id)).where(Message.conversation_id == conversation_id))
+    after = (llm_calls.count, store.executed.value, store.coalesced.value, store.replayed.value)
+    return {
+        "idempotency_key": "yes" if key else "no",
+        "requests": args.clients * (args.retries + 1),
+        "llm_calls": after[0] - before[0],
+        "messages": messages,
+        "executed": after[1] - before[1],
+        "coalesced": after[2] - before[2],
+        "replayed": after[3] - before[3],
+        "distinct_replies": len({reply for replies in waves for reply in replies}),
+        "seconds": seconds,
+    }
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--clients", type=int, default=20)
+    parser.add_argument("--retries", type=int, default=3)
+    parser.add_argument("--retry-ms", type=float, default=300.0)
+    parser.add_argument("--llm-ms", type=float, default=500.0)
+    args = parser.parse_args()
+    settings.llm_fake_enabled = True
+    settings.llm_fake_delay_ms = args.llm_ms
+
+    from app.main import app
+
+    user_id = uuid.uuid4()
+    async with AsyncSessionLocal() as db:
+        user = User(id=user_id, cognito_sub=f"bench-{user_id}")
+        db.add(user)
+        await db.commit()
+        await db.refresh(user)
+    app.dependency_overrides[get_user_dependency] = lambda: user
+
+    rows = []
+    try:
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            for key in (None, f"bench-{uuid.uuid4()}"):
+                conversation_id = uuid.uuid4()
+                async with AsyncSessionLocal() as db:
+                    db.add(Conversation(id=conversation_id, user_id=user_id, title="idempotency benchmark"))
+                    await db.commit()
+                rows.append(await storm(client, conversation_id, key, args))
+    finally:
+        app.dependency_overrides.clear()
+        # messages and embeddings go with the conversations (ON DELETE CASCADE)
+        async with AsyncSessionLocal() as db:
+            await db.execute(delete(Conversation).where(Conversation.user_id == user_id))
+            await db.execute(delete(User).where(User.id == user_id))
+            await db.commit()
+
+    print(f"{args.clients} concurrent clients x {args.retries + 1} waves {args.retry_ms:.0f} ms apart, "
+          f"fake LLM {args.llm_ms:.0f} ms")
+    print_table(rows)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,119 @@
+"""
+Per-turn overhead of a fresh LLM client versus the pooled provider registry.
+
+Sends the same small chat completion `--calls` times, one after another,
+through:
+
+- `per-call` : a new `ChatOpenAI` (and so a new HTTP connection pool) per call, the old behaviour
+- `pooled`   : `llm_registry.get("openai", model)`, reusing keep-alive connections
+
+By default the target is a local stub of the OpenAI chat completions API
+(plain HTTP, `--server-ms` of simulated model time), so the difference is
+client construction plus TCP connect. Against a real endpoint
+(`--base-url https://api.openai.com/v1`, OPENAI_API_KEY set) the TLS
+handshake saved per turn is added on top. `connections` is the number of
+distinct client sockets the stub saw.
+
+Usage:
+    uv run python -m scripts.benchmarks.llm_clients --calls 200 --server-ms 5
+"""
+import argparse
+import asyncio
+import statistics
+import threading
+import time
+
+import uvicorn
+from fastapi import FastAPI, Request
+from langchain_core.messages import HumanMessage
+from langchain_openai import ChatOpenAI
+
+from app.core.settings import settings
+from app.services.llm import llm_registry
+from scripts.benchmarks._common import print_table
+
+PORT = 8765
+
+
+def stub_app(server_ms: float, peers: set) -> FastAPI:
+    app = FastAPI()
+
+    @app.post("/v1/chat/completions")
+    async def completions(request: Request):
+        peers.add(request.client.port)
+        body = await request.json()
+        await asyncio.sleep(server_ms / 1000.0)
+        return {
+            "id": "chatcmpl-bench",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body["model"],
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": "ok"}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2},
+        }
+
+    return app
+
+
+def start_stub(server_ms: float, peers: set) -> uvicorn.Server:
+    server = uvicorn.Server(uvicorn.Config(stub_app(server_ms, peers), port=PORT, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return server
+
+
+async def measure(name: str, make_llm, calls: int, peers: set) -> dict:
+    messages = [HumanMessage(content="ping")]
+    await make_llm().ainvoke(messages)  # warm-up, also opens the pooled connection
+    peers.clear()
+    samples = []
+    for _ in range(calls):
+        start = time.perf_counter()
+        await make_llm().ainvoke(messages)
+        samples.append((time.perf_counter() - start) * 1000.0)
+    samples.sort()
+    return {
+        "client": name,
+        "p50_ms": statistics.median(samples),
+        "p99_ms": samples[min(len(samples) - 1, int(0.99 * len(samples)))],
+        "mean_ms": statistics.fmean(samples),
+        "connections": len(peers) if peers else "n/a",
+    }
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--calls", type=int, default=200)
+    parser.add_argument("--model", default="gpt-5-nano")
+    parser.add_argument("--server-ms", type=float, default=5.0)
+    parser.add_argument("--base-url", default=None, help="real endpoint instead of the local stub")
+    args = parser.parse_args()
+
+    peers: set = set()
+    server = None
+    if args.base_url is None:
+        server = start_stub(args.server_ms, peers)
+        settings.openai_base_url = f"http://127.0.0.1:{PORT}/v1"
+    else:
+        settings.openai_base_url = args.base_url
+    settings.llm_models = {"openai": [args.model]}
+
+    def fresh():
+        return ChatOpenAI(model=args.model, api_key=settings.OPENAI_API_KEY, base_url=settings.openai_base_url)
+
+    try:
+        rows = [
+            await measure("per-call", fresh, args.calls, peers),
+            await measure("pooled", lambda: llm_registry.get("openai", args.model), args.calls, peers),
+        ]
+    finally:
+        await llm_registry.aclose()
+        if server is not None:
+            server.should_exit = True
+    print(f"{args.calls} sequential calls to {settings.openai_base_url}")
+    print_table(rows)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,112 @@
+"""
+Page-N latency of OFFSET versus keyset (cursor) pagination.
+
+A scratch user gets `--rows` conversations and one conversation gets
+`--rows` messages (generated in SQL). For each page number N the query
+behind the listing endpoint is timed both ways:
+
+- `offset` : `ORDER BY ... OFFSET (N-1)*limit LIMIT limit`, which reads and discards every earlier row
+- `keyset` : `WHERE key after cursor ORDER BY ... LIMIT limit+1`, a range scan from the cursor
+
+Conversations are ordered by (updated_at DESC, id) and served by
+ix_conversations_user_id_updated_at; messages by message_count and served
+by the (conversation_id, message_count) unique index. The cursor for page N
+is read once before timing, as a client would have it from page N-1.
+
+Usage:
+    uv run python -m scripts.benchmarks.pagination --rows 100000 --limit 10 --pages 1 10 100 1000 10000
+"""
+import argparse
+import uuid
+
+from scripts.benchmarks._common import connect, print_table, time_calls
+
+CONVERSATIONS = {
+    "offset": (
+        "SELECT * FROM conversations WHERE user_id = %(user)s "
+        "ORDER BY updated_at DESC, id OFFSET %(offset)s LIMIT %(limit)s"
+    ),
+    "keyset": (
+        "SELECT * FROM conversations WHERE user_id = %(user)s "
+        "AND (updated_at < %(k0)s OR (updated_at = %(k0)s AND id > %(k1)s)) "
+        "ORDER BY updated_at DESC, id LIMIT %(limit)s + 1"
+    ),
+    "key": "SELECT updated_at, id FROM conversations WHERE user_id = %(user)s "
+           "ORDER BY updated_at DESC, id OFFSET %(offset)s - 1 LIMIT 1",
+}
+
+MESSAGES = {
+    "offset": (
+        "SELECT * FROM messages WHERE conversation_id = %(conversation)s "
+        "ORDER BY message_count OFFSET %(offset)s LIMIT %(limit)s"
+    ),
+    "keyset": (
+        "SELECT * FROM messages WHERE conversation_id = %(conversation)s "
+        "AND message_count > %(k0)s ORDER BY message_count LIMIT %(limit)s + 1"
+    ),
+    "key": "SELECT message_count, NULL FROM messages WHERE conversation_id = %(conversation)s "
+           "ORDER BY message_count OFFSET %(offset)s - 1 LIMIT 1",
+}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--limit", type=int, default=10)
+    parser.add_argument("--pages", type=int, nargs="+", default=[1, 10, 100, 1000, 10000])
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    conn = connect()
+    user, conversation = uuid.uuid4(), uuid.uuid4()
+    conn.execute("INSERT INTO users (id, cognito_sub) VALUES (%s, %s)", (user, f"bench-{user}"))
+    conn.execute(
+        "INSERT INTO conversations (id, user_id, title, status, created_at, updated_at) "
+        "SELECT CASE WHEN g = 1 THEN %s ELSE gen_random_uuid() END, %s, 'bench ' || g, 'Active', "
+        "now() - g * interval '1 second', now() - (g / 3) * interval '1 second' "
+        "FROM generate_series(1, %s) g",
+        (conversation, user, args.rows),
+    )
+    conn.execute(
+        "INSERT INTO messages (id, conversation_id, message_count, role, content, token_count, created_at) "
+        "SELECT gen_random_uuid(), %s, g, 'User', 'message ' || g, 0, now() + g * interval '1 millisecond' "
+        "FROM generate_series(1, %s) g",
+        (conversation, args.rows),
+    )
+    conn.execute("ANALYZE conversations")
+    conn.execute("ANALYZE messages")
+
+    rows = []
+    try:
+        for listing, sql in (("conversations", CONVERSATIONS), ("messages", MESSAGES)):
+            for page in args.pages:
+                offset = (page - 1) * args.limit
+                if offset >= args.rows:
+                    continue
+                params = {"user": user, "conversation": conversation, "offset": offset, "limit": args.limit}
+                if page > 1:
+                    params["k0"], params["k1"] = conn.execute(sql["key"], params).fetchone()
+                else:
+                    params["k0"], params["k1"] = None, None
+                row = {"listing": listing, "page": page}
+                for case in ("offset", "keyset"):
+                    if case == "keyset" and page == 1:
+                        # the first page has no cursor: same query without the key predicate
+                        query = sql["offset"]
+                    else:
+                        query = sql[case]
+                    stats = time_calls(lambda: conn.execute(query, params).fetchall(), repeat=args.repeat)
+                    row[f"{case}_p50_ms"] = stats["p50_ms"]
+                    row[f"{case}_p99_ms"] = stats["p99_ms"]
+                rows.append(row)
+    finally:
+        conn.execute("DELETE FROM messages WHERE conversation_id = %s", (conversation,))
+        conn.execute("DELETE FROM conversations WHERE user_id = %s", (user,))
+        conn.execute("DELETE FROM users WHERE id = %s", (user,))
+
+    print(f"{args.rows} rows per listing, {args.limit} per page")
+    print_table(rows)
+
+
+if __name__ == "__main__":
+    main()
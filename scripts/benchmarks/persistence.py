@@ -0,0 +1,144 @@
+"""
+Throughput and commit latency of chat-turn persistence.
+
+Compares, on real tables with synthetic vectors (the embedding model is not run):
+
+- `legacy` : the old path; per message an ORM insert + commit + refresh, then ORM
+             MessageEmbedding rows from Python lists + commit (4 commits per turn)
+- `insert` : persist_messages with a multi-row INSERT for the embeddings (1 commit per turn)
+- `copy`   : persist_messages with binary COPY for the embeddings (1 commit per turn)
+
+Each turn is a user + AI message with `--chunks` embedding rows each. A scratch
+user and conversation are created and deleted afterwards.
+
+Usage:
+    uv run python -m scripts.benchmarks.persistence --turns 200 --chunks 2
+"""
+import argparse
+import asyncio
+import time
+import uuid
+
+from sqlalchemy import delete
+
+from app.core.settings import settings
+from app.db.engine import AsyncSessionLocal
+from app.models.conversation import Conversation
+from app.models.message import Message
+from app.models.message_embeddings import MessageEmbedding
+from app.models.user import User
+from app.schemas.messages import MessageCreate
+from app.services.persistence import persist_messages
+from scripts.benchmarks._common import print_table, random_unit_vectors
+
+
+def _turn(conversation_id, i):
+    return [
+        MessageCreate(role="user", content=f"question {i} " * 40, token_count=0, conversation_id=conversation_id),
+        MessageCreate(role="ai", content=f"answer {i} " * 120, token_count=0, conversation_id=conversation_id),
+    ]
+
+
+async def legacy_turn(db, messages, embeddings, user_id, next_count):
+    commits = []
+    for message, chunks in zip(messages, embeddings):
+        msg = Message(
+            conversation_id=message.conversation_id,
+            message_count=next_count,
+            role=message.role,
+            content=message.content,
+            token_count=message.token_count,
+        )
+        next_count += 1
+        db.add(msg)
+        start = time.perf_counter()
+        await db.commit()
+        commits.append(time.perf_counter() - start)
+        await db.refresh(msg)
+        db.add_all(
+            MessageEmbedding(
+                message_id=msg.id,
+                conversation_id=msg.conversation_id,
+                user_id=user_id,
+                chunk_index=idx,
+                text_chunk=text,
+                embedding_model=settings.embed_model_name,
+                embedding=vec.tolist(),
+            )
+            for idx, (text, vec) in enumerate(chunks)
+        )
+        start = time.perf_counter()
+        await db.commit()
+        commits.append(time.perf_counter() - start)
+        await db.refresh(msg)
+    return commits, next_count
+
+
+async def run_case(name, conversation_id, user_id, turns, chunks, dim):
+    vectors = random_unit_vectors(turns * 2 * chunks, dim)
+    next_count = 1_000_000 * (1 + ["legacy", "insert", "copy"].index(name))
+    commits = []
+    start = time.perf_counter()
+    async with AsyncSessionLocal() as db:
+        for i in range(turns):
+            messages = _turn(conversation_id, i)
+            for message in messages:
+                message.message_count = next_count
+                next_count += 1
+            base = i * 2 * chunks
+            embeddings = [
+                [(f"chunk {j}", vectors[base + m * chunks + j]) for j in range(chunks)]
+                for m in range(2)
+            ]
+            if name == "legacy":
+                c, _ = await legacy_turn(db, messages, embeddings, user_id, messages[0].message_count)
+                commits.extend(c)
+            else:
+                settings.embedding_insert_mode = name
+                t = time.perf_counter()
+                await persist_messages(db, messages, user_id, embeddings=embeddings)
+                commits.append(time.perf_counter() - t)
+    elapsed = time.perf_counter() - start
+    rows = turns * 2 * (1 + chunks)
+    commits.sort()
+    return {
+        "path": name,
+        "turns/s": turns / elapsed,
+        "rows/s": rows / elapsed,
+        "commits/turn": len(commits) / turns,
+        "commit_p50_ms": commits[len(commits) // 2] * 1000.0,
+        "commit_p99_ms": commits[min(len(commits) - 1, int(0.99 * len(commits)))] * 1000.0,
+    }
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--turns", type=int, default=200)
+    parser.add_argument("--chunks", type=int, default=2)
+    parser.add_argument("--dim", type=int, default=settings.embed_dim)
+    args = parser.parse_args()
+
+    user_id, conversation_id = uuid.uuid4(), uuid.uuid4()
+    async with AsyncSessionLocal() as db:
+        db.add(User(id=user_id, cognito_sub=f"bench-{user_id}"))
+        await db.flush()
+        db.add(Conversation(id=conversation_id, user_id=user_id, title="persistence benchmark"))
+        await db.commit()
+
+    try:
+        rows = [
+            await run_case(name, conversation_id, user_id, args.turns, args.chunks, args.dim)
+            for name in ("legacy", "insert", "copy")
+        ]
+        print_table(rows)
+    finally:
+        async with AsyncSessionLocal() as db:
+            await db.execute(delete(MessageEmbedding).where(MessageEmbedding.conversation_id == conversation_id))
+            await db.execute(delete(Message).where(Message.conversation_id == conversation_id))
+            await db.execute(delete(Conversation).where(Conversation.id == conversation_id))
+            await db.execute(delete(User).where(User.id == user_id))
+            await db.commit()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,94 @@
+"""
+Hit ratio and latency saved by the response cache on an FAQ-style workload.
+
+`--requests` prompts are drawn from `--questions` distinct questions with a
+Zipf-like skew (a few questions dominate, as in real FAQ traffic). Each
+question has several phrasings that differ in case, punctuation and wording,
+so exact matching only catches verbatim repeats while semantic matching also
+catches paraphrases. Every request is a first turn in a fresh conversation,
+so the assembled context is the same across requests. A miss stands in for
+an LLM call of `--llm-ms`.
+
+Prompts are embedded with the configured model (the same `aembed_query` call
+retrieval makes), once each, outside the timed section.
+
+Usage:
+    uv run python -m scripts.benchmarks.response_cache --requests 2000 --similarity 0.9 0.95 0.98
+"""
+import argparse
+import asyncio
+import random
+import time
+
+from app.core.settings import settings
+from app.services.context import build_context
+from app.services.embeddings import aembed_query
+from app.services.response_cache import CachedResponse, ResponseCache
+from scripts.benchmarks._common import print_table
+
+TOPICS = [
+    "reset my password", "change the email on my account", "export my conversations",
+    "delete a conversation", "upgrade my plan", "cancel my subscription", "enable two factor authentication",
+    "get an invoice", "use the API", "increase my rate limit", "share a conversation", "change the model",
+]
+TEMPLATES = [
+    "How do I {}?", "how do i {}", "How can I {}?", "What's the way to {}?", "Is there a way to {}?",
+]
+
+
+def workload(n: int, questions: int, seed: int = 0) -> list[str]:
+    rng = random.Random(seed)
+    topics = TOPICS[:questions]
+    weights = [1.0 / (rank + 1) for rank in range(len(topics))]
+    return [rng.choice(TEMPLATES).format(rng.choices(topics, weights)[0]) for _ in range(n)]
+
+
+async def run(prompts: list[str], vectors: dict, mode: str, threshold: float | None, llm_ms: float) -> dict:
+    cache = ResponseCache(maxsize=10_000, ttl=3600.0, threshold=threshold, name=f"bench_response_cache_{mode}_{threshold}")
+    start = time.perf_counter()
+    for prompt in prompts:
+        context = build_context([], [], prompt, budget=settings.prompt_token_budget).messages
+        if mode != "off" and cache.get("openai", "gpt-5-mini", prompt, context, vectors[prompt]) is not None:
+            continue
+        await asyncio.sleep(llm_ms / 1000.0)
+        if mode != "off":
+            cache.set("openai", "gpt-5-mini", prompt, context, CachedResponse(
+                content=f"answer to {prompt}", prompt_tokens=0, completion_tokens=0,
+                latency_ms=llm_ms, vector=vectors[prompt],
+            ))
+    elapsed = time.perf_counter() - start
+    return {
+        "mode": mode,
+        "similarity": threshold if threshold is not None else "-",
+        "hit_ratio": cache.hit_ratio() or 0.0,
+        "exact_hits": cache.hits.value,
+        "semantic_hits": cache.semantic_hits.value,
+        "mean_turn_ms": elapsed * 1000.0 / len(prompts),
+        "latency_saved_s": cache.latency_saved_ms.value / 1000.0,
+    }
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--questions", type=int, default=len(TOPICS))
+    parser.add_argument("--llm-ms", type=float, default=20.0, help="simulated LLM latency per miss")
+    parser.add_argument("--similarity", type=float, nargs="+", default=[0.9, 0.95, 0.98])
+    args = parser.parse_args()
+
+    prompts = workload(args.requests, args.questions)
+    vectors = {prompt: await aembed_query(prompt) for prompt in set(prompts)}
+    rows = [
+        await run(prompts, vectors, "off", None, args.llm_ms),
+        await run(prompts, vectors, "exact", None, args.llm_ms),
+    ]
+    for threshold in args.similarity:
+        rows.append(await run(prompts, vectors, "semantic", threshold, args.llm_ms))
+
+    print(f"{args.requests} requests over {args.questions} questions x {len(TEMPLATES)} phrasings, "
+          f"{len(vectors)} distinct prompts, simulated LLM {args.llm_ms:.0f} ms")
+    print_table(rows)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,111 @@
+"""
+Query latency of scoped pgvector retrieval at growing table sizes.
+
+Loads synthetic unit vectors into a scratch table shaped like
+`message_embeddings` (conversation_id, user_id, embedding) and compares:
+
+- `seqscan`      : the old unscoped `ORDER BY cosine_distance LIMIT k`, index disabled
+- `hnsw`         : unscoped HNSW search at a few `ef_search` values
+- `user`         : HNSW search filtered to one user (iterative scan)
+- `conversation` : exact search over one conversation via the btree index
+
+Usage:
+    uv run python -m scripts.benchmarks.retrieval --sizes 10000 100000 1000000
+
+Building the HNSW index on 1M x 1024-d rows takes a while; use
+`maintenance_work_mem` of a few GB on the database for that size.
+"""
+import argparse
+import uuid
+
+import numpy as np
+
+from scripts.benchmarks._common import connect, print_table, random_unit_vectors, stopwatch, time_calls
+
+TABLE = "bench_message_embeddings"
+ROWS_PER_CONVERSATION = 100
+CONVERSATIONS_PER_USER = 10
+
+
+def load(conn, start: int, stop: int, dim: int) -> None:
+    with conn.cursor() as cur, cur.copy(
+        f"COPY {TABLE} (conversation_id, user_id, embedding) FROM STDIN WITH (FORMAT BINARY)"
+    ) as copy:
+        copy.set_types(["uuid", "uuid", "vector"])
+        batch = 10_000
+        for offset in range(start, stop, batch):
+            vecs = random_unit_vectors(min(batch, stop - offset), dim, seed=offset)
+            for i, vec in enumerate(vecs, start=offset):
+                conv = i // ROWS_PER_CONVERSATION
+                user = conv // CONVERSATIONS_PER_USER
+                copy.write_row((uuid.UUID(int=conv + 1), uuid.UUID(int=(user + 1) << 64), vec))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--dim", type=int, default=1024)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    conn = connect()
+    conn.execute(f"DROP TABLE IF EXISTS {TABLE}")
+    conn.execute(f"""
+        CREATE TABLE {TABLE} (
+            id bigserial PRIMARY KEY,
+            conversation_id uuid NOT NULL,
+            user_id uuid NOT NULL,
+            embedding vector({args.dim}) NOT NULL
+        )
+    """)
+    conn.execute(f"CREATE INDEX ON {TABLE} (conversation_id)")
+    conn.execute(f"CREATE INDEX ON {TABLE} (user_id)")
+
+    query = random_unit_vectors(1, args.dim, seed=12345)[0]
+    rows = []
+    loaded = 0
+    for size in sorted(args.sizes):
+        load(conn, loaded, size, args.dim)
+        loaded = size
+        conn.execute(f"DROP INDEX IF EXISTS {TABLE}_hnsw")
+        with stopwatch() as build:
+            conn.execute(
+                f"CREATE INDEX {TABLE}_hnsw ON {TABLE} USING hnsw (embedding vector_cosine_ops) "
+                "WITH (m = 16, ef_construction = 64)"
+            )
+        conn.execute(f"ANALYZE {TABLE}")
+
+        user_id = uuid.UUID(int=1 << 64)
+        conversation_id = uuid.UUID(int=1)
+        sql = f"SELECT id FROM {TABLE} {{where}} ORDER BY embedding <=> %s LIMIT %s"
+
+        def run(where: str = "", params: tuple = (), setup: tuple = ()):
+            def call():
+                with conn.transaction():
+                    for stmt in setup:
+                        conn.execute(stmt)
+                    conn.execute(sql.format(where=where), (*params, query, args.top_k)).fetchall()
+            return time_calls(call, repeat=args.repeat)
+
+        cases = {
+            "seqscan": run(setup=("SET LOCAL enable_indexscan = off",)),
+            "hnsw ef=40": run(setup=("SET LOCAL hnsw.ef_search = 40",)),
+            "hnsw ef=100": run(setup=("SET LOCAL hnsw.ef_search = 100",)),
+            "user ef=40": run(
+                "WHERE user_id = %s", (user_id,),
+                ("SET LOCAL hnsw.ef_search = 40", "SET LOCAL hnsw.iterative_scan = relaxed_order"),
+            ),
+            "conversation": run("WHERE conversation_id = %s", (conversation_id,)),
+        }
+        for name, stats in cases.items():
+            rows.append({"rows": size, "case": name, **stats, "index_build_s": build["seconds"]})
+        print_table(rows[-len(cases):])
+        print()
+
+    conn.execute(f"DROP TABLE {TABLE}")
+    print_table(rows)
+
+
+if __name__ == "__main__":
+    main()
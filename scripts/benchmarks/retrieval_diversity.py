@@ -0,0 +1,146 @@
+"""
+Context tokens and coverage of retrieval post-processing on a redundant transcript.
+
+The fixture conversation has the redundancy real chats have: long assistant
+answers that split into several overlapping chunks, an answer regenerated
+word for word, and a traceback pasted twice. For every query the candidates
+are ranked by cosine similarity in memory (no database needed) and then
+turned into the retrieval context message in four ways:
+
+- `message`        : top_k hits expanded to their whole message (the old behaviour)
+- `chunks`         : top_k chunks as ranked
+- `dedupe+collapse`: repeated texts dropped, at most one chunk per message
+- `mmr`            : as above, final top_k picked by maximal marginal relevance
+
+Reported per case: tokens of the context message, distinct messages it
+covers, and hit@k, the fraction of queries whose source message is present.
+
+Usage:
+    uv run python -m scripts.benchmarks.retrieval_diversity --top-k 4 --chunk-tokens 96 --mmr-lambda 0.6
+"""
+import argparse
+import uuid
+
+import numpy as np
+
+from app.services.embeddings import chunk_text, embed_query, encode_chunks
+from app.services.retrieval import RetrievedChunk, diversify, format_context
+from app.services.tokens import count_tokens
+from scripts.benchmarks._common import print_table
+
+TRACEBACK = (
+    "Traceback (most recent call last): File \"app/db/engine.py\", line 41, in connect "
+    "psycopg.OperationalError: connection to server at \"db\" (172.18.0.2), port 5432 failed: "
+    "FATAL: remaining connection slots are reserved for non-replication superuser connections"
+)
+
+POOL_ANSWER = (
+    "The error means Postgres ran out of connection slots. Every worker process opens its own "
+    "SQLAlchemy pool, so four Uvicorn workers with pool_size 10 and max_overflow 20 can ask for "
+    "120 connections while max_connections is 100. Lower the pool size per worker, or put PgBouncer "
+    "in transaction mode in front of the database. "
+    "Check pg_stat_activity to see which application holds the connections and whether they are idle. "
+    "Idle in transaction sessions usually mean a request forgot to commit or roll back. "
+    "Setting idle_in_transaction_session_timeout makes Postgres close those sessions for you. "
+    "Once the pools fit, the FATAL error disappears and the reserved superuser slots stay free for maintenance. "
+    "If you need more throughput, raise max_connections together with shared_buffers, "
+    "because every connection costs a backend process and some memory."
+)
+
+MESSAGES = [
+    ("human", "Our chatbot API started failing under load this morning. Here is the log: " + TRACEBACK),
+    ("ai", POOL_ANSWER),
+    ("ai", POOL_ANSWER),  # regenerated answer, identical text
+    ("human", "Same thing again after the deploy: " + TRACEBACK),
+    ("ai",
+     "For embeddings, the e5 models expect a 'passage: ' prefix on stored text and 'query: ' on "
+     "searches. Long messages are split by sentences into windows that fit the model's 512 tokens, "
+     "with a small overlap so a fact on a boundary is still found. Each chunk gets its own vector "
+     "in message_embeddings and an HNSW index makes cosine search fast. "
+     "Normalised vectors let inner product stand in for cosine similarity. "
+     "If the model changes, the stored vectors must be re-embedded because spaces are not comparable. "
+     "The deferred worker can do that in the background without blocking chat requests."),
+    ("human", "How do I rotate the JWT signing secret without logging everyone out?"),
+    ("ai",
+     "Keep two secrets during the rotation window. Sign new tokens with the new secret and accept "
+     "tokens signed with either. When the longest token lifetime has passed, drop the old secret. "
+     "Access tokens here live thirty minutes, so the window can be short; refresh tokens need the full "
+     "refresh lifetime. Store both secrets in the environment and read them in settings, never in code."),
+    ("human", "What does the summary cache do when a conversation gets very long?"),
+    ("ai",
+     "Older turns that no longer fit the prompt budget are folded into a running summary. The summary "
+     "is stored per conversation and reused until new turns fall out of the window, so the model is "
+     "only asked to summarise the delta. Recent turns stay verbatim in history."),
+]
+
+QUERIES = [
+    ("why are there no connection slots left in postgres", {1, 2}),
+    ("FATAL remaining connection slots are reserved", {0, 3}),
+    ("what prefix do e5 embeddings need", {4}),
+    ("rotate the jwt secret", {6}),
+    ("how are long conversations summarised", {8}),
+    ("pgbouncer transaction mode and pool size per worker", {1, 2}),
+]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--top-k", type=int, default=4)
+    parser.add_argument("--pool-factor", type=int, default=4)
+    parser.add_argument("--chunk-tokens", type=int, default=96, help="chunk size, small to force multi-chunk messages")
+    parser.add_argument("--mmr-lambda", type=float, default=0.6)
+    args = parser.parse_args()
+
+    ids = [uuid.uuid4() for _ in MESSAGES]
+    by_id = {mid: (role, text) for mid, (role, text) in zip(ids, MESSAGES)}
+    chunks = []
+    for mid, (role, text) in zip(ids, MESSAGES):
+        for chunk in chunk_text(text, max_len=args.chunk_tokens):
+            chunks.append((mid, role, chunk))
+    vectors = encode_chunks([c for _, _, c in chunks]).astype(np.float32)
+    print(f"{len(MESSAGES)} messages -> {len(chunks)} chunks, top {args.top_k}, pool x{args.pool_factor}")
+
+    totals = {case: {"tokens": 0, "messages": 0, "hits": 0} for case in ("message", "chunks", "dedupe+collapse", "mmr")}
+    for query, sources in QUERIES:
+        query_vec = embed_query(query)
+        similarity = vectors @ query_vec
+        order = np.argsort(-similarity)[: args.top_k * args.pool_factor]
+        ranked = [
+            RetrievedChunk(message_id=chunks[i][0], role=chunks[i][1], text=chunks[i][2].text, distance=float(1 - similarity[i]))
+            for i in order
+        ]
+        pool_vectors = vectors[order]
+        top = ranked[: args.top_k]
+        whole = [
+            RetrievedChunk(message_id=c.message_id, role=c.role, text=by_id[c.message_id][1], distance=c.distance)
+            for c in top
+        ]
+        cases = {
+            "message": whole,
+            "chunks": top,
+            "dedupe+collapse": diversify(ranked, pool_vectors, query_vec, args.top_k, max_per_message=1, mmr_lambda=None),
+            "mmr": diversify(ranked, pool_vectors, query_vec, args.top_k, max_per_message=1, mmr_lambda=args.mmr_lambda),
+        }
+        wanted = {ids[i] for i in sources}
+        for case, hits in cases.items():
+            message = format_context(hits)
+            totals[case]["tokens"] += count_tokens(message.content) if message else 0
+            totals[case]["messages"] += len({c.message_id for c in hits})
+            totals[case]["hits"] += bool(wanted & {c.message_id for c in hits})
+
+    n = len(QUERIES)
+    baseline = totals["message"]["tokens"]
+    print_table([
+        {
+            "case": case,
+            "context_tokens": t["tokens"] / n,
+            "vs_message": t["tokens"] / baseline,
+            "distinct_messages": t["messages"] / n,
+            f"hit@{args.top_k}": t["hits"] / n,
+        }
+        for case, t in totals.items()
+    ])
+
+
+if __name__ == "__main__":
+    main()
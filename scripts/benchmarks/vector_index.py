@@ -0,0 +1,143 @@
+"""
+Latency of conversation-scoped retrieval: pgvector versus the in-process index.
+
+For each conversation size a scratch conversation is filled with synthetic
+chunks (random vectors, the embedding model is not run) and the candidate
+search behind search_context is timed per query:
+
+- `pgvector`    : `_db_candidates`, HNSW + scope filter (and full-text in hybrid mode)
+- `index_load`  : first use of the in-process index, reading every vector of the conversation
+- `index`       : version check + NumPy scan (+ full-text ids in hybrid mode), the steady state
+
+Run once per RETRIEVAL_MODE (`vector` / `hybrid`). The scratch user is
+deleted afterwards.
+
+Usage:
+    uv run python -m scripts.benchmarks.vector_index --sizes 500 2000 10000 --repeat 100
+"""
+import argparse
+import asyncio
+import statistics
+import time
+import uuid
+
+from sqlalchemy import delete, select
+
+from app.core.settings import settings
+from app.db.engine import AsyncSessionLocal
+from app.models.conversation import Conversation
+from app.models.message import Message
+from app.models.message_embeddings import MessageEmbedding
+from app.models.user import User
+from app.schemas.messages import MessageCreate
+from app.services.persistence import persist_messages
+from app.services.retrieval import _apply_search_knobs, _db_candidates, _local_candidates
+from app.services.vector_index import VectorIndexCache
+from scripts.benchmarks._common import print_table, random_unit_vectors
+
+CHUNKS_PER_MESSAGE = 4
+
+
+async def fill(conversation_id, user_id, chunks: int, dim: int) -> None:
+    vectors = random_unit_vectors(chunks, dim, seed=chunks)
+    messages = chunks // CHUNKS_PER_MESSAGE
+    async with AsyncSessionLocal() as db:
+        for start in range(0, messages, 250):
+            batch = range(start, min(start + 250, messages))
+            await persist_messages(
+                db,
+                [
+                    MessageCreate(role="ai", content=f"message {i}", token_count=0,
+                                  conversation_id=conversation_id, message_count=i + 1)
+                    for i in batch
+                ],
+                user_id,
+                embeddings=[
+                    [
+                        (f"topic {(i * CHUNKS_PER_MESSAGE + j) % 97} chunk {j} of message {i}",
+                         vectors[i * CHUNKS_PER_MESSAGE + j])
+                        for j in range(CHUNKS_PER_MESSAGE)
+                    ]
+                    for i in batch
+                ],
+            )
+
+
+async def timed(fn, repeat: int) -> dict:
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        await fn()
+        samples.append((time.perf_counter() - start) * 1000.0)
+    samples.sort()
+    return {
+        "p50_ms": statistics.median(samples),
+        "p99_ms": samples[min(len(samples) - 1, int(0.99 * len(samples)))],
+    }
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[500, 2000, 10000])
+    parser.add_argument("--dim", type=int, default=settings.embed_dim)
+    parser.add_argument("--pool", type=int, default=40)
+    parser.add_argument("--repeat", type=int, default=100)
+    args = parser.parse_args()
+
+    user_id = uuid.uuid4()
+    async with AsyncSessionLocal() as db:
+        db.add(User(id=user_id, cognito_sub=f"bench-{user_id}"))
+        await db.commit()
+
+    query_vec = random_unit_vectors(1, args.dim, seed=12345)[0]
+    query = "topic 17 chunk"
+    rows = []
+    try:
+        for size in args.sizes:
+            conversation_id = uuid.uuid4()
+            async with AsyncSessionLocal() as db:
+                db.add(Conversation(id=conversation_id, user_id=user_id, title=f"vector index benchmark {size}"))
+                await db.commit()
+            await fill(conversation_id, user_id, size, args.dim)
+            filters = [
+                MessageEmbedding.user_id == user_id,
+                MessageEmbedding.embedding_model == settings.embed_model_name,
+                MessageEmbedding.conversation_id == conversation_id,
+            ]
+
+            async with AsyncSessionLocal() as db:
+                await _apply_search_knobs(db, settings.retrieval_ef_search, settings.retrieval_probes)
+                rows.append({
+                    "chunks": size,
+                    "path": "pgvector",
+                    **await timed(lambda: _db_candidates(db, query, query_vec, filters, args.pool), args.repeat),
+                })
+
+            cache = VectorIndexCache(max_bytes=2**40, max_rows=max(args.sizes), name=f"bench_vector_index_{size}")
+            async with AsyncSessionLocal() as db:
+                async def cold():
+                    cache.invalidate(conversation_id)
+                    await cache.get(db, conversation_id, user_id)
+
+                async def warm():
+                    index = await cache.get(db, conversation_id, user_id)
+                    await _local_candidates(db, index, query, query_vec, filters, args.pool)
+
+                rows.append({"chunks": size, "path": "index_load", **await timed(cold, max(5, args.repeat // 10))})
+                await cache.get(db, conversation_id, user_id)
+                rows.append({"chunks": size, "path": "index", **await timed(warm, args.repeat)})
+    finally:
+        async with AsyncSessionLocal() as db:
+            await db.execute(delete(MessageEmbedding).where(MessageEmbedding.user_id == user_id))
+            owned = select(Conversation.id).where(Conversation.user_id == user_id)
+            await db.execute(delete(Message).where(Message.conversation_id.in_(owned)))
+            await db.execute(delete(Conversation).where(Conversation.user_id == user_id))
+            await db.execute(delete(User).where(User.id == user_id))
+            await db.commit()
+
+    print(f"retrieval_mode={settings.retrieval_mode}, {args.dim}-d, pool {args.pool}")
+    print_table(rows)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
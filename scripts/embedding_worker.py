@@ -0,0 +1,44 @@
+"""
+Embedding worker: drains messages stored with `embedding_mode=deferred`.
+
+Runs separately from the API. Any number of these can run at once, on any
+host that reaches the database; they share the queue through
+`FOR UPDATE SKIP LOCKED`.
+
+Usage:
+    uv run python -m scripts.embedding_worker --processes 4 --batch-size 256
+    uv run python -m scripts.embedding_worker --retry-failed   # re-queue failed messages and exit
+    uv run python -m scripts.embedding_worker --stats          # print queue depth/lag and exit
+"""
+import argparse
+import asyncio
+import json
+import logging
+
+from app.db.engine import AsyncSessionLocal
+from app.services.embedding_worker import EmbeddingWorker, queue_stats, retry_failed
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--processes", type=int, default=2)
+    parser.add_argument("--batch-size", type=int, default=None)
+    parser.add_argument("--poll-seconds", type=float, default=None)
+    parser.add_argument("--retry-failed", action="store_true")
+    parser.add_argument("--stats", action="store_true")
+    args = parser.parse_args()
+
+    if args.retry_failed or args.stats:
+        async with AsyncSessionLocal() as db:
+            if args.retry_failed:
+                print(f"re-queued {await retry_failed(db)} messages")
+            print(json.dumps(await queue_stats(db)))
+        return
+
+    worker = EmbeddingWorker(args.processes, args.batch_size, args.poll_seconds)
+    await worker.run()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    asyncio.run(main())
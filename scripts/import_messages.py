@@ -0,0 +1,122 @@
+"""
+Bulk import a JSONL transcript into a conversation, embedding it on the way.
+
+Each line is `{"role": "user" | "ai" | "system", "content": "...", "created_at": "..."}`
+(`created_at`, `token_count`, `provider` and `model` are optional). The file
+is streamed, inserted in batches and embedded by a pool of model processes
+while later batches are still being inserted; see
+`app.services.importer.import_messages`.
+
+Usage:
+    uv run python -m scripts.import_messages transcript.jsonl --conversation-id <uuid> --processes 4
+    uv run python -m scripts.import_messages transcript.jsonl --user-sub <cognito sub> --title "Imported chat"
+    cat transcript.jsonl | uv run python -m scripts.import_messages - --conversation-id <uuid>
+"""
+import argparse
+import asyncio
+import logging
+import multiprocessing
+import resource
+import sys
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from typing import AsyncIterator
+
+from sqlalchemy import select
+
+from app.db.engine import AsyncSessionLocal
+from app.models.conversation import Conversation
+from app.models.user import User
+from app.services.embedding_worker import _init_process, embed_texts
+from app.services.importer import ImportStats, import_messages
+
+logger = logging.getLogger(__name__)
+
+
+async def file_lines(path: str) -> AsyncIterator[str]:
+    stream = sys.stdin if path == "-" else open(path, encoding="utf-8")
+    try:
+        for line in stream:
+            yield line
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+
+
+def peak_rss_mb() -> dict:
+    """Peak resident set size of this process and of its (finished or running) children, in MiB."""
+    # ru_maxrss is in KiB on Linux
+    return {
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "children_peak_rss_mb": resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024,
+    }
+
+
+async def run_import(
+    path: str, conversation_id: uuid.UUID, user_id: uuid.UUID, processes: int, batch_size: int | None,
+) -> ImportStats:
+    """Import `path` with `processes` model processes (0 = the in-process batcher)."""
+    embed = None
+    pool = None
+    if processes > 0:
+        # spawn, not fork: the parent holds an event loop and pooled database connections
+        pool = ProcessPoolExecutor(
+            max_workers=processes,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_process,
+        )
+        loop = asyncio.get_running_loop()
+
+        async def embed(texts):
+            # one slice per process, so a single import batch keeps the whole pool busy
+            size = -(-len(texts) // processes)
+            parts = await asyncio.gather(*(
+                loop.run_in_executor(pool, embed_texts, texts[i : i + size]) for i in range(0, len(texts), size)
+            ))
+            return [chunks for part in parts for chunks in part]
+
+    try:
+        async with AsyncSessionLocal() as db:
+            return await import_messages(db, conversation_id, user_id, file_lines(path), batch_size, embed)
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("path", help="JSONL file, or - for stdin")
+    parser.add_argument("--conversation-id", type=uuid.UUID, default=None)
+    parser.add_argument("--user-sub", default=None, help="cognito sub of the owner; creates a new conversation")
+    parser.add_argument("--title", default="Imported conversation")
+    parser.add_argument("--processes", type=int, default=2, help="model processes; 0 embeds in this process")
+    parser.add_argument("--batch-size", type=int, default=None)
+    args = parser.parse_args()
+    if (args.conversation_id is None) == (args.user_sub is None):
+        parser.error("pass exactly one of --conversation-id and --user-sub")
+
+    async with AsyncSessionLocal() as db:
+        if args.conversation_id is not None:
+            conversation = await db.get(Conversation, args.conversation_id)
+            if conversation is None:
+                parser.error(f"no conversation {args.conversation_id}")
+        else:
+            user = await db.scalar(select(User).where(User.cognito_sub == args.user_sub))
+            if user is None:
+                parser.error(f"no user with cognito sub {args.user_sub}")
+            conversation = Conversation(user_id=user.id, title=args.title)
+            db.add(conversation)
+            await db.commit()
+            logger.info("created conversation %s", conversation.id)
+        conversation_id, user_id = conversation.id, conversation.user_id
+
+    stats = await run_import(args.path, conversation_id, user_id, args.processes, args.batch_size)
+    logger.info(
+        "imported %d messages (%d embedded, %d chunks) in %.1fs: %.0f messages/s, %s",
+        stats.messages, stats.embedded, stats.chunks, stats.seconds, stats.messages_per_second, peak_rss_mb(),
+    )
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    asyncio.run(main())
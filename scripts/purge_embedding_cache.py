@@ -0,0 +1,52 @@
+"""
+Remove embedding_cache rows that have not been read for a while.
+
+The API's purge task does this continuously when EMBED_CACHE_TTL_DAYS is
+set; this script is for one-off cleanups, e.g. after changing the embedding
+model or runtime, which leaves every earlier row unreachable.
+`--older-than-days 0` empties the table.
+
+Works in short transactions of `--batch-size` rows claimed with
+`FOR UPDATE SKIP LOCKED`, so it can run next to live traffic.
+
+Usage:
+    uv run python -m scripts.purge_embedding_cache --older-than-days 7 --batch-size 5000
+"""
+import argparse
+import asyncio
+import logging
+import time
+from datetime import timedelta
+
+from app.core.settings import settings
+from app.db.engine import AsyncSessionLocal
+from app.services.purge import expire_embedding_cache
+
+logger = logging.getLogger(__name__)
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--older-than-days", type=float, default=settings.embed_cache_ttl_days or 30.0,
+                        help="remove rows whose last_used_at is older than this")
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument("--pause", type=float, default=0.0, help="seconds to sleep between batches")
+    args = parser.parse_args()
+
+    max_age = timedelta(days=args.older_than_days)
+    total, start = 0, time.perf_counter()
+    while True:
+        async with AsyncSessionLocal() as db:
+            n = await expire_embedding_cache(db, max_age, args.batch_size)
+        total += n
+        if n < args.batch_size:
+            break
+        logger.info("removed %d rows (%.0f rows/s)", total, total / (time.perf_counter() - start))
+        if args.pause:
+            await asyncio.sleep(args.pause)
+    logger.info("done: %d rows in %.1fs", total, time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    asyncio.run(main())
@@ -0,0 +1,108 @@
+"""
+Re-embed stored messages after changing EMBED_MODEL_NAME (and, for a different size, EMBED_DIM).
+
+Run with the *new* settings in the environment:
+
+- same dimension (e.g. e5-large -> e5-large-v2): messages whose vectors came
+  from another model are queued for re-embedding. Their old vectors stay
+  until they are replaced, but retrieval skips them because it only searches
+  vectors of the configured model.
+- new dimension (e.g. e5-large -> e5-small-v2, 1024 -> 384): the HNSW indexes
+  are dropped, `message_embeddings` is emptied, the vector column and its
+  compact copies are resized to EMBED_DIM, the indexes are recreated and every
+  message is queued. Retrieval returns nothing until the queue is drained.
+
+Switching runtime only (torch / onnx / onnx-int8 for the same model) needs no re-embedding.
+
+Usage:
+    EMBED_MODEL_NAME=intfloat/e5-small-v2 EMBED_DIM=384 \\
+        uv run python -m scripts.reembed --yes --drain --processes 4
+"""
+import argparse
+import asyncio
+import logging
+
+from sqlalchemy import text
+
+from app.core.settings import settings
+from app.db.engine import AsyncSessionLocal
+from app.services.embedding_backends import KNOWN_DIMENSIONS
+from app.services.embedding_worker import EmbeddingWorker, queue_stats
+
+logger = logging.getLogger(__name__)
+
+# (column, type, index, opclass) for the full vector and its compact copies
+COLUMNS = [
+    ("embedding", "vector", "ix_message_embeddings_embedding_hnsw", "vector_cosine_ops"),
+    ("embedding_half", "halfvec", "ix_message_embeddings_embedding_half_hnsw", "halfvec_cosine_ops"),
+    ("embedding_bit", "bit", "ix_message_embeddings_embedding_bit_hnsw", "bit_hamming_ops"),
+]
+
+
+async def column_dimension(db) -> int:
+    # pgvector stores the dimension as the column's type modifier
+    return await db.scalar(text(
+        "SELECT atttypmod FROM pg_attribute "
+        "WHERE attrelid = 'message_embeddings'::regclass AND attname = 'embedding'"
+    ))
+
+
+async def resize(db, dim: int) -> None:
+    for _, _, index, _ in COLUMNS:
+        await db.execute(text(f"DROP INDEX IF EXISTS {index}"))
+    await db.execute(text("TRUNCATE message_embeddings"))
+    for column, kind, index, opclass in COLUMNS:
+        await db.execute(text(f"ALTER TABLE message_embeddings ALTER COLUMN {column} TYPE {kind}({dim})"))
+        await db.execute(text(
+            f"CREATE INDEX {index} ON message_embeddings "
+            f"USING hnsw ({column} {opclass}) WITH (m = 16, ef_construction = 64)"
+        ))
+    await db.execute(text("UPDATE messages SET embedding_status = 'Pending'"))
+    # every conversation lost its vectors; in-process indexes must not keep serving them
+    await db.execute(text("UPDATE conversations SET embeddings_version = embeddings_version + 1"))
+
+
+async def queue_stale(db, model: str) -> int:
+    result = await db.execute(
+        text(
+            "UPDATE messages SET embedding_status = 'Pending' "
+            "WHERE id IN (SELECT message_id FROM message_embeddings WHERE embedding_model <> :model)"
+        ),
+        {"model": model},
+    )
+    return result.rowcount
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--yes", action="store_true", help="required; a dimension change deletes every vector")
+    parser.add_argument("--drain", action="store_true", help="embed the queue here instead of leaving it to the worker")
+    parser.add_argument("--processes", type=int, default=2)
+    parser.add_argument("--batch-size", type=int, default=None)
+    args = parser.parse_args()
+
+    expected = KNOWN_DIMENSIONS.get(settings.embed_model_name)
+    if expected is not None and expected != settings.embed_dim:
+        parser.error(f"{settings.embed_model_name} produces {expected}-d vectors, but EMBED_DIM={settings.embed_dim}")
+    if not args.yes:
+        parser.error("pass --yes to confirm")
+
+    async with AsyncSessionLocal() as db:
+        current = await column_dimension(db)
+        if current != settings.embed_dim:
+            logger.info("resizing embedding column %d -> %d and queueing every message", current, settings.embed_dim)
+            await resize(db, settings.embed_dim)
+        else:
+            queued = await queue_stale(db, settings.embed_model_name)
+            logger.info("queued %d messages embedded with another model", queued)
+        await db.commit()
+        logger.info("queue: %s", await queue_stats(db))
+
+    if args.drain:
+        processed = await EmbeddingWorker(args.processes, args.batch_size).drain()
+        logger.info("re-embedded %d messages", processed)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    asyncio.run(main())
@@ -0,0 +1,81 @@
+import asyncio
+import uuid
+from types import SimpleNamespace
+
+import httpx
+
+from app.api.deps import get_db_session, get_user_dependency
+from app.api.routes.v1 import conversations
+from app.main import app
+
+
+class FakeSession:
+    """Request session that passes the ownership check and records when it is released."""
+
+    def __init__(self):
+        self.closed = False
+
+    async def scalar(self, statement):
+        return uuid.uuid4()
+
+    async def close(self):
+        self.closed = True
+
+
+class TurnSession:
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+def test_keyed_chat_releases_request_session_before_waiting(monkeypatch):
+    sessions = []
+    started = asyncio.Event()
+    release = asyncio.Event()
+    calls = []
+
+    async def db_session():
+        session = FakeSession()
+        sessions.append(session)
+        yield session
+
+    async def chat_service(db, conversation_id, user_id, user_input, model=None, provider=None):
+        calls.append(db)
+        started.set()
+        await release.wait()
+        return "reply"
+
+    monkeypatch.setattr(conversations, "chat_service", chat_service)
+    monkeypatch.setattr(conversations, "AsyncSessionLocal", TurnSession)
+    app.dependency_overrides[get_db_session] = db_session
+    user = SimpleNamespace(id=uuid.uuid4())
+    app.dependency_overrides[get_user_dependency] = lambda: user
+
+    coalesced = conversations.get_idempotency_store().coalesced.value
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            url = f"/api/v1/conversation/{uuid.uuid4()}/chat"
+            headers = {"Idempotency-Key": "retry-me"}
+            body = {"user_input": "hello", "provider": "openai", "model": "gpt-5-mini"}
+            first = asyncio.create_task(client.post(url, json=body, headers=headers))
+            await asyncio.wait_for(started.wait(), 5)
+            retry = asyncio.create_task(client.post(url, json=body, headers=headers))
+            while len(sessions) < 2 or conversations.get_idempotency_store().coalesced.value == coalesced:
+                await asyncio.sleep(0.001)
+            # both requests are parked in the idempotency store, holding no connection
+            assert [session.closed for session in sessions] == [True, True]
+            release.set()
+            return await first, await retry
+
+    try:
+        first, retry = asyncio.run(asyncio.wait_for(scenario(), 10))
+    finally:
+        app.dependency_overrides.clear()
+
+    assert first.status_code == retry.status_code == 200
+    assert first.json() == retry.json() == {"content": "reply"}
+    assert len(calls) == 1 and not isinstance(calls[0], FakeSession)
@@ -0,0 +1,95 @@
+import asyncio
+import uuid
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+import httpx
+
+from app.api.deps import get_db_session, get_user_dependency
+from app.main import app
+from app.models.message import Message, MessageRole
+from app.services import history_cache, message as message_service
+from app.services.chat import get_recent_messages
+
+
+class Result:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def scalars(self):
+        return self
+
+    def all(self):
+        return list(self.rows)
+
+
+class FakeSession:
+    """A conversation's messages table, counting the reads that reach it."""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.reads = 0
+        self.pending = None
+
+    async def execute(self, statement):
+        self.reads += 1
+        # newest first, as get_k_messages asks for
+        return Result(sorted(self.rows, key=lambda m: m.message_count, reverse=True))
+
+    async def scalar(self, statement):
+        return max((m.message_count for m in self.rows), default=None)
+
+    def add(self, message):
+        self.pending = message
+
+    async def commit(self):
+        self.rows.append(self.pending)
+
+    async def refresh(self, message):
+        message.id = message.id or uuid.uuid4()
+        message.created_at = message.created_at or datetime.now(timezone.utc)
+
+
+def stored(conversation_id, n):
+    return Message(
+        id=uuid.uuid4(), conversation_id=conversation_id, message_count=n, role=MessageRole.User,
+        content=f"message {n}", token_count=3, content_tokens=2, created_at=datetime.now(timezone.utc),
+    )
+
+
+def test_posted_message_reaches_cached_history(monkeypatch):
+    monkeypatch.setattr(history_cache.settings, "history_cache_backend", "memory")
+    monkeypatch.setattr(history_cache, "_history_cache", None)
+    monkeypatch.setattr(history_cache, "_history_cache_built", False)
+    # keeps the test offline (tiktoken downloads its encodings)
+    monkeypatch.setattr(message_service, "count_tokens", lambda text: len(text.split()))
+    conversation_id = uuid.uuid4()
+    db = FakeSession([stored(conversation_id, n) for n in range(1, 4)])
+
+    async def db_session():
+        yield db
+
+    app.dependency_overrides[get_db_session] = db_session
+    app.dependency_overrides[get_user_dependency] = lambda: SimpleNamespace(id=uuid.uuid4())
+
+    async def scenario():
+        # a /chat turn fills the window
+        assert [m.content for m in await get_recent_messages(10, db, conversation_id)][-1] == "message 3"
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            response = await client.post("/api/v1/message", json={
+                "conversation_id": str(conversation_id), "role": "user", "content": "message 4", "token_count": 3,
+            })
+        assert response.status_code == 201
+        reads = db.reads
+        recent = await get_recent_messages(10, db, conversation_id)
+        return recent, db.reads - reads
+
+    try:
+        recent, reads = asyncio.run(scenario())
+    finally:
+        app.dependency_overrides.clear()
+
+    assert [m.content for m in recent] == ["message 1", "message 2", "message 3", "message 4"]
+    # served from the cache, which the POST wrote through to
+    assert reads == 0